@@ -0,0 +1,59 @@
+"""
+Runs the migrations against DATABASE_URL, the same synchronous URL the application
+connects with.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+import models  # noqa: F401, registers the tables on Base.metadata
+from database import SQLALCHEMY_DATABASE_URL, Base
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # The trigram indexes only exist on Postgres; don't offer to create them elsewhere.
+    if type_ == "index" and name and name.endswith("_trgm"):
+        return context.get_context().dialect.name == "postgresql"
+    return True
+
+
+def run_migrations_offline():
+    """
+    Emits the migration SQL to stdout instead of running it (``alembic upgrade --sql``).
+    """
+    context.configure(
+        url=SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite cannot alter constraints in place; batch mode recreates the table.
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,55 @@
+"""initial schema
+
+The users and contacts tables as ``init_db`` created them before migrations were
+introduced. Databases created that way should be stamped with this revision
+(``alembic stamp 0001``) and then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("role", sa.Enum("user", "admin", name="userrole"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "contacts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(), nullable=True),
+        sa.Column("last_name", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("phone_number", sa.String(), nullable=True),
+        sa.Column("birthday", sa.Date(), nullable=True),
+        sa.Column("additional_info", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_contacts_id", "contacts", ["id"])
+    op.create_index("ix_contacts_first_name", "contacts", ["first_name"])
+    op.create_index("ix_contacts_last_name", "contacts", ["last_name"])
+    op.create_index("ix_contacts_email", "contacts", ["email"], unique=True)
+    op.create_index("ix_contacts_phone_number", "contacts", ["phone_number"])
+
+
+def downgrade():
+    op.drop_table("contacts")
+    op.drop_table("users")
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,118 @@
+"""catch up columns and indexes added before migrations
+
+Adds what the models gained while ``init_db`` was the only way to create the schema:
+token versions, avatars, the birthday day-of-year with its index, contact row versions
+and, on Postgres, the trigram search indexes. Databases created by ``init_db`` at any
+point in between may already have some of these, so every step is skipped when its
+column or index exists.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+TRIGRAM_COLUMNS = ("first_name", "last_name", "email")
+BACKFILL_BATCH_SIZE = 1000
+
+
+# Day of year of the birthday in leap year 2000, as models.birthday_day_of_year computes
+# it, so the backfill is a single UPDATE. Copied rather than imported, so the migration
+# does not change with the model.
+BIRTHDAY_DOY_SQL = {
+    "postgresql": "EXTRACT(DOY FROM make_date(2000, EXTRACT(MONTH FROM birthday)::int, "
+                  "EXTRACT(DAY FROM birthday)::int))::int",
+    "sqlite": "CAST(strftime('%j', '2000-' || strftime('%m-%d', birthday)) AS INTEGER)",
+}
+
+
+def _birthday_day_of_year(birthday):
+    return date(2000, birthday.month, birthday.day).timetuple().tm_yday
+
+
+def _add_column(inspector, table, column):
+    if column.name not in {existing["name"] for existing in inspector.get_columns(table)}:
+        op.add_column(table, column)
+        return True
+    return False
+
+
+def _create_index(inspector, name, table, columns, **kwargs):
+    if name not in {index["name"] for index in inspector.get_indexes(table)}:
+        op.create_index(name, table, columns, **kwargs)
+
+
+def _backfill_birthday_doy(bind):
+    expression = BIRTHDAY_DOY_SQL.get(bind.dialect.name)
+    if expression is not None:
+        op.execute(f"UPDATE contacts SET birthday_doy = {expression} WHERE birthday IS NOT NULL")
+        return
+
+    # Other databases: compute in Python, walking the table in keyset batches.
+    contacts = sa.table(
+        "contacts", sa.column("id", sa.Integer), sa.column("birthday", sa.Date),
+        sa.column("birthday_doy", sa.Integer),
+    )
+    statement = (
+        contacts.update()
+        .where(contacts.c.id == sa.bindparam("contact_id"))
+        .values(birthday_doy=sa.bindparam("doy"))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(contacts.c.id, contacts.c.birthday)
+            .where(contacts.c.birthday.isnot(None), contacts.c.id > last_id)
+            .order_by(contacts.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(statement, [
+            {"contact_id": contact_id, "doy": _birthday_day_of_year(birthday)} for contact_id, birthday in rows
+        ])
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    _add_column(inspector, "users", sa.Column("token_version", sa.Integer(), server_default="0", nullable=False))
+    _add_column(inspector, "users", sa.Column("avatar_url", sa.String(), nullable=True))
+    _add_column(inspector, "users", sa.Column("avatar_key", sa.String(), nullable=True))
+
+    if _add_column(inspector, "contacts", sa.Column("birthday_doy", sa.Integer(), nullable=True)):
+        _backfill_birthday_doy(bind)
+    _add_column(inspector, "contacts", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+    _create_index(inspector, "ix_contacts_user_id_birthday_doy", "contacts", ["user_id", "birthday_doy"])
+
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in TRIGRAM_COLUMNS:
+            _create_index(
+                inspector, f"ix_contacts_{column}_trgm", "contacts", [column],
+                postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        for column in TRIGRAM_COLUMNS:
+            op.drop_index(f"ix_contacts_{column}_trgm", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_birthday_doy", table_name="contacts")
+    with op.batch_alter_table("contacts") as batch:
+        batch.drop_column("version")
+        batch.drop_column("birthday_doy")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("avatar_key")
+        batch.drop_column("avatar_url")
+        batch.drop_column("token_version")
@@ -0,0 +1,56 @@
+"""per-owner contact indexes
+
+Replaces the single-column contact indexes, which no query uses once it is scoped to
+an owner, with composite indexes that lead with ``user_id``:
+
+- ``(user_id, last_name, id)`` serves listing, keyset pagination and export;
+- ``(user_id, email)`` is unique, so emails are unique per owner instead of globally.
+
+The primary key already indexes ``id``. Substring search is served by the trigram
+indexes on Postgres and cannot use a B-tree anyway. Nothing filters on
+``phone_number``.
+
+Like 0002, every step is skipped when it is already done, so databases that
+``init_db`` created with the current models can be stamped at 0001 and upgraded.
+
+Creating the unique index fails if an owner already has two contacts with the same
+email; merge or delete the duplicates first.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+UNUSED_INDEXES = ("ix_contacts_id", "ix_contacts_first_name", "ix_contacts_last_name", "ix_contacts_phone_number")
+
+
+def _index_names(bind):
+    return {index["name"] for index in sa.inspect(bind).get_indexes("contacts")}
+
+
+def upgrade():
+    existing = _index_names(op.get_bind())
+    if "ix_contacts_user_id_last_name_id" not in existing:
+        op.create_index("ix_contacts_user_id_last_name_id", "contacts", ["user_id", "last_name", "id"])
+    if "uq_contacts_user_id_email" not in existing:
+        op.create_index("uq_contacts_user_id_email", "contacts", ["user_id", "email"], unique=True)
+    for name in ("ix_contacts_email",) + UNUSED_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name="contacts")
+
+
+def downgrade():
+    op.create_index("ix_contacts_phone_number", "contacts", ["phone_number"])
+    op.create_index("ix_contacts_last_name", "contacts", ["last_name"])
+    op.create_index("ix_contacts_first_name", "contacts", ["first_name"])
+    op.create_index("ix_contacts_id", "contacts", ["id"])
+    op.create_index("ix_contacts_email", "contacts", ["email"], unique=True)
+    op.drop_index("uq_contacts_user_id_email", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_last_name_id", table_name="contacts")
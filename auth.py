@@ -1,3 +1,6 @@
+import hashlib
+import os
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -5,26 +8,62 @@ from fastapi import Depends
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from cache import get_cached_user, set_cached_user
+from cache import LRUCache, get_cached_token_version, get_cached_user, set_cached_token_version, set_cached_user
 from config import SECRET_KEY
-from database import get_db
-from models import User
+from database import get_async_db
+from hashing import pwd_context, verify_and_update_async
+from models import User, UserRole
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if JWT_BACKEND == "pyjwt":
+    try:
+        import jwt as pyjwt
+    except ImportError:
+        raise RuntimeError("JWT_BACKEND=pyjwt requires the PyJWT package")
+elif JWT_BACKEND != "jose":
+    raise RuntimeError(f"Unknown JWT_BACKEND: {JWT_BACKEND}")
+
+# Verified token payloads keyed by the SHA-256 digest of the token. Each entry
+# expires together with the token itself.
+token_cache = LRUCache(TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def authenticate_user(username: str, password: str, db: Session):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+class Principal:
+    """
+    The authenticated caller, rebuilt from the signed claims of the access token.
+
+    Attributes:
+        id (int): The ID of the user.
+        username (str): The username of the user.
+        role (UserRole): The role of the user.
+    """
+    __slots__ = ("id", "username", "role")
+
+    def __init__(self, id: int, username: str, role: UserRole):
+        self.id = id
+        self.username = username
+        self.role = role
+
+
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(User).where(User.username == username))
+    if not user:
         return None
+    verified, new_hash = await verify_and_update_async(password, user.hashed_password)
+    if not verified:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
@@ -43,47 +82,142 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    if JWT_BACKEND == "pyjwt":
+        return pyjwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def user_token_claims(user: User) -> dict:
+    """
+    Builds the claims that let requests authorize without looking the user up.
+
+    Args:
+        user (User): The user the token is issued to.
+
+    Returns:
+        dict: The ``sub``, ``uid``, ``role`` and ``ver`` (token version) claims.
+    """
+    return {"sub": user.username, "uid": user.id, "role": user.role.value, "ver": user.token_version}
+
+
+def _verify_token(token: str) -> dict:
+    if JWT_BACKEND == "pyjwt":
+        try:
+            return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except pyjwt.PyJWTError as exc:
+            raise JWTError(str(exc))
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
 def decode_access_token(token: str):
+    """
+    Verifies an access token and returns its claims.
+
+    Verified payloads are cached until the token expires, so a client that sends the
+    same bearer token repeatedly pays for signature verification only once. The
+    returned dict is shared between requests and must not be modified.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        digest = hashlib.sha256(token.encode()).digest()
+    except AttributeError:
+        digest = None
+    payload = token_cache.get(digest) if digest else None
+    if payload is not None:
         return payload
+    try:
+        if digest is None:
+            raise JWTError("Token must be a string")
+        payload = _verify_token(token)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        token_cache.set(digest, payload, ttl=remaining)
+    return payload
+
+
+async def get_token_version(username: str, db: AsyncSession) -> Optional[int]:
+    """
+    Returns the current token version of a user.
+
+    The version is served from the in-process cache when possible, so storage is only
+    consulted after the cached value expires or is invalidated.
+
+    Args:
+        username (str): The username of the user.
+        db (AsyncSession): The database session, used when the cache has no entry.
+
+    Returns:
+        Optional[int]: The token version, or None if the user does not exist.
+    """
+    version = await get_cached_token_version(username)
+    if version is None:
+        version = await db.scalar(select(User.token_version).where(User.username == username))
+        if version is not None:
+            # Prefers a version cached meanwhile by a revocation over the one just read.
+            version = await set_cached_token_version(username, version)
+    return version
+
+
+async def get_current_principal(token: str = Depends(oauth2_scheme),
+                                db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """
+    Authorizes a request from the access token claims alone.
+
+    The only storage access is the token version check, which is answered from the
+    in-process cache for most requests.
+    """
     payload = decode_access_token(token)
-    username = payload.get("sub")
-    if not username:
+    try:
+        principal = Principal(id=int(payload["uid"]), username=payload["sub"], role=UserRole(payload["role"]))
+        token_version = int(payload["ver"])
+    except (KeyError, TypeError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    cached_user = get_cached_user(username)
+    if token_version != await get_token_version(principal.username, db):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+
+async def get_current_user_profile(principal: Principal = Depends(get_current_principal),
+                                   db: AsyncSession = Depends(get_async_db)) -> dict:
+    """
+    Returns the public profile of the authenticated user.
+
+    The profile is served as the cached dict; the database is only read on a cache miss.
+
+    Returns:
+        dict: The ``id``, ``username``, ``role`` and ``avatar_url`` of the user.
+    """
+    username = principal.username
+    cached_user = await get_cached_user(username)
     if cached_user:
-        return User(**cached_user)
+        return cached_user
 
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
     user_dict = {
         "id": user.id,
         "username": user.username,
-        "email": user.email,
-        "role": user.role.value
+        "role": user.role.value,
+        "avatar_url": user.avatar_url,
     }
-    set_cached_user(username, user_dict)
-    return user
+    await set_cached_user(username, user_dict)
+    return user_dict
 
 
-def admin_required(current_user: User = Depends(get_current_user)):
+async def admin_required(current_user: Principal = Depends(get_current_principal)):
     if current_user.role != UserRole.admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
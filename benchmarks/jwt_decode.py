@@ -0,0 +1,53 @@
+"""
+Measures access-token decode throughput.
+
+Compares uncached verification with python-jose and PyJWT (when installed) against
+the verified-token cache in :func:`auth.decode_access_token`.
+
+Usage:
+    python benchmarks/jwt_decode.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-of-at-least-32-bytes")
+
+import auth  # noqa: E402
+from jose import jwt as jose_jwt  # noqa: E402
+
+try:
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
+
+
+def report(name: str, number: int, seconds: float):
+    print(f"{name:<24} {number / seconds:>12,.0f} decodes/s {seconds / number * 1e6:>8.2f} us/decode")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="decodes per measurement")
+    args = parser.parse_args()
+
+    token = auth.create_access_token({"sub": "bench", "uid": 1, "role": "user", "ver": 0})
+    key, algorithms = auth.SECRET_KEY, [auth.ALGORITHM]
+
+    runs = {"jose (uncached)": lambda: jose_jwt.decode(token, key, algorithms=algorithms)}
+    if pyjwt is not None:
+        runs["pyjwt (uncached)"] = lambda: pyjwt.decode(token, key, algorithms=algorithms)
+    else:
+        print("PyJWT is not installed, skipping the pyjwt backend")
+    runs[f"cached ({auth.JWT_BACKEND})"] = lambda: auth.decode_access_token(token)
+
+    for name, run in runs.items():
+        run()
+        report(name, args.number, min(timeit.repeat(run, number=args.number, repeat=3)))
+
+
+if __name__ == "__main__":
+    main()
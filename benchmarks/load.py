@@ -0,0 +1,232 @@
+"""
+Drives the API with a weighted mix of requests and reports latency percentiles and RPS.
+
+Runs against the app in-process (through httpx's ASGI transport, no network) or against
+a running server over HTTP. Seed the database first with ``benchmarks/seed.py``; the
+in-process mode can seed for you with ``--seed``. The rate limiter is disabled for
+in-process runs; disable it on the server (``RATE_LIMIT_ENABLED=false``) for HTTP runs.
+
+Usage:
+    python benchmarks/load.py --seed --contacts 10000 --duration 30 --save-baseline baseline.json
+    python benchmarks/load.py --base-url http://127.0.0.1:8000 --compare baseline.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from benchmarks.report import compare, format_table, load_baseline, save_baseline, summarize  # noqa: E402
+from benchmarks.seed import BENCHMARK_PASSWORD, benchmark_usernames  # noqa: E402
+
+DEFAULT_MIX = "login=1,list=30,search=20,birthdays=10,create=5,update=5"
+SEARCH_TERMS = ["an", "Kov", "Maria", "Taylor", "bench-contact-1", "ro"]
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """
+    Parses a scenario mix such as ``list=30,search=20`` into weights.
+
+    Args:
+        mix (str): Comma-separated ``scenario=weight`` pairs.
+
+    Returns:
+        Dict[str, int]: The weight of every scenario.
+    """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+class VirtualUser:
+    """
+    One logged-in benchmark user issuing requests back to back.
+
+    Args:
+        client (httpx.AsyncClient): The client to send requests with.
+        username (str): The benchmark user to log in as.
+        rng (random.Random): The random source for scenario choice and parameters.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, username: str, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.headers = {}
+        self.contact_ids: List[int] = []
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post(
+            "/users/token", data={"username": self.username, "password": BENCHMARK_PASSWORD}
+        )
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def setup(self):
+        response = await self.login()
+        response.raise_for_status()
+        response = await self.client.get("/contacts/", params={"limit": 100}, headers=self.headers)
+        response.raise_for_status()
+        self.contact_ids = [contact["id"] for contact in response.json()]
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get("/contacts/", params={"limit": 20}, headers=self.headers)
+
+    async def search(self) -> httpx.Response:
+        return await self.client.get(
+            "/contacts/search/", params={"q": self.rng.choice(SEARCH_TERMS), "limit": 20}, headers=self.headers
+        )
+
+    async def birthdays(self) -> httpx.Response:
+        return await self.client.get("/contacts/upcoming_birthdays/", params={"days": 30}, headers=self.headers)
+
+    def _contact(self) -> dict:
+        return {
+            "first_name": "Load",
+            "last_name": "Test",
+            "email": f"bench-created-{uuid.uuid4().hex}@example.com",
+            "phone_number": "+380000000000",
+            "birthday": "1990-05-17",
+        }
+
+    async def create(self) -> httpx.Response:
+        response = await self.client.post("/contacts/", json=self._contact(), headers=self.headers)
+        if response.status_code == 200:
+            self.contact_ids.append(response.json()["id"])
+        return response
+
+    async def update(self) -> Optional[httpx.Response]:
+        if not self.contact_ids:
+            return None
+        contact_id = self.rng.choice(self.contact_ids)
+        return await self.client.put(f"/contacts/{contact_id}", json=self._contact(), headers=self.headers)
+
+
+SCENARIOS = {
+    "login": VirtualUser.login,
+    "list": VirtualUser.list,
+    "search": VirtualUser.search,
+    "birthdays": VirtualUser.birthdays,
+    "create": VirtualUser.create,
+    "update": VirtualUser.update,
+}
+
+
+async def run_load(client: httpx.AsyncClient, users: int, concurrency: int, duration: float,
+                   mix: Dict[str, int], seed: int = 42) -> Dict[str, dict]:
+    """
+    Runs ``concurrency`` virtual users for ``duration`` seconds.
+
+    Args:
+        client (httpx.AsyncClient): The client to send requests with.
+        users (int): The number of seeded benchmark users to log in as.
+        concurrency (int): The number of concurrent virtual users.
+        duration (float): The length of the measured run in seconds.
+        mix (Dict[str, int]): The weight of every scenario.
+        seed (int): The random seed.
+
+    Returns:
+        Dict[str, dict]: The summarized results per scenario.
+    """
+    usernames = benchmark_usernames(users)
+    virtual_users = [
+        VirtualUser(client, usernames[index % len(usernames)], random.Random(seed + index))
+        for index in range(concurrency)
+    ]
+    await asyncio.gather(*(user.setup() for user in virtual_users))
+
+    names, weights = list(mix), list(mix.values())
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def worker(user: VirtualUser):
+        while time.perf_counter() < deadline:
+            scenario = user.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await SCENARIOS[scenario](user)
+            except httpx.HTTPError:
+                errors[scenario] += 1
+                continue
+            if response is None:
+                continue
+            if response.status_code >= 400:
+                errors[scenario] += 1
+            else:
+                latencies[scenario].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(user) for user in virtual_users))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run(args) -> Dict[str, dict]:
+    mix = parse_mix(args.mix)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+            return await run_load(client, args.users, args.concurrency, args.duration, mix)
+
+    from main import app
+
+    if args.seed:
+        from benchmarks.seed import seed
+        seed(args.users, args.contacts)
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await run_load(client, args.users, args.concurrency, args.duration, mix)
+    finally:
+        await app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the contacts API.")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--seed", action="store_true", help="seed the database before an in-process run")
+    parser.add_argument("--users", type=int, default=10, help="number of seeded benchmark users")
+    parser.add_argument("--contacts", type=int, default=1000, help="contacts to seed with --seed")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout in seconds")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results to a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative p95/RPS change before --compare fails (default: 0.2)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(format_table(results))
+
+    if args.save_baseline:
+        settings = {key: getattr(args, key) for key in ("base_url", "users", "contacts", "concurrency",
+                                                         "duration", "mix")}
+        save_baseline(args.save_baseline, results, settings)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.compare:
+        regressions = compare(load_baseline(args.compare)["results"], results, args.tolerance)
+        if regressions:
+            print("Regressions:\n" + "\n".join(f"  {regression}" for regression in regressions))
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
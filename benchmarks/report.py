@@ -0,0 +1,122 @@
+"""
+Latency statistics, baseline files and regression checks for the load benchmarks.
+"""
+import json
+import math
+import platform
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """
+    Returns the nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values (Sequence[float]): The values in ascending order.
+        pct (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile, or 0.0 when there are no values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict[str, dict]:
+    """
+    Summarizes the latencies recorded for every scenario.
+
+    Args:
+        latencies (Dict[str, List[float]]): The successful request latencies in seconds per scenario.
+        errors (Dict[str, int]): The number of failed requests per scenario.
+        elapsed (float): The wall-clock duration of the run in seconds.
+
+    Returns:
+        Dict[str, dict]: Requests, errors, RPS and p50/p95/p99/max latency in milliseconds per scenario.
+    """
+    results = {}
+    for scenario in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(scenario, []))
+        results[scenario] = {
+            "requests": len(values),
+            "errors": errors.get(scenario, 0),
+            "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+    return results
+
+
+def format_table(results: Dict[str, dict]) -> str:
+    """
+    Renders summarized results as a fixed-width table.
+
+    Args:
+        results (Dict[str, dict]): The output of :func:`summarize`.
+
+    Returns:
+        str: The table.
+    """
+    columns = ("requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    lines = [f"{'scenario':<12}" + "".join(f"{column:>10}" for column in columns)]
+    for scenario, row in results.items():
+        lines.append(f"{scenario:<12}" + "".join(f"{row[column]:>10}" for column in columns))
+    return "\n".join(lines)
+
+
+def save_baseline(path: str, results: Dict[str, dict], settings: dict):
+    """
+    Writes results and the settings that produced them to a JSON baseline file.
+
+    Args:
+        path (str): The file to write.
+        results (Dict[str, dict]): The output of :func:`summarize`.
+        settings (dict): The benchmark settings, e.g. mode, concurrency and scale.
+    """
+    baseline = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": settings,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, dict], current: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Finds scenarios whose p95 latency grew, or whose throughput fell, by more than
+    ``tolerance``.
+
+    Args:
+        baseline (Dict[str, dict]): The baseline results.
+        current (Dict[str, dict]): The results of this run.
+        tolerance (float): The allowed relative change, e.g. ``0.2`` for 20%.
+
+    Returns:
+        List[str]: A description of every regression; empty if there is none.
+    """
+    regressions = []
+    for scenario, before in baseline.items():
+        after = current.get(scenario)
+        if after is None:
+            continue
+        if before["p95_ms"] and after["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {before['p95_ms']} ms -> {after['p95_ms']} ms")
+        if before["rps"] and after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: rps {before['rps']} -> {after['rps']}")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{scenario}: errors {before['errors']} -> {after['errors']}")
+    return regressions
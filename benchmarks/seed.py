@@ -0,0 +1,123 @@
+"""
+Seeds the database with benchmark users and contacts.
+
+Every user gets the same password, hashed once. Contacts are spread evenly over the users
+and generated from a fixed random seed, so runs at the same scale are reproducible.
+
+Usage:
+    python benchmarks/seed.py --users 10 --contacts 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Iterator, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, insert, select  # noqa: E402
+
+from database import SessionLocal, init_db  # noqa: E402
+from hashing import hash_password  # noqa: E402
+from models import Contact, User, birthday_day_of_year  # noqa: E402
+
+BENCHMARK_PASSWORD = "benchmark-password"
+USERNAME_TEMPLATE = "bench-user-{}@example.com"
+INSERT_BATCH_SIZE = 10000
+
+FIRST_NAMES = ["Anna", "Bohdan", "Chloe", "Dmytro", "Emma", "Farid", "Greta", "Hiro", "Iryna", "Jonas",
+               "Kateryna", "Liam", "Maria", "Noah", "Olena", "Pavlo", "Quinn", "Roman", "Sofia", "Taras"]
+LAST_NAMES = ["Adams", "Bondar", "Clark", "Davis", "Evans", "Franko", "Garcia", "Hall", "Ivanenko", "Jones",
+              "Kovalenko", "Lewis", "Melnyk", "Nguyen", "Olsen", "Petrenko", "Quincy", "Rossi", "Shevchenko",
+              "Taylor"]
+
+
+def benchmark_usernames(users: int) -> List[str]:
+    return [USERNAME_TEMPLATE.format(index) for index in range(users)]
+
+
+def generate_contacts(user_ids: List[int], contacts: int, seed: int = 42) -> Iterator[dict]:
+    """
+    Generates contact rows spread evenly over ``user_ids``.
+
+    Args:
+        user_ids (List[int]): The owners of the contacts.
+        contacts (int): The total number of contacts.
+        seed (int): The random seed.
+
+    Yields:
+        dict: The column values of one contact.
+    """
+    rng = random.Random(seed)
+    first_day = date(1950, 1, 1)
+    for index in range(contacts):
+        birthday = first_day + timedelta(days=rng.randrange(365 * 55)) if rng.random() < 0.9 else None
+        yield {
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"bench-contact-{index}@example.com",
+            "phone_number": f"+380{rng.randrange(10 ** 9):09d}",
+            "birthday": birthday,
+            "birthday_doy": birthday_day_of_year(birthday),
+            "additional_info": None,
+            "user_id": user_ids[index % len(user_ids)],
+        }
+
+
+def seed(users: int, contacts: int) -> List[int]:
+    """
+    Creates the benchmark users, if missing, and replaces their contacts.
+
+    Contacts are inserted in batches of ``INSERT_BATCH_SIZE`` rows.
+
+    Args:
+        users (int): The number of users.
+        contacts (int): The total number of contacts.
+
+    Returns:
+        List[int]: The IDs of the benchmark users.
+    """
+    init_db()
+    usernames = benchmark_usernames(users)
+    with SessionLocal() as db:
+        existing = dict(db.execute(select(User.username, User.id).where(User.username.in_(usernames))).all())
+        missing = [username for username in usernames if username not in existing]
+        if missing:
+            hashed_password = hash_password(BENCHMARK_PASSWORD)
+            db.execute(insert(User), [{"username": username, "hashed_password": hashed_password}
+                                      for username in missing])
+            db.commit()
+        user_ids = [user_id for user_id, in db.execute(
+            select(User.id).where(User.username.in_(usernames)).order_by(User.id)
+        )]
+        db.execute(delete(Contact).where(Contact.user_id.in_(user_ids)))
+        db.commit()
+
+        batch = []
+        for row in generate_contacts(user_ids, contacts):
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                db.execute(insert(Contact), batch)
+                db.commit()
+                batch = []
+        if batch:
+            db.execute(insert(Contact), batch)
+            db.commit()
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed benchmark users and contacts.")
+    parser.add_argument("--users", type=int, default=10, help="number of benchmark users")
+    parser.add_argument("--contacts", type=int, default=1000, help="total number of contacts (1k to 1M)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.users, args.contacts)
+    print(f"Seeded {args.users} users and {args.contacts} contacts in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
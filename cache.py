@@ -1,17 +1,450 @@
-import redis
+import asyncio
 import json
 import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 0.1))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.25))
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", 5))
+REDIS_BREAKER_RESET_TIMEOUT = float(os.getenv("REDIS_BREAKER_RESET_TIMEOUT", 10))
+CONTACT_CACHE_TTL = int(os.getenv("CONTACT_CACHE_TTL", 300))
+USER_L1_CACHE_SIZE = int(os.getenv("USER_L1_CACHE_SIZE", 1024))
+USER_L1_CACHE_TTL = float(os.getenv("USER_L1_CACHE_TTL", 30))
+TOKEN_VERSION_L1_CACHE_TTL = float(os.getenv("TOKEN_VERSION_L1_CACHE_TTL", 60))
+USER_INVALIDATION_CHANNEL = "cache:user:invalidate"
+
+# Created by init_redis() on application startup. While it is None, every
+# cache lookup is a miss and callers fall back to the database.
+redis_client: Optional[aioredis.Redis] = None
+
+# Per-process hit/miss counters, keyed by "<kind>_hits" / "<kind>_misses".
+cache_stats = Counter()
+
+
+class RedisUnavailable(Exception):
+    """Raised when Redis is not configured, failing, or short-circuited by the breaker."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling Redis after repeated failures, then lets calls through again once
+    ``reset_timeout`` seconds have passed.
+
+    Args:
+        failure_threshold (int): The number of consecutive failures that opens the circuit.
+        reset_timeout (float): How long the circuit stays open, in seconds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+redis_breaker = CircuitBreaker(REDIS_BREAKER_THRESHOLD, REDIS_BREAKER_RESET_TIMEOUT)
+
+
+async def init_redis():
+    """
+    Creates the shared Redis client and its bounded connection pool.
+    """
+    global redis_client
+    pool = aioredis.BlockingConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=0,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        decode_responses=True,
+    )
+    redis_client = aioredis.Redis(connection_pool=pool)
+
+
+async def close_redis():
+    """
+    Closes the shared Redis client and disconnects its pool.
+    """
+    global redis_client
+    if redis_client is not None:
+        client, redis_client = redis_client, None
+        await client.aclose()
+        await client.connection_pool.disconnect()
+
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+async def redis_call(command: str, *args, **kwargs) -> Any:
+    """
+    Runs a command on the shared Redis client behind the circuit breaker.
 
-def get_cached_user(username: str):
-    user_data = redis_client.get(f"user:{username}")
+    Args:
+        command (str): The name of the client method, e.g. ``"get"``.
+        *args: Positional arguments of the command.
+        **kwargs: Keyword arguments of the command.
+
+    Returns:
+        Any: The result of the command.
+
+    Raises:
+        RedisUnavailable: If Redis is not initialized, failing, or the breaker is open.
+    """
+    if redis_client is None or not redis_breaker.allow():
+        cache_stats["redis_short_circuits"] += 1
+        raise RedisUnavailable()
+    try:
+        result = await getattr(redis_client, command)(*args, **kwargs)
+    except (redis.RedisError, OSError) as exc:
+        redis_breaker.record_failure()
+        raise RedisUnavailable() from exc
+    redis_breaker.record_success()
+    return result
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe in-process cache with least-recently-used eviction.
+
+    Entries also expire ``ttl`` seconds after they were stored.
+
+    Args:
+        maxsize (int): The maximum number of entries.
+        ttl (float): The lifetime of an entry in seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+user_l1_cache = LRUCache(USER_L1_CACHE_SIZE, USER_L1_CACHE_TTL)
+token_version_l1_cache = LRUCache(USER_L1_CACHE_SIZE, TOKEN_VERSION_L1_CACHE_TTL)
+
+
+async def get_cached_user(username: str):
+    user_dict = user_l1_cache.get(username)
+    if user_dict is not None:
+        cache_stats["user_l1_hits"] += 1
+        return user_dict
+    cache_stats["user_l1_misses"] += 1
+    try:
+        user_data = await redis_call("get", f"user:{username}")
+    except RedisUnavailable:
+        cache_stats["user_errors"] += 1
+        return None
     if user_data:
-        return json.loads(user_data)
+        user_dict = json.loads(user_data)
+        user_l1_cache.set(username, user_dict)
+        return user_dict
     return None
 
-def set_cached_user(username: str, user_dict: dict, expire: int = 1800):
-    redis_client.set(f"user:{username}", json.dumps(user_dict), ex=expire)
\ No newline at end of file
+async def set_cached_user(username: str, user_dict: dict, expire: int = 1800):
+    user_l1_cache.set(username, user_dict)
+    try:
+        await redis_call("set", f"user:{username}", json.dumps(user_dict), ex=expire)
+    except RedisUnavailable:
+        cache_stats["user_errors"] += 1
+
+
+async def get_cached_token_version(username: str) -> Optional[int]:
+    """
+    Looks up the current token version of a user, in process first and then in Redis.
+
+    Args:
+        username (str): The username of the user.
+
+    Returns:
+        Optional[int]: The cached token version, or None on a miss.
+    """
+    version = token_version_l1_cache.get(username)
+    if version is not None:
+        cache_stats["token_version_l1_hits"] += 1
+        return version
+    cache_stats["token_version_l1_misses"] += 1
+    try:
+        version = await redis_call("get", f"token_version:{username}")
+    except RedisUnavailable:
+        cache_stats["token_version_errors"] += 1
+        return None
+    if version is None:
+        return None
+    token_version_l1_cache.set(username, int(version))
+    return int(version)
+
+
+async def set_cached_token_version(username: str, version: int, expire: int = 1800) -> int:
+    """
+    Caches a token version read from the database, unless Redis already has one.
+
+    A revocation that commits while the database read is in flight writes the new
+    version to Redis (see :func:`invalidate_cached_user`), and must not be overwritten
+    with the version read before it.
+
+    Args:
+        username (str): The username of the user.
+        version (int): The token version read from the database.
+        expire (int): The lifetime of the Redis entry in seconds.
+
+    Returns:
+        int: The cached version, which is Redis's if it already had one.
+    """
+    key = f"token_version:{username}"
+    try:
+        if not await redis_call("set", key, version, ex=expire, nx=True):
+            cached = await redis_call("get", key)
+            if cached is not None:
+                version = int(cached)
+    except RedisUnavailable:
+        cache_stats["token_version_errors"] += 1
+    token_version_l1_cache.set(username, version)
+    return version
+
+
+recent_writes_l1_cache = LRUCache(USER_L1_CACHE_SIZE, TOKEN_VERSION_L1_CACHE_TTL)
+
+
+async def mark_recent_write(user_id: int, seconds: float):
+    """
+    Records that a user just wrote, so their reads skip the replica for ``seconds``.
+
+    The mark is kept in process and in Redis, so it holds whichever worker serves the
+    user's next request.
+
+    Args:
+        user_id (int): The ID of the user.
+        seconds (float): How long the replica may lag behind.
+    """
+    recent_writes_l1_cache.set(user_id, True, ttl=seconds)
+    try:
+        await redis_call("set", f"recent_write:{user_id}", 1, px=int(seconds * 1000))
+    except RedisUnavailable:
+        cache_stats["recent_write_errors"] += 1
+
+
+async def has_recent_write_mark(user_id: int) -> bool:
+    """
+    Tells whether :func:`mark_recent_write` was called for a user and has not expired.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        bool: True if the user wrote recently.
+    """
+    if recent_writes_l1_cache.get(user_id):
+        return True
+    try:
+        return bool(await redis_call("exists", f"recent_write:{user_id}"))
+    except RedisUnavailable:
+        cache_stats["recent_write_errors"] += 1
+        return False
+
+
+def _drop_local_user(username: str):
+    user_l1_cache.pop(username)
+    token_version_l1_cache.pop(username)
+
+
+async def invalidate_cached_user(username: str, token_version: Optional[int] = None):
+    """
+    Drops a cached user and token version from Redis and from the in-process caches of
+    every worker.
+
+    Code that revokes tokens passes the new ``token_version``, which then replaces the
+    cached one instead of being dropped, so a request that read the old version from the
+    database just before cannot cache it again.
+
+    If Redis is unreachable, other workers drop the entries when their L1 TTL runs out.
+
+    Args:
+        username (str): The username of the user whose data changed.
+        token_version (Optional[int]): The new token version, after a revocation.
+    """
+    _drop_local_user(username)
+    try:
+        if token_version is None:
+            await redis_call("delete", f"user:{username}", f"token_version:{username}")
+        else:
+            await redis_call("set", f"token_version:{username}", token_version, ex=1800)
+            await redis_call("delete", f"user:{username}")
+        await redis_call("publish", USER_INVALIDATION_CHANNEL, username)
+    except RedisUnavailable:
+        cache_stats["user_errors"] += 1
+
+
+def _handle_user_invalidation(message: dict):
+    _drop_local_user(message["data"])
+
+
+async def _listen_for_invalidations():
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    _handle_user_invalidation(message)
+        except (redis.RedisError, OSError):
+            # Invalidations may have been missed while disconnected, so start cold.
+            user_l1_cache.clear()
+            token_version_l1_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                await pubsub.aclose()
+
+
+def start_invalidation_listener() -> Optional[asyncio.Task]:
+    """
+    Starts a background task that applies user invalidations published by other workers.
+
+    The task reconnects on its own if Redis goes away.
+
+    Returns:
+        Optional[asyncio.Task]: The listener task, or None if Redis is not initialized.
+    """
+    if redis_client is None:
+        return None
+    return asyncio.create_task(_listen_for_invalidations())
+
+
+def _contacts_version_key(user_id: int) -> str:
+    return f"contacts:{user_id}:version"
+
+
+def _contacts_key(user_id: int, version: str, kind: str, params: tuple) -> str:
+    return ":".join(["contacts", str(user_id), version, kind, *map(str, params)])
+
+
+async def get_cached_contacts(user_id: int, kind: str, *params) -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Looks up a cached contact read for a user.
+
+    Keys embed the user's contacts version, so entries written before the last
+    :func:`invalidate_contacts` call are never returned and simply expire. The version
+    and the entry are read with two plain GETs: the entry key depends on the version,
+    so a script reading both could not declare it, which Redis Cluster requires.
+
+    On a miss, pass the returned version to :func:`set_cached_contacts`: it is the
+    version from before the caller's database query, so a result that an invalidation
+    overtook is stored under a key nobody reads anymore.
+
+    Args:
+        user_id (int): The owner of the contacts.
+        kind (str): The kind of read, e.g. ``"contact"`` or ``"list"``.
+        *params: The parameters that identify the read.
+
+    Returns:
+        Tuple[Optional[Any], Optional[str]]: The cached JSON value, or None on a miss, and
+        the contacts version that was read, or None when Redis is unavailable.
+    """
+    try:
+        version = await redis_call("get", _contacts_version_key(user_id)) or "0"
+        data = await redis_call("get", _contacts_key(user_id, version, kind, params))
+    except RedisUnavailable:
+        cache_stats["contacts_errors"] += 1
+        return None, None
+    if data is None:
+        cache_stats["contacts_misses"] += 1
+        return None, version
+    cache_stats["contacts_hits"] += 1
+    return json.loads(data), version
+
+
+async def set_cached_contacts(user_id: int, kind: str, *params, value: Any, version: Optional[str],
+                              expire: int = CONTACT_CACHE_TTL):
+    """
+    Stores a contact read for a user under the contacts version it was read at.
+
+    Args:
+        user_id (int): The owner of the contacts.
+        kind (str): The kind of read, e.g. ``"contact"`` or ``"list"``.
+        *params: The parameters that identify the read.
+        value (Any): A JSON-serializable value.
+        version (Optional[str]): The version returned by :func:`get_cached_contacts`
+            before the value was queried. Nothing is stored when it is None.
+        expire (int): The time to live in seconds.
+    """
+    if version is None:
+        return
+    try:
+        await redis_call("set", _contacts_key(user_id, version, kind, params), json.dumps(value), ex=expire)
+    except RedisUnavailable:
+        cache_stats["contacts_errors"] += 1
+
+
+async def invalidate_contacts(user_id: int):
+    """
+    Invalidates every cached contact read of a user by bumping their contacts version.
+
+    Args:
+        user_id (int): The owner of the contacts.
+    """
+    try:
+        await redis_call("incr", _contacts_version_key(user_id))
+    except RedisUnavailable:
+        cache_stats["contacts_errors"] += 1
@@ -1,24 +1,102 @@
 import os
-from typing import Generator
+import time
+from typing import AsyncGenerator, Generator, Optional
 
 from dotenv import load_dotenv
+from fastapi import HTTPException, Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from cache import has_recent_write_mark, mark_recent_write
+
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")  # from .env
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+READ_PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """
+    Converts a synchronous database URL to its async driver counterpart.
+
+    Args:
+        url (str): A database URL such as ``postgresql://...`` or ``sqlite:///...``.
+
+    Returns:
+        str: The same URL using asyncpg for Postgres or aiosqlite for SQLite.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def pool_options(url: str) -> dict:
+    """
+    Returns the connection pool settings for an engine.
+
+    In-memory SQLite databases use a single shared connection, so only pre-ping applies.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        dict: Keyword arguments for ``create_engine`` or ``create_async_engine``.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Reads go to the replica when one is configured, otherwise to the primary.
+if DATABASE_REPLICA_URL:
+    ASYNC_REPLICA_URL = to_async_url(DATABASE_REPLICA_URL)
+    async_replica_engine = create_async_engine(ASYNC_REPLICA_URL, **pool_options(ASYNC_REPLICA_URL))
+else:
+    async_replica_engine = async_engine
+AsyncReadSessionLocal = async_sessionmaker(bind=async_replica_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
 def init_db():
     """
     Initializes the database by creating all tables defined in the models.
+
+    Only missing tables are created, so this is meant for development and tests.
+    Deployed databases are upgraded with Alembic (``alembic upgrade head``).
     """
     Base.metadata.create_all(bind=engine)
 
@@ -35,3 +113,137 @@ def get_db() -> Generator[SessionLocal, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Provides an async database session for request handlers.
+
+    Yields:
+        AsyncSession: An async database session.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def has_recent_write(request: Request) -> bool:
+    """
+    Tells whether the client's cookie says it wrote recently enough that the replica may
+    still lag behind.
+
+    Args:
+        request (Request): The incoming HTTP request.
+
+    Returns:
+        bool: True if reads should go to the primary.
+    """
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def request_user_id(request: Request) -> Optional[int]:
+    """
+    Returns the ID of the user whose bearer token authenticates a request.
+
+    Args:
+        request (Request): The incoming HTTP request.
+
+    Returns:
+        Optional[int]: The user ID, or None without a valid bearer token.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    from auth import decode_access_token  # auth depends on this module for its sessions
+
+    try:
+        return int(decode_access_token(token)["uid"])
+    except (HTTPException, KeyError, TypeError, ValueError):
+        return None
+
+
+async def read_sessionmaker(request: Request) -> async_sessionmaker:
+    """
+    Picks the session factory for a read-only request.
+
+    A client counts as having just written if it sends the ``read_primary_until``
+    cookie, or if the user of its bearer token wrote from any client. The latter covers
+    API clients that do not keep cookies.
+
+    Args:
+        request (Request): The incoming HTTP request.
+
+    Returns:
+        async_sessionmaker: The replica factory, or the primary one right after a write.
+    """
+    if AsyncReadSessionLocal is AsyncSessionLocal or has_recent_write(request):
+        return AsyncSessionLocal
+    user_id = request_user_id(request)
+    if user_id is not None and await has_recent_write_mark(user_id):
+        return AsyncSessionLocal
+    return AsyncReadSessionLocal
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Provides an async session for read-only request handlers.
+
+    Sessions use the read replica, except for clients that wrote within the last
+    ``READ_YOUR_WRITES_SECONDS``, which keep reading from the primary so they see their
+    own changes.
+
+    Args:
+        request (Request): The incoming HTTP request.
+
+    Yields:
+        AsyncSession: An async database session.
+    """
+    async with (await read_sessionmaker(request))() as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marks clients that just wrote so :func:`get_read_db` sends their reads to the primary.
+
+    Every successful request with an unsafe method gets a short-lived cookie while a
+    replica is configured, and the user of its bearer token is marked for the same time
+    with :func:`cache.mark_recent_write`.
+
+    Args:
+        app: The ASGI application to wrap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if (message["type"] == "http.response.start" and message["status"] < 400
+                    and AsyncReadSessionLocal is not AsyncSessionLocal):
+                until = time.time() + READ_YOUR_WRITES_SECONDS
+                cookie = (f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={READ_YOUR_WRITES_SECONDS}; "
+                          f"Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+                # The write succeeded, so the token was accepted by the endpoint.
+                user_id = request_user_id(Request(scope))
+                if user_id is not None:
+                    await mark_recent_write(user_id, READ_YOUR_WRITES_SECONDS)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+async def dispose_engines():
+    """
+    Closes every pooled connection of the async engines.
+    """
+    await async_engine.dispose()
+    if async_replica_engine is not async_engine:
+        await async_replica_engine.dispose()
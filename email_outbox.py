@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from typing import List, Optional
+
+from fastapi import BackgroundTasks
+
+import cache
+from cache import RedisUnavailable, redis_call
+from utils.email_utils import SMTPSender, send_email
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 1))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 1))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", 5))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv("EMAIL_RETRY_MAX_DELAY", 600))
+EMAIL_CLAIM_TIMEOUT = float(os.getenv("EMAIL_CLAIM_TIMEOUT", 300))
+EMAIL_DEAD_LETTER_MAX = int(os.getenv("EMAIL_DEAD_LETTER_MAX", 1000))
+EMAIL_WORKER_MAX_BACKOFF = 60
+# Socket timeouts one send can take in the worst case: connecting and sending, then
+# reconnecting and sending again after a dropped connection.
+SEND_TIMEOUTS_PER_MESSAGE = 4
+MESSAGE_FIELDS = ("to", "subject", "body")
+EMAIL_OUTBOX_KEY = "email:outbox"
+EMAIL_RETRY_KEY = "email:outbox:retry"
+EMAIL_PROCESSING_KEY = "email:outbox:processing"
+EMAIL_DEAD_LETTER_KEY = "email:outbox:dead"
+
+# Pops up to ARGV[1] emails from the outbox and records them as being processed until
+# ARGV[2], in one step, so an email is never only held by a worker.
+CLAIM_SCRIPT = """
+local items = redis.call('RPOP', KEYS[1], ARGV[1])
+if not items then
+    return {}
+end
+for _, item in ipairs(items) do
+    redis.call('ZADD', KEYS[2], ARGV[2], item)
+end
+return items
+"""
+
+logger = logging.getLogger(__name__)
+
+# Per-process counters: queued, sent, retried, dead-lettered and fallback deliveries.
+email_stats = Counter()
+
+
+def _send_in_background(to: str, subject: str, body: str):
+    try:
+        send_email(to, subject, body)
+        email_stats["fallback_sent"] += 1
+    except Exception:
+        email_stats["fallback_failed"] += 1
+        logger.exception("Failed to send email to %s", to)
+
+
+async def enqueue_email(background_tasks: BackgroundTasks, to: str, subject: str, body: str) -> bool:
+    """
+    Queues an email in the Redis outbox for delivery by an :class:`OutboxWorker`.
+
+    If Redis is unavailable the email is sent directly from a background task instead,
+    after the response has been returned.
+
+    Args:
+        background_tasks (BackgroundTasks): The background tasks of the current request.
+        to (str): The recipient address.
+        subject (str): The subject line.
+        body (str): The plain-text body.
+
+    Returns:
+        bool: True if the email was queued, False if it fell back to a background task.
+    """
+    # The ID keeps identical emails distinct while they are being processed.
+    message = {"id": uuid.uuid4().hex, "to": to, "subject": subject, "body": body, "attempts": 0}
+    try:
+        await redis_call("lpush", EMAIL_OUTBOX_KEY, json.dumps(message))
+    except RedisUnavailable:
+        email_stats["fallbacks"] += 1
+        background_tasks.add_task(_send_in_background, to, subject, body)
+        return False
+    email_stats["queued"] += 1
+    return True
+
+
+def parse_message(item: str) -> Optional[dict]:
+    """
+    Decodes an outbox item.
+
+    Args:
+        item (str): The JSON stored in the outbox.
+
+    Returns:
+        Optional[dict]: The message, or None if the item is not a valid message.
+    """
+    try:
+        message = json.loads(item)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or not all(isinstance(message.get(field), str) for field in MESSAGE_FIELDS):
+        return None
+    message.setdefault("attempts", 0)
+    if not isinstance(message["attempts"], int):
+        return None
+    return message
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Returns the exponential backoff before the next delivery attempt.
+
+    Args:
+        attempts (int): The number of failed attempts so far.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    return min(EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1), EMAIL_RETRY_MAX_DELAY)
+
+
+class OutboxWorker:
+    """
+    Delivers queued emails in batches over one long-lived SMTP connection.
+
+    Each pass moves retries that are due back to the outbox, claims up to ``batch_size``
+    emails and sends them one by one on a worker thread. Failed emails are rescheduled
+    with exponential backoff and moved to a dead-letter list, capped at
+    ``EMAIL_DEAD_LETTER_MAX`` entries, after ``max_attempts``. Items that are not valid
+    messages are dead-lettered right away.
+
+    Claimed emails stay in a processing set until each one was handled. If a worker dies
+    mid-batch, the emails it had not handled are put back in the outbox
+    ``EMAIL_CLAIM_TIMEOUT`` seconds after they were claimed, so delivery is at least
+    once. The batch size is capped so that a batch of sends timing out still finishes
+    within the claim timeout; otherwise another worker would send it again.
+
+    Args:
+        sender (SMTPSender): The SMTP connection used by this worker.
+        batch_size (int): The maximum number of emails sent per pass.
+        max_attempts (int): The number of attempts before an email is dead-lettered.
+    """
+
+    def __init__(self, sender: SMTPSender, batch_size: int = EMAIL_BATCH_SIZE,
+                 max_attempts: int = EMAIL_MAX_ATTEMPTS):
+        self.sender = sender
+        longest_send = SEND_TIMEOUTS_PER_MESSAGE * sender.timeout
+        self.batch_size = max(1, min(batch_size, int(EMAIL_CLAIM_TIMEOUT // longest_send)))
+        self.max_attempts = max_attempts
+
+    async def promote_due(self, key: str):
+        due = await redis_call("zrangebyscore", key, 0, time.time(), start=0, num=self.batch_size)
+        for item in due:
+            # Only the worker that removes the entry re-queues it.
+            if await redis_call("zrem", key, item):
+                await redis_call("lpush", EMAIL_OUTBOX_KEY, item)
+
+    async def promote_due_retries(self):
+        await self.promote_due(EMAIL_RETRY_KEY)
+        # Claims that outlived their timeout belong to a worker that died.
+        await self.promote_due(EMAIL_PROCESSING_KEY)
+
+    async def _dead_letter(self, entry: dict):
+        email_stats["dead_lettered"] += 1
+        await redis_call("lpush", EMAIL_DEAD_LETTER_KEY, json.dumps(entry))
+        await redis_call("ltrim", EMAIL_DEAD_LETTER_KEY, 0, EMAIL_DEAD_LETTER_MAX - 1)
+
+    async def _reschedule(self, message: dict, error: str):
+        message["attempts"] += 1
+        message["last_error"] = error
+        if message["attempts"] >= self.max_attempts:
+            logger.error("Giving up on email to %s after %d attempts: %s", message["to"], message["attempts"], error)
+            await self._dead_letter(message)
+            return
+        email_stats["retried"] += 1
+        due = time.time() + retry_delay(message["attempts"])
+        await redis_call("zadd", EMAIL_RETRY_KEY, {json.dumps(message): due})
+
+    async def run_once(self) -> int:
+        """
+        Runs one delivery pass.
+
+        Returns:
+            int: The number of emails taken from the outbox.
+        """
+        await self.promote_due_retries()
+        items = await redis_call("eval", CLAIM_SCRIPT, 2, EMAIL_OUTBOX_KEY, EMAIL_PROCESSING_KEY,
+                                 self.batch_size, time.time() + EMAIL_CLAIM_TIMEOUT)
+        if not items:
+            return 0
+        loop = asyncio.get_running_loop()
+        broken = None
+        for item in items:
+            message = parse_message(item)
+            if message is None:
+                logger.error("Dead-lettering malformed outbox item: %.200s", item)
+                email_stats["malformed"] += 1
+                await self._dead_letter({"payload": item, "last_error": "malformed message"})
+            elif broken is not None:
+                # The server is unreachable: don't wait for a timeout on every message.
+                await self._reschedule(message, broken)
+            else:
+                failures = await loop.run_in_executor(None, self.sender.send_batch, [message])
+                if not failures:
+                    email_stats["sent"] += 1
+                else:
+                    await self._reschedule(message, failures[0][1])
+                    if not self.sender.connected:
+                        broken = failures[0][1]
+            # Acknowledged one by one, so a crash only puts back what was not handled.
+            await redis_call("zrem", EMAIL_PROCESSING_KEY, item)
+        return len(items)
+
+    async def run(self, poll_interval: float = EMAIL_POLL_INTERVAL):
+        errors = 0
+        try:
+            while True:
+                try:
+                    taken = await self.run_once()
+                except RedisUnavailable:
+                    taken = 0
+                except Exception:
+                    # A bad message or an unexpected error must not stop delivery for good.
+                    errors += 1
+                    email_stats["worker_errors"] += 1
+                    logger.exception("Email outbox pass failed")
+                    await asyncio.sleep(min(poll_interval * 2 ** errors, EMAIL_WORKER_MAX_BACKOFF))
+                    continue
+                errors = 0
+                if not taken:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            self.sender.close()
+
+
+def start_email_workers(workers: int = EMAIL_WORKERS) -> List[asyncio.Task]:
+    """
+    Starts background tasks that deliver the email outbox.
+
+    Every worker keeps its own SMTP connection, so ``workers`` is also the size of the
+    connection pool of this process.
+
+    Args:
+        workers (int): The number of workers to start.
+
+    Returns:
+        List[asyncio.Task]: The worker tasks, empty if Redis is not initialized.
+    """
+    if cache.redis_client is None:
+        return []
+    return [asyncio.create_task(OutboxWorker(SMTPSender()).run()) for _ in range(workers)]
+
+
+async def main(workers: Optional[int] = None):
+    await cache.init_redis()
+    try:
+        await asyncio.gather(*start_email_workers(EMAIL_WORKERS if workers is None else workers))
+    finally:
+        await cache.close_redis()
+
+
+if __name__ == "__main__":
+    # Runs the outbox workers on their own, e.g. with EMAIL_WORKERS=0 on the API processes.
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
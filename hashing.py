@@ -0,0 +1,144 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", os.cpu_count() or 1))
+HASHING_MAX_PENDING = int(os.getenv("HASHING_MAX_PENDING", 64))
+
+# Hashes made with a different cost are flagged by needs_update and
+# transparently rehashed on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Per-process counters: calls and seconds per operation, plus rejected requests.
+hashing_stats = Counter()
+
+
+def hash_password(password: str) -> str:
+    """
+    Hashes a password with the configured bcrypt cost.
+
+    Args:
+        password (str): The plain-text password.
+
+    Returns:
+        str: The bcrypt hash.
+    """
+    return pwd_context.hash(password)
+
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and rehashes it if the stored hash uses an outdated cost.
+
+    Args:
+        password (str): The plain-text password.
+        hashed_password (str): The stored hash.
+
+    Returns:
+        tuple: Whether the password matches, and a replacement hash or None.
+    """
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class HashingPool:
+    """
+    Runs bcrypt on a dedicated process pool so it never holds the event loop or the
+    request threadpool.
+
+    At most ``max_pending`` calls may be queued or running; further calls are rejected
+    with 503 so that a login burst cannot pile up unbounded work. If a worker process
+    dies, the broken pool is replaced and the call is retried once.
+
+    Args:
+        workers (int): The number of worker processes. ``0`` runs bcrypt in threads,
+            which is enough for tests and local development.
+        max_pending (int): The maximum number of queued or running calls.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            hashing_stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests. Try again later.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                self._discard_executor(executor)
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+            hashing_stats[f"{operation}_calls"] += 1
+            hashing_stats[f"{operation}_seconds"] += time.perf_counter() - started
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        # Concurrent calls on the same broken pool must only replace it once.
+        if self._executor is executor:
+            hashing_stats["pool_restarts"] += 1
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(HASHING_WORKERS, HASHING_MAX_PENDING)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hashes a password on the hashing pool.
+
+    Args:
+        password (str): The plain-text password.
+
+    Returns:
+        str: The bcrypt hash.
+    """
+    return await hashing_pool.run("hash", hash_password, password)
+
+
+async def verify_and_update_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password on the hashing pool, see :func:`verify_and_update`.
+
+    Args:
+        password (str): The plain-text password.
+        hashed_password (str): The stored hash.
+
+    Returns:
+        tuple: Whether the password matches, and a replacement hash or None.
+    """
+    return await hashing_pool.run("verify", verify_and_update, password, hashed_password)
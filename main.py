@@ -1,12 +1,18 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from slowapi import Limiter
+from fastapi.staticfiles import StaticFiles
 from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
 
-from database import init_db
+from cache import close_redis, init_redis, start_invalidation_listener
+from database import ReadYourWritesMiddleware, dispose_engines, init_db
+from email_outbox import start_email_workers
+from hashing import hashing_pool
+from metrics import setup_metrics
+from profiling import setup_query_profiling
+from rate_limit import limiter, rate_limit_stats
 from routers import contacts, users, password_reset
+from utils.avatars import AVATAR_LOCAL_DIR, AVATAR_LOCAL_URL, AVATAR_STORAGE, AvatarUploadLimitMiddleware
 
 app = FastAPI()
 
@@ -19,8 +25,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Send reads to the primary for a few seconds after a client writes
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Reject oversized avatar uploads before their body is spooled
+app.add_middleware(AvatarUploadLimitMiddleware)
+
+# Prometheus metrics and per-request query profiling
+setup_metrics(app)
+setup_query_profiling(app)
+
 # Rate limiter
-limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.include_router(password_reset.router)
 
@@ -36,20 +51,47 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     Returns:
         JSONResponse: A response with a 429 status code and an error message.
     """
+    rate_limit_stats["rejected"] += 1
+    rate_limit_stats[f"rejected:{request.url.path}"] += 1
     return JSONResponse(
         status_code=429,
         content={"detail": "Rate limit exceeded. Try again later."},
+        headers={"Retry-After": str(exc.limit.limit.get_expiry())},
     )
 
 
 @app.on_event("startup")
 async def on_startup():
     """
-    Initializes the database on application startup.
+    Initializes the database, connects to Redis and starts the cache invalidation listener
+    and the email outbox workers on application startup.
     """
     init_db()
+    await init_redis()
+    app.state.invalidation_listener = start_invalidation_listener()
+    app.state.email_workers = start_email_workers()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Stops the cache invalidation listener and the email outbox workers, closes the Redis
+    and database pools and stops the password hashing pool on application shutdown.
+    """
+    listener = app.state.invalidation_listener
+    if listener is not None:
+        listener.cancel()
+    for worker in app.state.email_workers:
+        worker.cancel()
+    await close_redis()
+    await dispose_engines()
+    hashing_pool.shutdown()
 
 
 # Routers
 app.include_router(contacts.router)
 app.include_router(users.router)
+
+# Avatars stored on the local filesystem are served by the app itself
+if AVATAR_STORAGE == "local":
+    app.mount(AVATAR_LOCAL_URL, StaticFiles(directory=AVATAR_LOCAL_DIR, check_dir=False), name="avatars")
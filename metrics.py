@@ -0,0 +1,213 @@
+import logging
+import time
+from typing import Iterable
+
+from fastapi import FastAPI, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import cache
+import email_outbox
+import hashing
+import rate_limit
+from database import async_engine, async_replica_engine, engine
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, Histogram, generate_latest
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, SummaryMetricFamily
+except ImportError:  # metrics are disabled without prometheus_client
+    REGISTRY = None
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cache hits to slow bulk imports and exports.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+POOL_CONNECT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every HTTP request, labelled by method, route template and
+    status code.
+
+    Streaming responses are timed until their last chunk has been sent. Requests that do
+    not match an API route share one label to keep the number of series bounded.
+
+    Args:
+        app: The ASGI application to wrap.
+        histogram (Histogram): The histogram to observe latencies in.
+    """
+
+    def __init__(self, app, histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.labels(
+                method=scope["method"],
+                route=getattr(route, "path", UNMATCHED_ROUTE),
+                status=str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+def _split_stat(key: str, suffixes: Iterable[str]):
+    for suffix in suffixes:
+        if key.endswith(f"_{suffix}"):
+            return key[:-len(suffix) - 1], suffix
+    return None, None
+
+
+class StatsCollector:
+    """
+    Exposes the in-process counters of the cache, hashing pool, rate limiter and email
+    outbox, read at scrape time.
+    """
+
+    def collect(self):
+        cache_ops = CounterMetricFamily(
+            "cache_operations", "Cache lookups by cache and result.", labels=["cache", "result"]
+        )
+        for key, value in cache.cache_stats.items():
+            name, result = _split_stat(key, ("hits", "misses", "errors", "short_circuits"))
+            if name is not None:
+                cache_ops.add_metric([name, result], value)
+        yield cache_ops
+
+        breaker = GaugeMetricFamily("redis_circuit_open", "1 while the Redis circuit breaker is open.")
+        breaker.add_metric([], int(cache.redis_breaker.state == "open"))
+        yield breaker
+
+        l1_size = GaugeMetricFamily("cache_l1_entries", "Entries in the in-process caches.", labels=["cache"])
+        l1_size.add_metric(["user"], len(cache.user_l1_cache))
+        l1_size.add_metric(["token_version"], len(cache.token_version_l1_cache))
+        yield l1_size
+
+        hashing_time = SummaryMetricFamily(
+            "password_hashing_seconds", "Time spent in bcrypt by operation.", labels=["operation"]
+        )
+        for operation in ("hash", "verify"):
+            hashing_time.add_metric(
+                [operation],
+                count_value=hashing.hashing_stats[f"{operation}_calls"],
+                sum_value=hashing.hashing_stats[f"{operation}_seconds"],
+            )
+        yield hashing_time
+
+        hashing_rejected = CounterMetricFamily(
+            "password_hashing_rejected", "Hashing calls rejected because the pool was full."
+        )
+        hashing_rejected.add_metric([], hashing.hashing_stats["rejected"])
+        yield hashing_rejected
+
+        hashing_restarts = CounterMetricFamily(
+            "password_hashing_pool_restarts", "Hashing pools replaced after a worker process died."
+        )
+        hashing_restarts.add_metric([], hashing.hashing_stats["pool_restarts"])
+        yield hashing_restarts
+
+        hashing_pending = GaugeMetricFamily("password_hashing_pending", "Queued or running hashing calls.")
+        hashing_pending.add_metric([], hashing.hashing_pool.pending)
+        yield hashing_pending
+
+        rejections = CounterMetricFamily(
+            "rate_limit_rejections", "Requests rejected by the rate limiter.", labels=["path"]
+        )
+        for key, value in rate_limit.rate_limit_stats.items():
+            if key.startswith("rejected:"):
+                rejections.add_metric([key[len("rejected:"):]], value)
+        yield rejections
+
+        emails = CounterMetricFamily("email_outbox_events", "Email outbox events.", labels=["event"])
+        for key, value in email_outbox.email_stats.items():
+            emails.add_metric([key], value)
+        yield emails
+
+
+def instrument_engine(db_engine: Engine, name: str, connect_histogram, in_use_gauge):
+    """
+    Reports how long opening new connections takes and how many connections of
+    ``db_engine`` are checked out, from the events of its pool.
+
+    The pool has no event for the start of a checkout, so the time spent queueing for a
+    free connection cannot be observed; a pool whose in-use gauge sits at its size plus
+    ``max_overflow`` is one where requests queue. New connections are timed from
+    :attr:`ConnectionPoolEntry.last_connect_time`, which is taken just before connecting,
+    to the ``connect`` event.
+
+    Args:
+        db_engine (Engine): The engine to instrument; pass ``sync_engine`` for async engines.
+        name (str): The value of the ``engine`` label.
+        connect_histogram (Histogram): The histogram to observe connection times in.
+        in_use_gauge (Gauge): The gauge reporting checked-out connections.
+    """
+    connect_time = connect_histogram.labels(engine=name)
+    in_use = in_use_gauge.labels(engine=name)
+
+    def connected(dbapi_connection, connection_record):
+        connect_time.observe(max(time.time() - connection_record.last_connect_time, 0))
+
+    # Listeners are carried over to the new pool when the engine is disposed.
+    event.listen(db_engine.pool, "connect", connected)
+    event.listen(db_engine.pool, "checkout", lambda *args: in_use.inc())
+    event.listen(db_engine.pool, "checkin", lambda *args: in_use.dec())
+    # Detached connections are closed without being checked in.
+    event.listen(db_engine.pool, "detach", lambda *args: in_use.dec())
+
+
+def setup_metrics(app: FastAPI):
+    """
+    Adds request metrics and a ``/metrics`` endpoint in the Prometheus text format.
+
+    Metrics are per process; with several workers, scrape each one or run
+    prometheus_client in multiprocess mode. Does nothing if prometheus_client is not
+    installed.
+
+    Args:
+        app (FastAPI): The application to instrument.
+    """
+    if REGISTRY is None:
+        logger.warning("prometheus_client is not installed, /metrics is disabled")
+        return
+
+    latency = Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by method, route and status.",
+        ["method", "route", "status"],
+        buckets=LATENCY_BUCKETS,
+    )
+    pool_connect = Histogram(
+        "db_pool_connect_seconds",
+        "Time spent opening new database connections for the pool.",
+        ["engine"],
+        buckets=POOL_CONNECT_BUCKETS,
+    )
+    pool_in_use = Gauge("db_pool_connections_in_use", "Connections checked out of the pool.", ["engine"])
+    instrument_engine(engine, "sync", pool_connect, pool_in_use)
+    instrument_engine(async_engine.sync_engine, "async", pool_connect, pool_in_use)
+    if async_replica_engine is not async_engine:
+        instrument_engine(async_replica_engine.sync_engine, "async_replica", pool_connect, pool_in_use)
+    REGISTRY.register(StatsCollector())
+
+    app.add_middleware(MetricsMiddleware, histogram=latency)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
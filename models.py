@@ -1,9 +1,32 @@
 import enum
+from datetime import date
+from typing import Optional
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import DDL, Column, Integer, String, Date, ForeignKey, Enum, Index, event
+from sqlalchemy.orm import relationship, validates
 from database import Base
 
+# A leap year, so that February 29 gets its own day-of-year slot.
+BIRTHDAY_CALENDAR_YEAR = 2000
+
+
+def birthday_day_of_year(birthday: Optional[date]) -> Optional[int]:
+    """
+    Maps a birthday to its day of the year on a fixed leap-year calendar.
+
+    March 1 is always day 61, whatever the year of birth, so the value can be compared
+    across contacts and against today's date.
+
+    Args:
+        birthday (Optional[date]): The birthday to map.
+
+    Returns:
+        Optional[int]: A day number between 1 and 366, or None if there is no birthday.
+    """
+    if birthday is None:
+        return None
+    return date(BIRTHDAY_CALENDAR_YEAR, birthday.month, birthday.day).timetuple().tm_yday
+
 
 class UserRole(enum.Enum):
     user = "user"
@@ -18,6 +41,9 @@ class User(Base):
         id (int): The primary key of the user.
         username (str): The username of the user.
         hashed_password (str): The hashed password of the user.
+        token_version (int): Bumped to revoke every access token issued before.
+        avatar_url (str): The URL of the largest avatar thumbnail.
+        avatar_key (str): The storage key of the avatar thumbnails, unique per upload.
         contacts (list): A list of contacts associated with the user.
     """
     __tablename__ = 'users'
@@ -26,6 +52,11 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(Enum(UserRole), default=UserRole.user, nullable=False)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+    avatar_url = Column(String, nullable=True)
+    avatar_key = Column(String, nullable=True)
+
+    contacts = relationship("Contact", back_populates="user")
 
 
 class Contact(Base):
@@ -39,19 +70,58 @@ class Contact(Base):
         email (str): The email address of the contact.
         phone_number (str): The phone number of the contact.
         birthday (Date): The birthday of the contact.
+        birthday_doy (int): The birthday's day of the year, kept in sync with ``birthday``.
         additional_info (str): Additional information about the contact.
         user_id (int): The ID of the user who owns the contact.
+        version (int): The row version, bumped on every update and used for ETags.
         user (User): The user associated with the contact.
     """
     __tablename__ = 'contacts'
 
-    id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String, index=True)
-    last_name = Column(String, index=True)
-    email = Column(String, unique=True, index=True)
-    phone_number = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    first_name = Column(String)
+    last_name = Column(String)
+    email = Column(String)
+    phone_number = Column(String)
     birthday = Column(Date, nullable=True)
+    birthday_doy = Column(Integer, nullable=True)
     additional_info = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    version = Column(Integer, default=1, server_default="1", nullable=False)
 
     user = relationship("User", back_populates="contacts")
+
+    # ORM updates bump the version and fail with StaleDataError if the row was changed
+    # concurrently. Core UPDATE statements must bump it themselves.
+    __mapper_args__ = {"version_id_col": version}
+
+    # Trigram indexes let Postgres serve the substring and similarity
+    # predicates used by contact search (see utils.search).
+    __table_args__ = tuple(
+        Index(
+            f"ix_contacts_{column}_trgm",
+            column,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql")
+        for column in ("first_name", "last_name", "email")
+    ) + (
+        # Every contact query is scoped to one owner. This one serves listing in
+        # (last_name, id) order, keyset pagination and the export stream.
+        Index("ix_contacts_user_id_last_name_id", "user_id", "last_name", "id"),
+        # Emails are unique per owner, so two users may keep the same person.
+        Index("uq_contacts_user_id_email", "user_id", "email", unique=True),
+        Index("ix_contacts_user_id_birthday_doy", "user_id", "birthday_doy"),
+    )
+
+    @validates("birthday")
+    def _sync_birthday_doy(self, key, value):
+        self.birthday_doy = birthday_day_of_year(value)
+        return value
+
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,242 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import async_engine, async_replica_engine, engine
+
+QUERY_PROFILING_ENABLED = os.getenv("QUERY_PROFILING_ENABLED", "true").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 10))
+
+EXPLAIN_PREFIXES = {
+    "postgresql": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    The queries issued while a request, or a block under :func:`track_queries`, runs.
+
+    Attributes:
+        count (int): The number of statements executed.
+        duration (float): The total time spent executing them, in seconds.
+        statements (Counter): How often each SQL statement was executed.
+    """
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[str]:
+        return [statement for statement, count in self.statements.items() if count >= threshold]
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Collectors opened by track_queries(). They see queries from every thread, because
+# TestClient runs the application outside the test's context.
+_trackers: List[QueryStats] = []
+_trackers_lock = threading.Lock()
+
+
+def _explain(conn, cursor, statement: str, parameters) -> Optional[str]:
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    # EXPLAIN runs in the request's transaction. On Postgres a failing statement would
+    # abort that transaction, so it is fenced off in a savepoint.
+    savepoint = conn.dialect.name == "postgresql" and conn.in_transaction()
+    explain_cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            explain_cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            return "\n".join(" ".join(str(value) for value in row) for row in explain_cursor.fetchall())
+        except Exception:
+            if savepoint:
+                explain_cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            raise
+        finally:
+            if savepoint:
+                explain_cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+    finally:
+        explain_cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, so a statement that raises leaves nothing behind.
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if _trackers:
+        with _trackers_lock:
+            for tracker in _trackers:
+                tracker.record(statement, duration)
+
+    if duration * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        plan = None
+        if SLOW_QUERY_EXPLAIN and not executemany:
+            try:
+                plan = _explain(conn, cursor, statement, parameters)
+            except Exception as exc:
+                plan = f"EXPLAIN failed: {exc}"
+        logger.warning(
+            "Slow query (%.1f ms): %s\n%s", duration * 1000, statement, plan or "",
+            extra={"duration_ms": round(duration * 1000, 1), "statement": statement, "plan": plan},
+        )
+
+
+def instrument_engine(db_engine: Engine):
+    """
+    Times every statement executed on ``db_engine``.
+
+    Args:
+        db_engine (Engine): The engine to instrument; pass ``sync_engine`` for async engines.
+    """
+    if event.contains(db_engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilingMiddleware:
+    """
+    Counts the queries and database time of every HTTP request.
+
+    The totals are sent in a ``Server-Timing`` header and logged once the response has
+    finished. Queries run by a streaming response body after the headers were sent only
+    appear in the log. A statement repeated ``N_PLUS_ONE_THRESHOLD`` times or more in one
+    request is reported as a likely N+1 query.
+
+    Args:
+        app: The ASGI application to wrap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timing = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                "%s %s %s queries=%d db_ms=%.1f total_ms=%.1f",
+                scope["method"], scope["path"], status_code, stats.count, stats.duration * 1000, total_ms,
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status_code,
+                    "queries": stats.count,
+                    "db_ms": round(stats.duration * 1000, 1),
+                    "total_ms": round(total_ms, 1),
+                },
+            )
+            for statement in stats.repeated(N_PLUS_ONE_THRESHOLD):
+                logger.warning(
+                    "Possible N+1 query in %s %s: executed %d times: %s",
+                    scope["method"], scope["path"], stats.statements[statement], statement,
+                    extra={"path": scope["path"], "statement": statement},
+                )
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Collects every query executed, in any thread, while the block runs.
+
+    Yields:
+        QueryStats: The queries seen so far.
+    """
+    stats = QueryStats()
+    with _trackers_lock:
+        _trackers.append(stats)
+    try:
+        yield stats
+    finally:
+        with _trackers_lock:
+            _trackers.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(budget: int) -> Iterator[QueryStats]:
+    """
+    Fails a test when the block executes more than ``budget`` queries.
+
+    Example::
+
+        with assert_max_queries(2):
+            client.get("/contacts/")
+
+    Args:
+        budget (int): The maximum number of queries allowed.
+
+    Yields:
+        QueryStats: The queries seen so far.
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > budget:
+        statements = "\n".join(f"{count}x {statement}" for statement, count in stats.statements.most_common())
+        raise AssertionError(f"Expected at most {budget} queries, got {stats.count}:\n{statements}")
+
+
+def setup_query_profiling(app):
+    """
+    Instruments both database engines and adds :class:`QueryProfilingMiddleware`.
+
+    The engines are always instrumented so that :func:`assert_max_queries` works;
+    ``QUERY_PROFILING_ENABLED`` only controls the per-request middleware.
+
+    Args:
+        app (FastAPI): The application to profile.
+    """
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    instrument_engine(async_replica_engine.sync_engine)
+    if QUERY_PROFILING_ENABLED:
+        app.add_middleware(QueryProfilingMiddleware)
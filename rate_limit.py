@@ -0,0 +1,95 @@
+import asyncio
+import functools
+import os
+from collections import Counter
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from auth import decode_access_token
+from cache import REDIS_HOST, REDIS_PORT, REDIS_SOCKET_TIMEOUT
+
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", f"redis://{REDIS_HOST}:{REDIS_PORT}/1")
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+LOGIN_RATE_LIMIT = os.getenv("LOGIN_RATE_LIMIT", "10/minute")
+PASSWORD_RESET_RATE_LIMIT = os.getenv("PASSWORD_RESET_RATE_LIMIT", "5/15minutes")
+BULK_IMPORT_RATE_LIMIT = os.getenv("BULK_IMPORT_RATE_LIMIT", "5/minute")
+EXPORT_RATE_LIMIT = os.getenv("EXPORT_RATE_LIMIT", "10/minute")
+
+# Per-process counters: rejected requests in total and per limited path.
+rate_limit_stats = Counter()
+
+
+def rate_limit_key(request: Request) -> str:
+    """
+    Identifies the client a request is counted against.
+
+    Requests carrying a valid bearer token are counted per user (the ``sub`` claim), so
+    users behind a shared proxy do not exhaust each other's budget; anonymous requests
+    are counted per client address.
+
+    Args:
+        request (Request): The incoming HTTP request.
+
+    Returns:
+        str: ``user:<username>`` or ``ip:<address>``.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{decode_access_token(token)['sub']}"
+        except (HTTPException, KeyError):
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+class ThreadedLimiter(Limiter):
+    """
+    A slowapi limiter that checks async endpoints on a worker thread.
+
+    slowapi only supports the synchronous ``limits`` storages and would run the Redis
+    round trip of every limited request on the event loop, blocking it for up to
+    ``REDIS_SOCKET_TIMEOUT`` while Redis is down. The check is done in the threadpool
+    first; slowapi then sees the request as already checked and only adds the headers.
+    """
+
+    def limit(self, *args, **kwargs):
+        decorate = super().limit(*args, **kwargs)
+
+        def decorator(func):
+            limited = decorate(func)
+            if not asyncio.iscoroutinefunction(func):
+                return limited
+
+            @functools.wraps(limited)
+            async def checked_in_threadpool(*args, **kwargs):
+                request = kwargs.get("request")
+                if (self.enabled and self._auto_check and isinstance(request, Request)
+                        and not getattr(request.state, "_rate_limiting_complete", False)):
+                    await run_in_threadpool(self._check_request_limit, request, func, False)
+                    request.state._rate_limiting_complete = True
+                return await limited(*args, **kwargs)
+
+            return checked_in_threadpool
+
+        return decorator
+
+
+# Counters live in Redis so the limits hold across every worker process. The Redis
+# moving-window strategy checks and records a hit in a single atomic Lua script. If
+# Redis is unreachable each worker falls back to in-memory counters until it recovers.
+limiter = ThreadedLimiter(
+    key_func=rate_limit_key,
+    strategy=RATE_LIMIT_STRATEGY,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    storage_options={
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_TIMEOUT,
+    },
+    in_memory_fallback_enabled=True,
+    key_prefix="ratelimit",
+    enabled=RATE_LIMIT_ENABLED,
+)
@@ -1,180 +1,746 @@
-from datetime import date, timedelta
-from typing import List, Optional
+from datetime import date
+from typing import Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import extract, or_, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 
-from models import Contact
-from database import get_db
-from auth import get_current_user
-from schemas import ContactCreate, ContactResponse
+from cache import get_cached_contacts, invalidate_contacts, set_cached_contacts
+from models import Contact, birthday_day_of_year
+from rate_limit import BULK_IMPORT_RATE_LIMIT, EXPORT_RATE_LIMIT, limiter
+from database import get_async_db, get_read_db, read_sessionmaker
+from auth import Principal, get_current_principal
+from schemas import BulkImportError, BulkImportResult, ContactBatchDelete, ContactBatchOutcome, ContactBatchResult, \
+    ContactBatchUpdate, ContactCreate, ContactMerge, ContactMergeResult, ContactPatch, ContactResponse, \
+    DuplicateSuggestions
+from utils.birthdays import upcoming_birthdays_condition
+from utils.bulk_import import detect_format, iter_chunks, iter_lines, iter_records, validate_chunk
+from utils.dedup import DEDUP_THRESHOLD, find_duplicates, merge_values
+from utils.etags import contact_etag, etag_matches, not_modified, versions_etag
+from utils.fields import FastJSONResponse, contact_columns, parse_fields, rows_to_dicts
+from utils.export import FILE_EXTENSIONS, FORMATTERS, MEDIA_TYPES, csv_header
+from utils.pagination import decode_cursor, encode_cursor
+from utils.search import MIN_QUERY_LENGTH, apply_search_filters
 
 router = APIRouter(
     prefix="/contacts",
     tags=["contacts"]
 )
 
+MAX_REPORTED_IMPORT_ERRORS = 1000
+
+
+def _serialize_contacts(contacts) -> List[dict]:
+    return [ContactResponse.model_validate(contact, from_attributes=True).model_dump(mode="json") for contact in contacts]
+
 
 @router.post("/", response_model=ContactResponse)
-def create_contact(contact: ContactCreate, db: Session = Depends(get_db),
-                   current_user: str = Depends(get_current_user)):
+async def create_contact(contact: ContactCreate, db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_principal)):
     """
     Creates a new contact for the current user.
 
     Args:
         contact (ContactCreate): The contact data to create.
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
         ContactResponse: The created contact.
     """
-    db_contact = Contact(**contact.dict(), user_id=current_user)
+    db_contact = Contact(**contact.dict(), user_id=current_user.id)
     db.add(db_contact)
-    db.commit()
-    db.refresh(db_contact)
+    await db.commit()
+    await db.refresh(db_contact)
+    await invalidate_contacts(current_user.id)
     return db_contact
 
 
-@router.get("/", response_model=List[ContactResponse])
-def list_contacts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db),
-                  current_user: str = Depends(get_current_user)):
+def _integrity_error_message(exc: IntegrityError) -> str:
+    # The driver message names tables, columns and values; clients get a fixed one.
+    if "email" in str(exc.orig).lower():
+        return "A contact with this email already exists"
+    return "The change conflicts with another contact"
+
+
+async def _insert_contact_rows(db: AsyncSession, user_id: int,
+                               rows: List[Tuple[int, dict]]) -> List[Tuple[int, str]]:
+    """
+    Inserts a chunk of contact rows in a single multi-row statement and commits it.
+
+    Emails that the user already has, or that repeat within the chunk, are rejected up
+    front. If the batch still violates a constraint, the rows are retried one by one in
+    savepoints so that only the offending rows are reported.
+
+    Args:
+        db (AsyncSession): The database session.
+        user_id (int): The owner of the contacts.
+        rows (List[Tuple[int, dict]]): ``(line_number, values)`` pairs ready for insertion.
+
+    Returns:
+        List[Tuple[int, str]]: The ``(line_number, error)`` pairs of rows that were not inserted.
+    """
+    failures = []
+    emails = {values["email"] for _, values in rows}
+    taken = set((await db.scalars(
+        select(Contact.email).where(Contact.user_id == user_id, Contact.email.in_(emails))
+    )).all())
+    accepted = []
+    for line_number, values in rows:
+        if values["email"] in taken:
+            failures.append((line_number, f"email: {values['email']} already exists"))
+            continue
+        taken.add(values["email"])
+        accepted.append((line_number, values))
+    if not accepted:
+        return failures
+
+    try:
+        await db.execute(insert(Contact), [values for _, values in accepted])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        for line_number, values in accepted:
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(Contact), [values])
+            except IntegrityError as exc:
+                failures.append((line_number, _integrity_error_message(exc)))
+        await db.commit()
+    return failures
+
+
+@router.post("/bulk", response_model=BulkImportResult)
+@limiter.limit(BULK_IMPORT_RATE_LIMIT)
+async def bulk_import_contacts(request: Request, format: Optional[str] = None,
+                               db: AsyncSession = Depends(get_async_db),
+                               current_user: Principal = Depends(get_current_principal)):
     """
-    Retrieves a list of contacts for the current user.
+    Imports contacts from a streamed CSV or NDJSON request body.
+
+    The body is parsed incrementally and validated with ``ContactCreate`` in chunks; each
+    chunk is written with one multi-row INSERT and committed, so memory use does not grow
+    with the size of the upload. CSV bodies need a header row naming the contact fields.
 
     Args:
-        skip (int): The number of records to skip.
+        request (Request): The incoming request whose body is streamed.
+        format (Optional[str]): ``csv`` or ``ndjson``; defaults to the request content type.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        BulkImportResult: The number of inserted and failed rows, with per-line errors.
+    """
+    fmt = detect_format(request.headers.get("content-type"), format)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson",
+        )
+
+    inserted = 0
+    failures = []
+    failed = 0
+    records = iter_records(iter_lines(request.stream()), fmt)
+    try:
+        async for chunk in iter_chunks(records):
+            valid, errors = validate_chunk(chunk)
+            rows = [
+                (line_number, {
+                    **contact.dict(),
+                    "birthday_doy": birthday_day_of_year(contact.birthday),
+                    "user_id": current_user.id,
+                })
+                for line_number, contact in valid
+            ]
+            insert_errors = await _insert_contact_rows(db, current_user.id, rows) if rows else []
+            inserted += len(rows) - len(insert_errors)
+            errors += insert_errors
+            failed += len(errors)
+            failures.extend(sorted(errors)[:MAX_REPORTED_IMPORT_ERRORS - len(failures)])
+    finally:
+        await invalidate_contacts(current_user.id)
+
+    return BulkImportResult(
+        inserted=inserted,
+        failed=failed,
+        errors=[BulkImportError(line=line, error=error) for line, error in failures],
+    )
+
+
+# Sparse responses are encoded directly, so the route has no response model; the
+# documented schema is the full contact, of which ``fields`` selects a subset.
+SPARSE_CONTACTS_RESPONSES = {
+    200: {
+        "model": List[ContactResponse],
+        "description": "Contacts with only the fields named in ``fields``. The ID is always "
+                       "included; fields that were not requested are left out.",
+    },
+}
+
+
+def _next_cursor(rows, limit: int) -> Optional[str]:
+    # A NULL last name cannot be compared in the keyset condition, so such a row
+    # cannot end a cursor page; clients fall back to ``skip``.
+    if rows and len(rows) == limit and rows[-1].last_name is not None:
+        return encode_cursor(rows[-1].last_name, rows[-1].id)
+    return None
+
+
+@router.get("/", response_model=None, response_class=FastJSONResponse, responses=SPARSE_CONTACTS_RESPONSES)
+async def list_contacts(request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                        fields: Optional[str] = None,
+                        db: AsyncSession = Depends(get_read_db),
+                        current_user: Principal = Depends(get_current_principal)):
+    """
+    Retrieves a list of contacts for the current user, ordered by last name and ID.
+
+    Pages can be fetched either by offset (``skip``) or by keyset (``cursor``). When a
+    full page is returned, the cursor of the next page is sent in the ``X-Next-Cursor``
+    header; passing it back as ``cursor`` costs the same at any depth. Pages are cached
+    in Redis until the user's contacts change.
+
+    Every page carries an ETag derived from the IDs and row versions it contains. A
+    matching ``If-None-Match`` is answered with 304 after reading only those two columns.
+
+    Only the requested ``fields`` are selected, as plain rows, and encoded straight to
+    JSON without building ORM objects or response models.
+
+    Args:
+        request (Request): The incoming request, checked for ``If-None-Match``.
+        skip (int): The number of records to skip. Ignored when ``cursor`` is given.
         limit (int): The maximum number of records to return.
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        cursor (Optional[str]): An opaque cursor returned by a previous page.
+        fields (Optional[str]): Comma-separated contact fields to return; all by default.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
-        List[ContactResponse]: A list of contacts.
+        FastJSONResponse: The contacts, each holding only the requested fields.
+    """
+    names = parse_fields(fields)
+    if_none_match = request.headers.get("if-none-match")
+    cached, cache_version = await get_cached_contacts(current_user.id, "list_fields", skip, limit, cursor, ",".join(names))
+    if cached is not None:
+        headers = {"X-Next-Cursor": cached["next_cursor"]} if cached["next_cursor"] else {}
+        if etag_matches(if_none_match, cached["etag"]):
+            return not_modified(cached["etag"], headers)
+        return FastJSONResponse(cached["items"], headers={**headers, "ETag": cached["etag"]})
+
+    query = (
+        select(Contact)
+        .where(Contact.user_id == current_user.id)
+        .order_by(Contact.last_name, Contact.id)
+        .limit(limit)
+    )
+    if cursor:
+        last_name, last_id = decode_cursor(cursor, (str, int))
+        query = query.where(tuple_(Contact.last_name, Contact.id) > tuple_(last_name, last_id))
+    else:
+        query = query.offset(skip)
+
+    if if_none_match:
+        rows = (await db.execute(query.with_only_columns(Contact.id, Contact.version, Contact.last_name))).all()
+        etag = versions_etag(rows, names)
+        if etag_matches(if_none_match, etag):
+            next_cursor = _next_cursor(rows, limit)
+            return not_modified(etag, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+    rows = (await db.execute(
+        query.with_only_columns(*contact_columns(names, ("version", "last_name")))
+    )).all()
+    etag = versions_etag(((row.id, row.version) for row in rows), names)
+    next_cursor = _next_cursor(rows, limit)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    items = rows_to_dicts(rows, names)
+    await set_cached_contacts(current_user.id, "list_fields", skip, limit, cursor, ",".join(names),
+                              value={"items": items, "next_cursor": next_cursor, "etag": etag},
+                              version=cache_version)
+    return FastJSONResponse(items, headers={**headers, "ETag": etag})
+
+
+EXPORT_BATCH_SIZE = 500
+
+
+@router.get("/export")
+@limiter.limit(EXPORT_RATE_LIMIT)
+async def export_contacts(
+        request: Request,
+        format: Literal["csv", "ndjson", "vcard"] = "csv",
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        email: Optional[str] = None,
+        q: Optional[str] = Query(None, min_length=MIN_QUERY_LENGTH),
+        current_user: Principal = Depends(get_current_principal)
+):
     """
-    return db.query(Contact).filter(Contact.user_id == current_user).offset(skip).limit(limit).all()
+    Streams the current user's contacts as CSV, NDJSON or vCard.
+
+    Accepts the same filters as :func:`search_contacts`. Rows are read from a server-side
+    cursor in batches, so memory use stays flat however large the address book is. The
+    stream uses its own session because the request-scoped one is closed before the
+    response body is sent.
+
+    Args:
+        request (Request): The incoming request, used for rate limiting.
+        format (str): The export format: ``csv``, ``ndjson`` or ``vcard``.
+        first_name (Optional[str]): The first name to filter by.
+        last_name (Optional[str]): The last name to filter by.
+        email (Optional[str]): The email to filter by.
+        q (Optional[str]): A free-text query matched against names and email.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        StreamingResponse: The exported contacts as a file download.
+    """
+    formatter = FORMATTERS[format]
+    user_id = current_user.id
+
+    async def generate():
+        if format == "csv":
+            yield csv_header()
+        async with (await read_sessionmaker(request))() as db:
+            query = apply_search_filters(
+                select(Contact).where(Contact.user_id == user_id),
+                db.bind.dialect.name,
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                q=q,
+            )
+            result = await db.stream_scalars(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for batch in result.partitions():
+                yield formatter(batch)
+
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{FILE_EXTENSIONS[format]}"'},
+    )
+
+
+def _update_values(changes: dict) -> dict:
+    """
+    Builds the SET clause of a Core UPDATE of contacts, which bypasses the ORM: keeps
+    ``birthday_doy`` in sync and bumps the row version.
+    """
+    values = dict(changes, version=Contact.version + 1)
+    if "birthday" in values:
+        values["birthday_doy"] = birthday_day_of_year(values["birthday"])
+    return values
+
+
+def _batch_results(ids: List[int], outcomes: Dict[int, ContactBatchOutcome]) -> ContactBatchResult:
+    return ContactBatchResult(results=[
+        outcomes.get(contact_id) or ContactBatchOutcome(id=contact_id, status="not_found") for contact_id in ids
+    ])
+
+
+@router.patch("/batch", response_model=ContactBatchResult)
+async def batch_update_contacts(batch: ContactBatchUpdate, db: AsyncSession = Depends(get_async_db),
+                                current_user: Principal = Depends(get_current_principal)):
+    """
+    Applies partial updates to many contacts in one transaction.
+
+    Items that change the same fields to the same values are applied together with one
+    ``UPDATE ... WHERE id IN (...) AND user_id = ... RETURNING`` statement, so a cleanup
+    that touches thousands of contacts the same way costs a single round trip. Each
+    statement runs in a savepoint: if it violates a constraint (e.g. a duplicate email),
+    its contacts are reported as conflicts and the rest of the batch is still committed.
+
+    Args:
+        batch (ContactBatchUpdate): The contact IDs with the fields to change.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        ContactBatchResult: The outcome and new version of every contact, in request order.
+    """
+    ids = [item.id for item in batch.items]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Duplicate contact IDs")
+
+    groups: Dict[tuple, List[int]] = {}
+    for item in batch.items:
+        groups.setdefault(tuple(sorted(item.changes().items())), []).append(item.id)
+
+    outcomes = {}
+    for changes, group_ids in groups.items():
+        statement = (
+            update(Contact)
+            .where(Contact.id.in_(group_ids), Contact.user_id == current_user.id)
+            .values(**_update_values(dict(changes)))
+            .returning(Contact.id, Contact.version)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with db.begin_nested():
+                rows = (await db.execute(statement)).all()
+        except IntegrityError as exc:
+            for contact_id in group_ids:
+                outcomes[contact_id] = ContactBatchOutcome(id=contact_id, status="conflict",
+                                                           error=_integrity_error_message(exc))
+            continue
+        for contact_id, version in rows:
+            outcomes[contact_id] = ContactBatchOutcome(id=contact_id, status="updated", version=version)
+    await db.commit()
+    await invalidate_contacts(current_user.id)
+    return _batch_results(ids, outcomes)
+
+
+@router.delete("/batch", response_model=ContactBatchResult)
+async def batch_delete_contacts(batch: ContactBatchDelete, db: AsyncSession = Depends(get_async_db),
+                                current_user: Principal = Depends(get_current_principal)):
+    """
+    Deletes many contacts with one ``DELETE ... WHERE id IN (...) AND user_id = ...``
+    statement.
+
+    Args:
+        batch (ContactBatchDelete): The IDs of the contacts to delete.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        ContactBatchResult: Whether every contact was deleted or not found, in request order.
+    """
+    ids = list(dict.fromkeys(batch.ids))
+    deleted = (await db.scalars(
+        delete(Contact)
+        .where(Contact.id.in_(ids), Contact.user_id == current_user.id)
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    await invalidate_contacts(current_user.id)
+    return _batch_results(ids, {
+        contact_id: ContactBatchOutcome(id=contact_id, status="deleted") for contact_id in deleted
+    })
+
+
+@router.get("/duplicates", response_model=DuplicateSuggestions)
+async def suggest_duplicates(threshold: float = Query(DEDUP_THRESHOLD, ge=0.5, le=1),
+                             db: AsyncSession = Depends(get_read_db),
+                             current_user: Principal = Depends(get_current_principal)):
+    """
+    Suggests groups of the current user's contacts that look like the same person.
+
+    Only the columns used for matching are read. Candidates are blocked by normalized
+    email, phone and name keys, so the work grows with the number of likely pairs rather
+    than all pairs; matching runs on a worker thread. Suggestions are cached until the
+    user's contacts change. Apply them with ``POST /contacts/merge``.
+
+    Args:
+        threshold (float): The lowest similarity score that counts as a match.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        DuplicateSuggestions: The suggested merge groups.
+    """
+    cached, cache_version = await get_cached_contacts(current_user.id, "duplicates", threshold)
+    if cached is not None:
+        return cached
+
+    rows = (await db.execute(
+        select(Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone_number,
+               Contact.birthday, Contact.additional_info)
+        .where(Contact.user_id == current_user.id)
+    )).all()
+    suggestions = {"groups": await run_in_threadpool(find_duplicates, rows, threshold)}
+    await set_cached_contacts(current_user.id, "duplicates", threshold, value=suggestions, version=cache_version)
+    return suggestions
+
+
+@router.post("/merge", response_model=ContactMergeResult)
+async def merge_contacts(merge: ContactMerge, response: Response, db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_principal)):
+    """
+    Merges duplicates into a primary contact in one transaction.
+
+    Blank fields of the primary are filled from the duplicates, in the order given, and
+    their additional info is appended; then the duplicates are deleted and the primary
+    is updated with its version bumped. Duplicate IDs that do not exist are ignored.
+
+    Args:
+        merge (ContactMerge): The contact to keep and the contacts to merge into it.
+        response (Response): The outgoing response, used to set the new ETag.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        ContactMergeResult: The merged contact and the IDs that were merged into it.
+    """
+    duplicate_ids = list(dict.fromkeys(merge.duplicate_ids))
+    if merge.primary_id in duplicate_ids:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="The primary contact cannot be merged into itself")
+
+    contacts = {
+        contact.id: contact
+        for contact in (await db.scalars(
+            select(Contact).where(Contact.id.in_([merge.primary_id, *duplicate_ids]),
+                                  Contact.user_id == current_user.id)
+        )).all()
+    }
+    primary = contacts.get(merge.primary_id)
+    if primary is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    duplicates = [contacts[contact_id] for contact_id in duplicate_ids if contact_id in contacts]
+    changes = merge_values(primary, duplicates)
+
+    # Delete first, so the primary can take over a duplicate's email.
+    merged_ids = [duplicate.id for duplicate in duplicates]
+    if merged_ids:
+        await db.execute(
+            delete(Contact).where(Contact.id.in_(merged_ids)).execution_options(synchronize_session=False)
+        )
+    db_contact = await db.scalar(
+        update(Contact)
+        .where(Contact.id == primary.id)
+        .values(**_update_values(changes))
+        .returning(Contact)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    await db.commit()
+    await invalidate_contacts(current_user.id)
+    response.headers["ETag"] = contact_etag(db_contact.id, db_contact.version)
+    return {"contact": _serialize_contacts([db_contact])[0], "merged_ids": merged_ids}
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
-def get_contact(contact_id: int, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def get_contact(contact_id: int, request: Request, response: Response,
+                      db: AsyncSession = Depends(get_read_db),
+                      current_user: Principal = Depends(get_current_principal)):
     """
     Retrieves a specific contact by ID.
 
+    The response carries a strong ETag built from the contact's row version. A matching
+    ``If-None-Match`` is answered with 304 after reading only the version column.
+
     Args:
         contact_id (int): The ID of the contact to retrieve.
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        request (Request): The incoming request, checked for ``If-None-Match``.
+        response (Response): The outgoing response, used to set the ETag.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
         ContactResponse: The requested contact.
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user).first()
+    if_none_match = request.headers.get("if-none-match")
+    cached, cache_version = await get_cached_contacts(current_user.id, "contact_version", contact_id)
+    if cached is None and if_none_match:
+        version = await db.scalar(
+            select(Contact.version).where(Contact.id == contact_id, Contact.user_id == current_user.id)
+        )
+        if version is not None and etag_matches(if_none_match, contact_etag(contact_id, version)):
+            return not_modified(contact_etag(contact_id, version))
+    if cached is not None:
+        etag = contact_etag(contact_id, cached["version"])
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+        return cached["item"]
+
+    contact = await db.scalar(
+        select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id)
+    )
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
-    return contact
+    item = _serialize_contacts([contact])[0]
+    response.headers["ETag"] = contact_etag(contact.id, contact.version)
+    await set_cached_contacts(current_user.id, "contact_version", contact_id,
+                              value={"item": item, "version": contact.version}, version=cache_version)
+    return item
 
 
 @router.put("/{contact_id}", response_model=ContactResponse)
-def update_contact(contact_id: int, contact: ContactCreate, db: Session = Depends(get_db),
-                   current_user: str = Depends(get_current_user)):
+async def update_contact(contact_id: int, contact: ContactCreate, response: Response,
+                         db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_principal)):
     """
     Updates an existing contact.
 
     Args:
         contact_id (int): The ID of the contact to update.
         contact (ContactCreate): The updated contact data.
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        response (Response): The outgoing response, used to set the new ETag.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
         ContactResponse: The updated contact.
     """
-    db_contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user).first()
+    db_contact = await db.scalar(
+        select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id)
+    )
     if not db_contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     for key, value in contact.dict().items():
         setattr(db_contact, key, value)
-    db.commit()
-    db.refresh(db_contact)
+    try:
+        await db.commit()
+    except StaleDataError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact was modified concurrently")
+    await db.refresh(db_contact)
+    await invalidate_contacts(current_user.id)
+    response.headers["ETag"] = contact_etag(db_contact.id, db_contact.version)
+    return db_contact
+
+
+@router.patch("/{contact_id}", response_model=ContactResponse)
+async def patch_contact(contact_id: int, patch: ContactPatch, response: Response,
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: Principal = Depends(get_current_principal)):
+    """
+    Partially updates a contact with a single ``UPDATE ... RETURNING`` statement.
+
+    Only the fields present in the body are written; a body without any contact field
+    is rejected with 422 rather than bumping the version. When ``expected_version`` is
+    given, the update only applies if the contact is still at that version, otherwise
+    409 is returned so the client can re-read and retry.
+
+    Args:
+        contact_id (int): The ID of the contact to update.
+        patch (ContactPatch): The fields to change and the optional expected version.
+        response (Response): The outgoing response, used to set the new ETag.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
+
+    Returns:
+        ContactResponse: The updated contact.
+    """
+    changes = patch.changes()
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No fields to update")
+    statement = (
+        update(Contact)
+        .where(Contact.id == contact_id, Contact.user_id == current_user.id)
+        .values(**_update_values(changes))
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    if patch.expected_version is not None:
+        statement = statement.where(Contact.version == patch.expected_version)
+    try:
+        db_contact = await db.scalar(statement)
+    except IntegrityError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=_integrity_error_message(exc))
+    if db_contact is None:
+        # Only failed updates pay for a second query to tell the two cases apart.
+        exists = await db.scalar(
+            select(Contact.id).where(Contact.id == contact_id, Contact.user_id == current_user.id)
+        )
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Contact not found")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact version does not match")
+    await db.commit()
+    await invalidate_contacts(current_user.id)
+    response.headers["ETag"] = contact_etag(db_contact.id, db_contact.version)
     return db_contact
 
 
 @router.delete("/{contact_id}")
-def delete_contact(contact_id: int, db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_async_db),
+                         current_user: Principal = Depends(get_current_principal)):
     """
     Deletes a contact by ID.
 
     Args:
         contact_id (int): The ID of the contact to delete.
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
         dict: A message indicating the contact was deleted.
     """
-    db_contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user).first()
+    db_contact = await db.scalar(
+        select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id)
+    )
     if not db_contact:
         raise HTTPException(status_code=404, detail="Contact not found")
-    db.delete(db_contact)
-    db.commit()
+    await db.delete(db_contact)
+    try:
+        await db.commit()
+    except StaleDataError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Contact was modified concurrently")
+    await invalidate_contacts(current_user.id)
     return {"detail": "Contact deleted"}
 
 
-@router.get("/search/", response_model=List[ContactResponse])
-def search_contacts(
+@router.get("/search/", response_model=None, response_class=FastJSONResponse,
+            responses=SPARSE_CONTACTS_RESPONSES)
+async def search_contacts(
         first_name: Optional[str] = None,
         last_name: Optional[str] = None,
         email: Optional[str] = None,
-        db: Session = Depends(get_db),
-        current_user: str = Depends(get_current_user)
+        q: Optional[str] = Query(None, min_length=MIN_QUERY_LENGTH),
+        limit: int = Query(50, ge=1, le=500),
+        fields: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: Principal = Depends(get_current_principal)
 ):
     """
     Searches for contacts based on the provided criteria.
 
+    Only the requested ``fields`` are selected and encoded, as in :func:`list_contacts`.
+
     Args:
         first_name (Optional[str]): The first name to search for.
         last_name (Optional[str]): The last name to search for.
         email (Optional[str]): The email to search for.
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        q (Optional[str]): A free-text query matched against names and email, ranked by relevance.
+            At least ``MIN_QUERY_LENGTH`` characters long.
+        limit (int): The maximum number of records to return.
+        fields (Optional[str]): Comma-separated contact fields to return; all by default.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
-        List[ContactResponse]: A list of contacts matching the search criteria.
+        FastJSONResponse: The matching contacts, each holding only the requested fields.
     """
-    query = db.query(Contact).filter(Contact.user_id == current_user)
-    if first_name:
-        query = query.filter(Contact.first_name.ilike(f"%{first_name}%"))
-    if last_name:
-        query = query.filter(Contact.last_name.ilike(f"%{last_name}%"))
-    if email:
-        query = query.filter(Contact.email.ilike(f"%{email}%"))
-    return query.all()
+    names = parse_fields(fields)
+    query = apply_search_filters(
+        select(*contact_columns(names)).where(Contact.user_id == current_user.id),
+        db.bind.dialect.name,
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        q=q,
+    )
+    rows = (await db.execute(query.limit(limit))).all()
+    return FastJSONResponse(rows_to_dicts(rows, names))
 
 
 @router.get("/upcoming_birthdays/", response_model=List[ContactResponse])
-def get_upcoming_birthdays(db: Session = Depends(get_db), current_user: str = Depends(get_current_user)):
+async def get_upcoming_birthdays(days: int = Query(7, ge=0, le=366), db: AsyncSession = Depends(get_read_db),
+                                 current_user: Principal = Depends(get_current_principal)):
     """
-    Retrieves contacts with upcoming birthdays within the next 7 days.
+    Retrieves contacts with birthdays within the next ``days`` days, including today.
 
     Args:
-        db (Session): The database session.
-        current_user (str): The current authenticated user.
+        days (int): The size of the window in days.
+        db (AsyncSession): The database session.
+        current_user (Principal): The current authenticated user.
 
     Returns:
         List[ContactResponse]: A list of contacts with upcoming birthdays.
     """
     today = date.today()
-    next_week = today + timedelta(days=7)
-    return db.query(Contact).filter(
-        Contact.user_id == current_user,
-        or_(
-            and_(
-                extract('month', Contact.birthday) == today.month,
-                extract('day', Contact.birthday) >= today.day
-            ),
-            and_(
-                extract('month', Contact.birthday) == next_week.month,
-                extract('day', Contact.birthday) <= next_week.day
-            )
-        )
-    ).all()
+    cached, cache_version = await get_cached_contacts(current_user.id, "birthdays", today.isoformat(), days)
+    if cached is not None:
+        return cached
+
+    result = await db.scalars(select(Contact).where(
+        Contact.user_id == current_user.id,
+        upcoming_birthdays_condition(today, days),
+    ))
+    items = _serialize_contacts(result.all())
+    await set_cached_contacts(current_user.id, "birthdays", today.isoformat(), days, value=items,
+                              version=cache_version)
+    return items
@@ -1,14 +1,20 @@
-from jose import jwt, JWTError
+from datetime import timedelta
 
-from utils.email_utils import send_email
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import create_access_token, get_password_hash
-from database import get_db
+from auth import create_access_token, decode_access_token
+from cache import invalidate_cached_user
+from database import get_async_db
+from email_outbox import enqueue_email
+from hashing import hash_password_async
 from models import User
+from rate_limit import PASSWORD_RESET_RATE_LIMIT, limiter
 from schemas import PasswordResetRequest, PasswordResetConfirm
 
+RESET_TOKEN_PURPOSE = "password_reset"
+
 router = APIRouter(
     prefix="/password-reset",
     tags=["password-reset"]
@@ -16,20 +22,27 @@ router = APIRouter(
 
 
 @router.post("/request")
-def request_password_reset(data: PasswordResetRequest, db: Session = Depends(get_db)):
+@limiter.limit(PASSWORD_RESET_RATE_LIMIT)
+async def request_password_reset(request: Request, data: PasswordResetRequest, background_tasks: BackgroundTasks,
+                                 db: AsyncSession = Depends(get_async_db)):
     """
-    Requests a password reset by sending a token to the user's email.
+    Requests a password reset by queueing an email with a token to the user.
     """
-    user = db.query(User).filter(User.username == data.email).first()
+    user = await db.scalar(select(User).where(User.username == data.email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User with this email does not exist"
         )
 
-    reset_token = create_access_token(data={"sub": user.username}, expires_delta=timedelta(minutes=15))
+    # The token version makes the token single-use: the reset bumps it.
+    reset_token = create_access_token(
+        data={"sub": user.username, "ver": user.token_version, "purpose": RESET_TOKEN_PURPOSE},
+        expires_delta=timedelta(minutes=15),
+    )
 
-    send_email(
+    await enqueue_email(
+        background_tasks,
         to=user.username,
         subject="Password Reset Request",
         body=f"Use this token to reset your password: {reset_token}"
@@ -38,22 +51,31 @@ def request_password_reset(data: PasswordResetRequest, db: Session = Depends(get
 
 
 @router.post("/confirm")
-def confirm_password_reset(data: PasswordResetConfirm, db: Session = Depends(get_db)):
+async def confirm_password_reset(data: PasswordResetConfirm, db: AsyncSession = Depends(get_async_db)):
     """
     Confirms the password reset using the token.
+
+    The token is rejected once the user's token version has moved on, so it cannot be
+    used again after a successful reset.
     """
     try:
-        payload = jwt.decode(data.token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
-    except JWTError:
+        payload = decode_access_token(data.token)
+    except HTTPException:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
+    username = payload.get("sub")
+    if username is None or payload.get("purpose") != RESET_TOKEN_PURPOSE:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
 
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if payload.get("ver") != user.token_version:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
 
-    user.hashed_password = get_password_hash(data.new_password)
-    db.commit()
+    user.hashed_password = await hash_password_async(data.new_password)
+    # Revokes every access token issued before the reset.
+    user.token_version = User.token_version + 1
+    await db.commit()
+    await db.refresh(user, ["token_version"])
+    await invalidate_cached_user(user.username, token_version=user.token_version)
     return {"message": "Password has been reset successfully."}
@@ -1,70 +1,79 @@
 from datetime import timedelta
 
-import cloudinary.uploader
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, File, UploadFile
+from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-
-from auth import get_current_user, get_password_hash, authenticate_user, create_access_token, \
-    ACCESS_TOKEN_EXPIRE_MINUTES
-from database import get_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import Principal, get_current_principal, get_current_user_profile, authenticate_user, create_access_token, \
+    user_token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
+from cache import invalidate_cached_user
+from database import get_async_db, get_read_db
+from hashing import hash_password_async
 from models import User, UserRole
+from rate_limit import LOGIN_RATE_LIMIT, limiter
 from schemas import UserCreate, UserResponse
+from utils.avatars import AVATAR_CACHE_MAX_AGE, AVATAR_SIZES, delete_variants, get_avatar_storage, read_upload, \
+    resize_variants, store_variants, variant_name
+from utils.etags import content_etag, etag_matches, not_modified
 
 router = APIRouter(
     prefix="/users",
     tags=["users"]
 )
 
-router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-
-
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Registers a new user.
 
     Args:
         user (UserCreate): The user data to register.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         UserResponse: The registered user.
     """
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await db.scalar(select(User).where(User.username == user.username))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="User with this username already exists"  # Updated message
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password_async(user.password)
     new_user = User(
         username=user.username,
         hashed_password=hashed_password,
         role=UserRole.user
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 
 @router.post("/token")
-def login_for_access_token(
+@limiter.limit(LOGIN_RATE_LIMIT)
+async def login_for_access_token(
+        request: Request,
         form_data: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticates a user and generates an access token.
 
     Args:
+        request (Request): The incoming request, used for rate limiting.
         form_data (OAuth2PasswordRequestForm): The login form data.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: The access token and token type.
     """
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -74,7 +83,7 @@ def login_for_access_token(
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)  # Use env variable
     access_token = create_access_token(
-        data={"sub": user.username},
+        data=user_token_claims(user),
         expires_delta=access_token_expires
     )
 
@@ -82,36 +91,94 @@ def login_for_access_token(
 
 
 @router.get("/me", response_model=UserResponse)
-def read_current_user(current_user: User = Depends(get_current_user)):
+async def read_current_user(request: Request, response: Response,
+                            current_user: dict = Depends(get_current_user_profile)):
     """
     Retrieve the currently authenticated user.
 
+    The response carries an ETag of the user's profile; a matching ``If-None-Match`` is
+    answered with 304.
+
     Args:
-        current_user (User): The authenticated user object.
+        request (Request): The incoming request, checked for ``If-None-Match``.
+        response (Response): The outgoing response, used to set the ETag.
+        current_user (dict): The cached profile of the authenticated user.
 
     Returns:
         UserResponse: The details of the authenticated user.
     """
-    return current_user
+    body = UserResponse.model_validate(current_user)
+    etag = content_etag(body.model_dump(mode="json"))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return body
 
 
 @router.put("/me/avatar")
-def update_avatar(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):  # Allow all users
+async def update_avatar(file: UploadFile = File(...),
+                        db: AsyncSession = Depends(get_async_db),
+                        current_user: Principal = Depends(get_current_principal)):  # Allow all users
     """
     Update the avatar of the currently authenticated user.
 
+    The upload is read up to ``AVATAR_MAX_BYTES``, cropped and resized to every size in
+    ``AVATAR_SIZES`` on a worker thread and saved through the configured storage backend.
+    The thumbnails of the previous avatar are deleted afterwards.
+
     Args:
         file (UploadFile): The uploaded avatar file.
-        current_user (User): The authenticated user object.
+        db (AsyncSession): The database session.
+        current_user (Principal): The authenticated user.
 
     Returns:
-        dict: A dictionary containing the URL of the uploaded avatar.
+        dict: The URL of the largest thumbnail and the URLs of every size.
     """
-    result = cloudinary.uploader.upload(
-        file.file,
-        folder="user_avatars",
-        public_id=f"user_{current_user.username}_avatar",
-        overwrite=True,
-        resource_type="image"
+    data = await read_upload(file)
+    digest, variants = await run_in_threadpool(resize_variants, data)
+    storage = get_avatar_storage()
+    key = f"user_{current_user.id}/{digest}"
+    urls = await run_in_threadpool(store_variants, storage, key, variants)
+    avatar_url = urls[max(urls)]
+
+    previous_key = await db.scalar(select(User.avatar_key).where(User.id == current_user.id))
+    await db.execute(
+        update(User).where(User.id == current_user.id).values(avatar_url=avatar_url, avatar_key=key)
     )
-    return {"avatar_url": result.get("secure_url")}
+    await db.commit()
+    await invalidate_cached_user(current_user.username)
+    if previous_key != key:
+        await run_in_threadpool(delete_variants, storage, previous_key)
+    return {"avatar_url": avatar_url, "sizes": urls}
+
+
+@router.get("/{user_id}/avatar")
+async def get_avatar(user_id: int, request: Request, size: int = Query(max(AVATAR_SIZES)),
+                     db: AsyncSession = Depends(get_read_db)):
+    """
+    Redirects to a user's avatar thumbnail.
+
+    Thumbnails are stored under a key derived from the uploaded image, so their URLs never
+    change content: the redirect carries an ETag and may be cached, and a matching
+    ``If-None-Match`` is answered with 304.
+
+    Args:
+        user_id (int): The ID of the user.
+        request (Request): The incoming request.
+        size (int): One of the configured thumbnail sizes.
+        db (AsyncSession): The database session.
+
+    Returns:
+        RedirectResponse: A redirect to the thumbnail, or an empty 304 response.
+    """
+    if size not in AVATAR_SIZES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported avatar size")
+    key = await db.scalar(select(User.avatar_key).where(User.id == user_id))
+    if key is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Avatar not found")
+
+    etag = f'"{variant_name(key, size)}"'
+    headers = {"Cache-Control": f"public, max-age={AVATAR_CACHE_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, headers)
+    return RedirectResponse(get_avatar_storage().url(variant_name(key, size)), headers={**headers, "ETag": etag})
@@ -1,8 +1,10 @@
 from datetime import date
-from typing import Optional
+from enum import Enum
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, EmailStr
-from sqlalchemy import Enum
+from pydantic import BaseModel, EmailStr, Field, model_validator
+
+MAX_BATCH_SIZE = 1000
 
 
 class ContactCreate(BaseModel):
@@ -21,6 +23,85 @@ class ContactResponse(ContactCreate):
         orm_mode = True
 
 
+class ContactUpdate(BaseModel):
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    birthday: Optional[date] = None
+    additional_info: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_required_fields_not_null(self):
+        # Only the fields that were sent are applied; the ones ContactCreate requires
+        # may be left out but not cleared.
+        for name in ("first_name", "last_name", "email", "phone_number"):
+            if name in self.model_fields_set and getattr(self, name) is None:
+                raise ValueError(f"{name} cannot be null")
+        return self
+
+    def changes(self) -> dict:
+        return self.model_dump(exclude_unset=True, include=set(ContactUpdate.model_fields))
+
+
+class ContactPatch(ContactUpdate):
+    expected_version: Optional[int] = None
+
+
+class ContactBatchUpdateItem(ContactUpdate):
+    id: int
+
+
+class ContactBatchUpdate(BaseModel):
+    items: List[ContactBatchUpdateItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ContactBatchDelete(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ContactBatchOutcome(BaseModel):
+    id: int
+    status: Literal["updated", "deleted", "not_found", "conflict"]
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class ContactBatchResult(BaseModel):
+    results: List[ContactBatchOutcome]
+
+
+class DuplicateGroup(BaseModel):
+    contact_ids: List[int]
+    primary_id: int
+    score: float
+
+
+class DuplicateSuggestions(BaseModel):
+    groups: List[DuplicateGroup]
+
+
+class ContactMerge(BaseModel):
+    primary_id: int
+    duplicate_ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ContactMergeResult(BaseModel):
+    contact: ContactResponse
+    merged_ids: List[int]
+
+
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
+
 class UserCreate(BaseModel):
     username: EmailStr
     password: str
@@ -0,0 +1,31 @@
+from benchmarks.report import compare, percentile, summarize
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize():
+    results = summarize({"list": [0.03, 0.01, 0.02]}, {"list": 1, "create": 2}, elapsed=2.0)
+
+    assert results["list"] == {
+        "requests": 3, "errors": 1, "rps": 1.5, "p50_ms": 20.0, "p95_ms": 30.0, "p99_ms": 30.0, "max_ms": 30.0,
+    }
+    assert results["create"]["requests"] == 0
+    assert results["create"]["errors"] == 2
+
+
+def test_compare_flags_latency_throughput_and_error_regressions():
+    baseline = {"list": {"p95_ms": 10.0, "rps": 100.0, "errors": 0}}
+
+    assert compare(baseline, {"list": {"p95_ms": 11.0, "rps": 90.0, "errors": 0}}, tolerance=0.2) == []
+    assert compare(baseline, {"list": {"p95_ms": 13.0, "rps": 70.0, "errors": 1}}, tolerance=0.2) == [
+        "list: p95 10.0 ms -> 13.0 ms",
+        "list: rps 100.0 -> 70.0",
+        "list: errors 0 -> 1",
+    ]
+    assert compare(baseline, {}, tolerance=0.2) == []
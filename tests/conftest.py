@@ -0,0 +1,79 @@
+import socketserver
+import threading
+
+import pytest
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib to deliver plain-text messages."""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost stand-in SMTP")
+        envelope = {}
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "MAIL":
+                envelope = {"from": line[10:].strip("<>"), "to": []}
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipient = line[8:].strip("<>")
+                if recipient in server.rejected:
+                    self.reply("550 No such user")
+                else:
+                    envelope["to"].append(recipient)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in self.rfile:
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw.decode())
+                envelope["data"] = "".join(data)
+                server.messages.append(envelope)
+                self.reply("250 OK")
+            elif command == "RSET":
+                envelope = {}
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.rejected = set()
+        self.connections = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+@pytest.fixture
+def smtp_server():
+    server = StandInSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -1,6 +1,25 @@
+import csv
+import datetime
+import functools
+import io
+import json
+import uuid
+
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
+import models  # noqa: F401, registers the tables created by init_db
+import routers.contacts as contacts_router
+from auth import Principal, get_current_principal
+from database import engine, init_db
 from main import app
+from models import UserRole
+from rate_limit import limiter
+from utils.bulk_import import MAX_LINE_LENGTH, iter_chunks
+from utils.pagination import encode_cursor
+from utils.search import MIN_QUERY_LENGTH
 
 client = TestClient(app)
 
@@ -34,3 +53,443 @@ def test_list_contacts():
     )
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+
+@pytest.fixture
+def owner():
+    init_db()
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=1, username="etaguser",
+                                                                        role=UserRole.user)
+    yield
+    app.dependency_overrides.pop(get_current_principal, None)
+
+
+def test_get_contact_conditional(owner):
+    response = client.post("/contacts/", json={
+        "first_name": "Etag", "last_name": "Contact", "email": f"{uuid.uuid4().hex}@example.com",
+        "phone_number": "123",
+    })
+    contact_id = response.json()["id"]
+
+    response = client.get(f"/contacts/{contact_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/contacts/{contact_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    response = client.put(f"/contacts/{contact_id}", json={
+        "first_name": "Etag", "last_name": "Changed", "email": f"{uuid.uuid4().hex}@example.com",
+        "phone_number": "123",
+    })
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = client.get(f"/contacts/{contact_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["last_name"] == "Changed"
+
+
+def test_list_contacts_conditional(owner):
+    response = client.get("/contacts/", params={"limit": 1000})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/contacts/", params={"limit": 1000}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post("/contacts/", json={
+        "first_name": "Etag", "last_name": "Listed", "email": f"{uuid.uuid4().hex}@example.com",
+        "phone_number": "123",
+    })
+    response = client.get("/contacts/", params={"limit": 1000}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def _create_contacts(count: int) -> list:
+    return [
+        client.post("/contacts/", json={
+            "first_name": "Batch", "last_name": f"Contact{index}", "email": f"{uuid.uuid4().hex}@example.com",
+            "phone_number": "123",
+        }).json()["id"]
+        for index in range(count)
+    ]
+
+
+def test_list_contacts_rejects_invalid_cursors(owner):
+    for cursor in (encode_cursor(None, 1), encode_cursor("Doe", "1"), "not-a-cursor"):
+        response = client.get("/contacts/", params={"cursor": cursor})
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_batch_update_contacts(owner):
+    first, second, third = _create_contacts(3)
+    response = client.patch("/contacts/batch", json={"items": [
+        {"id": first, "last_name": "Cleaned", "birthday": "1990-03-01"},
+        {"id": second, "last_name": "Cleaned", "birthday": "1990-03-01"},
+        {"id": third, "additional_info": "Merged"},
+        {"id": 10 ** 9, "last_name": "Cleaned"},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(result["id"], result["status"]) for result in results] == [
+        (first, "updated"), (second, "updated"), (third, "updated"), (10 ** 9, "not_found"),
+    ]
+    assert results[0]["version"] == 2
+
+    contact = client.get(f"/contacts/{first}").json()
+    assert contact["last_name"] == "Cleaned"
+    assert contact["birthday"] == "1990-03-01"
+    assert contact["first_name"] == "Batch"
+
+
+def test_batch_update_reports_conflicts(owner):
+    first, second = _create_contacts(2)
+    taken_email = client.get(f"/contacts/{second}").json()["email"]
+    response = client.patch("/contacts/batch", json={"items": [
+        {"id": first, "email": taken_email},
+        {"id": second, "additional_info": "kept"},
+    ]})
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == ["conflict", "updated"]
+    assert response.json()["results"][0]["error"] == "A contact with this email already exists"
+    assert client.get(f"/contacts/{second}").json()["additional_info"] == "kept"
+
+
+def test_batch_update_rejects_duplicate_ids(owner):
+    response = client.patch("/contacts/batch", json={"items": [{"id": 1}, {"id": 1}]})
+    assert response.status_code == 422
+
+
+def test_batch_delete_contacts(owner):
+    first, second = _create_contacts(2)
+    response = client.request("DELETE", "/contacts/batch", json={"ids": [first, second, 10 ** 9, first]})
+    assert response.status_code == 200
+    assert [(result["id"], result["status"]) for result in response.json()["results"]] == [
+        (first, "deleted"), (second, "deleted"), (10 ** 9, "not_found"),
+    ]
+    assert client.get(f"/contacts/{first}").status_code == 404
+
+
+def test_patch_contact(owner):
+    contact_id, = _create_contacts(1)
+    response = client.patch(f"/contacts/{contact_id}", json={"last_name": "Patched", "birthday": "1985-12-31"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["last_name"] == "Patched"
+    assert data["first_name"] == "Batch"
+    assert response.headers["ETag"] == f'"c{contact_id}-v2"'
+
+    response = client.patch(f"/contacts/{contact_id}", json={"additional_info": "late", "expected_version": 1})
+    assert response.status_code == 409
+
+    response = client.patch(f"/contacts/{contact_id}", json={"additional_info": "current", "expected_version": 2})
+    assert response.status_code == 200
+    assert response.json()["additional_info"] == "current"
+
+
+def test_delete_contact_modified_concurrently(owner, monkeypatch):
+    contact_id, = _create_contacts(1)
+    delete = AsyncSession.delete
+
+    async def delete_after_concurrent_update(self, instance):
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE contacts SET version = version + 1 WHERE id = :id"), {"id": contact_id})
+        await delete(self, instance)
+
+    monkeypatch.setattr(AsyncSession, "delete", delete_after_concurrent_update)
+    assert client.delete(f"/contacts/{contact_id}").status_code == 409
+    monkeypatch.undo()
+    assert client.get(f"/contacts/{contact_id}").status_code == 200
+
+
+def test_patch_without_fields_is_rejected(owner):
+    contact_id, = _create_contacts(1)
+    for body in ({}, {"expected_version": 1}):
+        response = client.patch(f"/contacts/{contact_id}", json=body)
+        assert response.status_code == 422
+        assert response.json() == {"detail": "No fields to update"}
+    assert client.get(f"/contacts/{contact_id}").headers["ETag"] == f'"c{contact_id}-v1"'
+
+
+def test_patch_missing_contact(owner):
+    response = client.patch(f"/contacts/{10 ** 9}", json={"last_name": "Nobody"})
+    assert response.status_code == 404
+
+
+def test_list_and_search_sparse_fields(owner):
+    _create_contacts(2)
+    response = client.get("/contacts/", params={"fields": "first_name", "limit": 1})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    item, = response.json()
+    assert set(item) == {"id", "first_name"}
+    assert "X-Next-Cursor" in response.headers
+
+    full_etag = client.get("/contacts/", params={"limit": 1}).headers["ETag"]
+    assert full_etag != response.headers["ETag"]
+
+    response = client.get("/contacts/search/", params={"first_name": "Batch", "fields": "last_name,email"})
+    assert response.status_code == 200
+    assert all(set(item) == {"id", "last_name", "email"} for item in response.json())
+
+    assert client.get("/contacts/", params={"fields": "user_id"}).status_code == 400
+
+
+def test_suggest_and_merge_duplicates(owner):
+    token = uuid.uuid4().hex
+    created = [
+        client.post("/contacts/", json=contact).json()
+        for contact in (
+            {"first_name": "Dedup", "last_name": token, "email": f"{token}@example.com", "phone_number": "123"},
+            {"first_name": "Dedup", "last_name": token, "email": f"{token}+old@example.com",
+             "phone_number": "+380671234567", "birthday": "1990-05-17", "additional_info": "From the old phone"},
+        )
+    ]
+    ids = sorted(contact["id"] for contact in created)
+
+    response = client.get("/contacts/duplicates")
+    assert response.status_code == 200
+    group = next(group for group in response.json()["groups"] if set(group["contact_ids"]) & set(ids))
+    assert group["contact_ids"] == ids
+
+    response = client.post("/contacts/merge", json={"primary_id": ids[0], "duplicate_ids": [ids[1], 10 ** 9]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["merged_ids"] == [ids[1]]
+    assert data["contact"]["birthday"] == "1990-05-17"
+    assert data["contact"]["additional_info"] == "From the old phone"
+    assert response.headers["ETag"] == f'"c{ids[0]}-v2"'
+    assert client.get(f"/contacts/{ids[1]}").status_code == 404
+
+    response = client.get("/contacts/duplicates")
+    assert not any(ids[0] in group["contact_ids"] for group in response.json()["groups"])
+
+
+def test_merge_rejects_primary_in_duplicates(owner):
+    response = client.post("/contacts/merge", json={"primary_id": 1, "duplicate_ids": [1]})
+    assert response.status_code == 422
+
+
+@pytest.fixture
+def unlimited(monkeypatch):
+    monkeypatch.setattr(limiter, "enabled", False)
+
+
+def _ndjson(*records) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+def _search_emails(*emails) -> list:
+    return [
+        item["email"]
+        for email in emails
+        for item in client.get("/contacts/search/", params={"email": email, "fields": "email"}).json()
+    ]
+
+
+def test_bulk_import_ndjson(owner, unlimited):
+    first, second = f"{uuid.uuid4().hex}@example.com", f"{uuid.uuid4().hex}@example.com"
+    body = _ndjson(
+        {"first_name": "Bulk", "last_name": "One", "email": first, "phone_number": "1"},
+        {"first_name": "Bulk", "last_name": "Missing"},
+        {"first_name": "Bulk", "last_name": "Two", "email": second, "phone_number": "2", "birthday": "1990-02-03"},
+        {"first_name": "Bulk", "last_name": "Again", "email": first, "phone_number": "3"},
+    ) + b"[1]\n"
+    response = client.post("/contacts/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (2, 3)
+    assert [error["line"] for error in result["errors"]] == [2, 4, 5]
+    assert result["errors"][1]["error"] == f"email: {first} already exists"
+    assert result["errors"][2]["error"] == "expected a JSON object"
+    assert sorted(_search_emails(first, second)) == sorted([first, second])
+
+
+def test_bulk_import_csv(owner, unlimited):
+    email = f"{uuid.uuid4().hex}@example.com"
+    body = (f"first_name,last_name,email,phone_number,birthday\n"
+            f"Bulk,Csv,{email},123,1991-07-08\n"
+            f"Bulk,Short\n").encode()
+    response = client.post("/contacts/bulk", content=body, headers={"Content-Type": "text/csv; charset=utf-8"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (1, 1)
+    assert result["errors"] == [{"line": 3, "error": "expected 5 columns, got 2"}]
+    contact, = client.get("/contacts/search/", params={"email": email}).json()
+    assert contact["birthday"] == "1991-07-08"
+
+    response = client.post("/contacts/bulk", params={"format": "csv"}, content=body.replace(email.encode(), b"x@y"),
+                           headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+
+
+def test_bulk_import_rejects_unsupported_content_types(owner, unlimited):
+    response = client.post("/contacts/bulk", content=b"[]", headers={"Content-Type": "application/json"})
+    assert response.status_code == 415
+    response = client.post("/contacts/bulk", params={"format": "xml"}, content=b"<contacts/>",
+                           headers={"Content-Type": "text/csv"})
+    assert response.status_code == 415
+
+
+def test_bulk_import_reports_long_lines(owner, unlimited):
+    email = f"{uuid.uuid4().hex}@example.com"
+    body = _ndjson(
+        {"first_name": "Bulk", "last_name": "Long", "email": "long@example.com", "phone_number": "1",
+         "additional_info": "x" * MAX_LINE_LENGTH},
+        {"first_name": "Bulk", "last_name": "After", "email": email, "phone_number": "1"},
+    )
+    response = client.post("/contacts/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["inserted"] == 1
+    assert result["errors"] == [{"line": 1, "error": "line is too long"}]
+    assert _search_emails(email) == [email]
+
+
+def test_bulk_import_keeps_committed_chunks(owner, unlimited, monkeypatch):
+    emails = [f"{uuid.uuid4().hex}@example.com" for _ in range(4)]
+    insert_rows = contacts_router._insert_contact_rows
+    calls = []
+
+    async def fail_second_chunk(db, user_id, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("database went away")
+        return await insert_rows(db, user_id, rows)
+
+    monkeypatch.setattr(contacts_router, "iter_chunks", functools.partial(iter_chunks, size=2))
+    monkeypatch.setattr(contacts_router, "_insert_contact_rows", fail_second_chunk)
+    body = _ndjson(*({"first_name": "Bulk", "last_name": "Chunk", "email": email, "phone_number": "1"}
+                     for email in emails))
+    with pytest.raises(RuntimeError):
+        client.post("/contacts/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert calls == [2, 2]
+    assert sorted(_search_emails(*emails)) == sorted(emails[:2])
+
+
+@pytest.fixture
+def export_contacts(owner, unlimited):
+    marker = f"Export{uuid.uuid4().hex[:8]}"
+    ids = [
+        client.post("/contacts/", json={
+            "first_name": name, "last_name": marker, "email": f"{uuid.uuid4().hex}@example.com",
+            "phone_number": "555", "birthday": "1990-04-05",
+        }).json()["id"]
+        for name in ("Ann", "Bob")
+    ]
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=2, username="other",
+                                                                        role=UserRole.user)
+    client.post("/contacts/", json={
+        "first_name": "Other", "last_name": marker, "email": f"{uuid.uuid4().hex}@example.com", "phone_number": "1",
+    })
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=1, username="etaguser",
+                                                                        role=UserRole.user)
+    return marker, ids
+
+
+def _export(**params):
+    with client.stream("GET", "/contacts/export", params=params) as response:
+        body = "".join(response.iter_text())
+    return response, body
+
+
+def test_export_csv_is_the_default(export_contacts):
+    marker, ids = export_contacts
+    response, body = _export(last_name=marker)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="contacts.csv"'
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert sorted(int(row["id"]) for row in rows) == ids
+    assert sorted(row["first_name"] for row in rows) == ["Ann", "Bob"]
+    assert rows[0]["birthday"] == "1990-04-05"
+
+
+def test_export_vcard(export_contacts):
+    marker, ids = export_contacts
+    response, body = _export(format="vcard", last_name=marker)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/vcard")
+    assert response.headers["content-disposition"] == 'attachment; filename="contacts.vcf"'
+    cards = body.split("END:VCARD\r\n")[:-1]
+    assert sorted(card.splitlines()[2] for card in cards) == [f"N:{marker};Ann;;;", f"N:{marker};Bob;;;"]
+    assert all("BDAY:1990-04-05" in card for card in cards)
+    assert "Other" not in body
+
+
+def test_export_ndjson_and_unknown_formats(export_contacts):
+    marker, ids = export_contacts
+    response, body = _export(format="ndjson", last_name=marker)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted(json.loads(line)["id"] for line in body.splitlines()) == ids
+
+    response, _ = _export(format="xml", last_name=marker)
+    assert response.status_code == 422
+
+
+def test_search_q_ranks_matches_for_the_owner_only(owner):
+    marker = uuid.uuid4().hex[:10]
+    contacts = {
+        "substring": {"first_name": "Sub", "last_name": "String", "email": f"x{marker}@example.com"},
+        "exact": {"first_name": "Exact", "last_name": marker, "email": f"{uuid.uuid4().hex}@example.com"},
+        "prefix": {"first_name": f"{marker}son", "last_name": "Prefix", "email": f"{uuid.uuid4().hex}@example.com"},
+    }
+    ids = {name: client.post("/contacts/", json={**values, "phone_number": "1"}).json()["id"]
+           for name, values in contacts.items()}
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=2, username="other",
+                                                                        role=UserRole.user)
+    client.post("/contacts/", json={**contacts["exact"], "email": f"{uuid.uuid4().hex}@example.com",
+                                    "phone_number": "1"})
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=1, username="etaguser",
+                                                                        role=UserRole.user)
+
+    response = client.get("/contacts/search/", params={"q": marker.upper()})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [ids["exact"], ids["prefix"], ids["substring"]]
+
+    response = client.get("/contacts/search/", params={"q": f"exact {marker}", "limit": 1})
+    assert [item["id"] for item in response.json()] == [ids["exact"]]
+
+
+def test_search_q_min_length(owner):
+    response = client.get("/contacts/search/", params={"q": "x" * (MIN_QUERY_LENGTH - 1)})
+    assert response.status_code == 422
+    assert client.get("/contacts/search/", params={"q": "x" * MIN_QUERY_LENGTH}).status_code == 200
+
+
+def _birthdays_on(monkeypatch, today: datetime.date, days: int):
+    class Today(datetime.date):
+        @classmethod
+        def today(cls):
+            return today
+
+    monkeypatch.setattr(contacts_router, "date", Today)
+    return client.get("/contacts/upcoming_birthdays/", params={"days": days})
+
+
+def test_upcoming_birthdays(owner, monkeypatch):
+    marker = f"Birthday{uuid.uuid4().hex[:8]}"
+    ids = {
+        birthday: client.post("/contacts/", json={
+            "first_name": "Born", "last_name": marker, "email": f"{uuid.uuid4().hex}@example.com",
+            "phone_number": "1", "birthday": birthday,
+        }).json()["id"]
+        for birthday in ("1980-12-29", "1985-12-31", "1990-01-03", "1995-01-10", "2000-02-29", "1999-03-01")
+    }
+
+    def upcoming(today, days):
+        response = _birthdays_on(monkeypatch, today, days)
+        assert response.status_code == 200
+        return sorted(item["birthday"] for item in response.json() if item["last_name"] == marker)
+
+    assert upcoming(datetime.date(2025, 12, 30), 7) == ["1985-12-31", "1990-01-03"]
+    assert upcoming(datetime.date(2025, 2, 28), 1) == ["1999-03-01", "2000-02-29"]
+    assert upcoming(datetime.date(2024, 2, 29), 0) == ["2000-02-29"]
+    assert upcoming(datetime.date(2025, 6, 1), 366) == sorted(ids)
+
+    assert _birthdays_on(monkeypatch, datetime.date(2025, 6, 1), -1).status_code == 422
+    assert _birthdays_on(monkeypatch, datetime.date(2025, 6, 1), 367).status_code == 422
@@ -4,6 +4,7 @@ import pytest
 from fastapi.testclient import TestClient
 
 from auth import create_access_token, get_password_hash
+from database import get_async_db
 from main import app
 from models import User
 
@@ -13,81 +14,79 @@ client = TestClient(app)
 class MockDBSession:
     def __init__(self):
         self.users = [
-            User(username="testuser@example.com", hashed_password=get_password_hash("oldpassword"))
+            User(username="testuser@example.com", hashed_password=get_password_hash("oldpassword"), token_version=0)
         ]
 
-    def query(self, model):
-        return self
+    async def scalar(self, statement):
+        username = statement.whereclause.right.value
+        return next((u for u in self.users if u.username == username), None)
 
-    def filter(self, condition):
-        username = condition.right.value
-        user = next((u for u in self.users if u.username == username), None)
-        return [user] if user else []
+    async def commit(self):
+        pass
 
-    def first(self):
-        return self.users[0] if self.users else None
+    async def refresh(self, instance, attribute_names=None):
+        # What the database computes for token_version = token_version + 1.
+        instance.token_version = 1
 
-    def commit(self):
-        pass
+
+def reset_token(username="testuser@example.com", ver=0, purpose="password_reset"):
+    return create_access_token(data={"sub": username, "ver": ver, "purpose": purpose},
+                               expires_delta=timedelta(minutes=15))
 
 
 @pytest.fixture
 def mock_db():
-    return MockDBSession()
+    db = MockDBSession()
 
+    async def override_get_async_db():
+        yield db
 
-def test_request_password_reset_valid_email(mock_db, monkeypatch):
-    def mock_get_db():
-        return mock_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield db
+    app.dependency_overrides.pop(get_async_db, None)
 
-    monkeypatch.setattr("routers.password_reset.get_db", mock_get_db)
 
+def test_request_password_reset_valid_email(mock_db):
     response = client.post("/password-reset/request", json={"email": "testuser@example.com"})
     assert response.status_code == 200
     assert response.json() == {"message": "Password reset token sent to your email."}
 
 
-def test_request_password_reset_invalid_email(mock_db, monkeypatch):
-    def mock_get_db():
-        return mock_db
-
-    monkeypatch.setattr("routers.password_reset.get_db", mock_get_db)
-
+def test_request_password_reset_invalid_email(mock_db):
     response = client.post("/password-reset/request", json={"email": "nonexistent@example.com"})
     assert response.status_code == 404
     assert response.json() == {"detail": "User with this email does not exist"}
 
 
-def test_confirm_password_reset_valid_token(mock_db, monkeypatch):
-    def mock_get_db():
-        return mock_db
-
-    monkeypatch.setattr("routers.password_reset.get_db", mock_get_db)
-
-    token = create_access_token(data={"sub": "testuser@example.com"}, expires_delta=timedelta(minutes=15))
+def test_confirm_password_reset_valid_token(mock_db):
+    token = reset_token()
     response = client.post("/password-reset/confirm", json={"token": token, "new_password": "newpassword"})
     assert response.status_code == 200
     assert response.json() == {"message": "Password has been reset successfully."}
 
 
-def test_confirm_password_reset_invalid_token(mock_db, monkeypatch):
-    def mock_get_db():
-        return mock_db
+def test_confirm_password_reset_token_is_single_use(mock_db):
+    token = reset_token()
+    assert client.post("/password-reset/confirm", json={"token": token, "new_password": "newpassword"}).status_code == 200
+    response = client.post("/password-reset/confirm", json={"token": token, "new_password": "otherpassword"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid token"}
 
-    monkeypatch.setattr("routers.password_reset.get_db", mock_get_db)
 
-    response = client.post("/password-reset/confirm", json={"token": "invalidtoken", "new_password": "newpassword"})
+def test_confirm_password_reset_rejects_access_tokens(mock_db):
+    token = reset_token(purpose=None)
+    response = client.post("/password-reset/confirm", json={"token": token, "new_password": "newpassword"})
     assert response.status_code == 400
-    assert response.json() == {"detail": "Invalid token"}
 
 
-def test_confirm_password_reset_nonexistent_user(mock_db, monkeypatch):
-    def mock_get_db():
-        return mock_db
+def test_confirm_password_reset_invalid_token(mock_db):
+    response = client.post("/password-reset/confirm", json={"token": "invalidtoken", "new_password": "newpassword"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid token"}
 
-    monkeypatch.setattr("routers.password_reset.get_db", mock_get_db)
 
-    token = create_access_token(data={"sub": "nonexistent@example.com"}, expires_delta=timedelta(minutes=15))
+def test_confirm_password_reset_nonexistent_user(mock_db):
+    token = reset_token("nonexistent@example.com")
     response = client.post("/password-reset/confirm", json={"token": token, "new_password": "newpassword"})
     assert response.status_code == 404
     assert response.json() == {"detail": "User not found"}
@@ -1,6 +1,14 @@
+import io
+
+import pytest
 from fastapi.testclient import TestClient
 
+from auth import Principal, get_current_principal
+from database import get_async_db, get_read_db
 from main import app
+from models import UserRole
+from routers import users
+from utils.avatars import AVATAR_SIZES, LocalAvatarStorage
 
 client = TestClient(app)
 
@@ -39,3 +47,77 @@ def test_read_current_user():
     data = response.json()
     assert data["username"] == "testuser"
     assert "email" in data
+
+
+class MockAvatarSession:
+    def __init__(self, avatar_key=None):
+        self.avatar_key = avatar_key
+        self.updates = []
+
+    async def scalar(self, statement):
+        return self.avatar_key
+
+    async def execute(self, statement):
+        self.updates.append(statement.compile().params)
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def avatar_app(tmp_path, monkeypatch):
+    pytest.importorskip("PIL.Image")
+    db = MockAvatarSession()
+    storage = LocalAvatarStorage(root=str(tmp_path), base_url="/media/avatars")
+
+    async def override_get_async_db():
+        yield db
+
+    monkeypatch.setattr(users, "get_avatar_storage", lambda: storage)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_read_db] = override_get_async_db
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=1, username="avataruser",
+                                                                        role=UserRole.user)
+    yield db, tmp_path
+    app.dependency_overrides.pop(get_async_db, None)
+    app.dependency_overrides.pop(get_read_db, None)
+    app.dependency_overrides.pop(get_current_principal, None)
+
+
+def test_update_avatar_stores_thumbnails(avatar_app):
+    from PIL import Image
+
+    db, root = avatar_app
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300)).save(buffer, format="PNG")
+
+    response = client.put("/users/me/avatar", files={"file": ("avatar.png", buffer.getvalue(), "image/png")})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["avatar_url"] == data["sizes"][str(max(AVATAR_SIZES))]
+    assert db.updates[0]["avatar_url"] == data["avatar_url"]
+    assert len(list(root.glob("user_1/*/*.png"))) == len(AVATAR_SIZES)
+
+
+def test_get_avatar_redirects_with_etag(avatar_app):
+    db, _ = avatar_app
+    db.avatar_key = "user_1/abc"
+
+    response = client.get("/users/1/avatar?size=64", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == "/media/avatars/user_1/abc/64.png"
+    etag = response.headers["etag"]
+
+    response = client.get("/users/1/avatar?size=64", headers={"If-None-Match": etag}, follow_redirects=False)
+    assert response.status_code == 304
+
+    response = client.get("/users/1/avatar?size=64", headers={"If-None-Match": f'"other", W/{etag}'},
+                          follow_redirects=False)
+    assert response.status_code == 304
+
+
+def test_get_avatar_rejects_unknown_size(avatar_app):
+    db, _ = avatar_app
+    db.avatar_key = "user_1/abc"
+    assert client.get("/users/1/avatar?size=7", follow_redirects=False).status_code == 400
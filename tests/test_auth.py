@@ -1,13 +1,21 @@
+import asyncio
+import hashlib
 from datetime import timedelta
 
+import pytest
+from fastapi import HTTPException
+
+import auth
 from auth import (
+    Principal,
     get_password_hash,
     verify_password,
     create_access_token,
     decode_access_token,
     authenticate_user,
+    get_current_principal,
 )
-from models import User
+from models import User, UserRole
 
 
 # Mock database session
@@ -17,16 +25,9 @@ class MockDBSession:
             User(username="testuser", hashed_password=get_password_hash("testpassword"))
         ]
 
-    def query(self, model):
-        return self
-
-    def filter(self, condition):
-        username = condition.right.value
-        user = next((u for u in self.users if u.username == username), None)
-        return [user] if user else []
-
-    def first(self):
-        return self.users[0] if self.users else None
+    async def scalar(self, statement):
+        username = statement.whereclause.right.value
+        return next((u for u in self.users if u.username == username), None)
 
 
 def test_get_password_hash():
@@ -78,11 +79,11 @@ def test_invalid_access_token():
 
 def test_authenticate_user():
     db = MockDBSession()
-    user = authenticate_user("testuser", "testpassword", db)
+    user = asyncio.run(authenticate_user("testuser", "testpassword", db))
     assert user is not None
     assert user.username == "testuser"
 
-    invalid_user = authenticate_user("testuser", "wrongpassword", db)
+    invalid_user = asyncio.run(authenticate_user("testuser", "wrongpassword", db))
     assert invalid_user is None
 
 
@@ -92,3 +93,56 @@ def test_missing_token():
         assert False, "Missing token should raise an exception"
     except Exception as e:
         assert "Invalid token" in str(e)
+
+
+class MockTokenVersionSession:
+    def __init__(self, token_version):
+        self.token_version = token_version
+
+    async def scalar(self, statement):
+        return self.token_version
+
+
+def principal_token(username, token_version=0):
+    claims = {"sub": username, "uid": 1, "role": "admin", "ver": token_version}
+    return create_access_token(claims, expires_delta=timedelta(minutes=30))
+
+
+def test_get_current_principal_from_claims():
+    token = principal_token("principal-user")
+    principal = asyncio.run(get_current_principal(token=token, db=MockTokenVersionSession(0)))
+    assert isinstance(principal, Principal)
+    assert (principal.id, principal.username, principal.role) == (1, "principal-user", UserRole.admin)
+    assert not hasattr(principal, "__dict__")
+
+
+def test_get_current_principal_rejects_revoked_token():
+    token = principal_token("revoked-user", token_version=0)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(get_current_principal(token=token, db=MockTokenVersionSession(1)))
+    assert exc_info.value.detail == "Token has been revoked"
+
+
+def test_get_current_principal_requires_claims():
+    token = create_access_token({"sub": "testuser"}, expires_delta=timedelta(minutes=30))
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(get_current_principal(token=token, db=MockTokenVersionSession(0)))
+    assert exc_info.value.status_code == 401
+
+
+def test_decode_access_token_caches_verified_tokens(monkeypatch):
+    token = create_access_token({"sub": "cacheduser"}, expires_delta=timedelta(minutes=5))
+    assert decode_access_token(token)["sub"] == "cacheduser"
+
+    def fail(token):
+        raise AssertionError("cached tokens must not be verified again")
+
+    monkeypatch.setattr(auth, "_verify_token", fail)
+    assert decode_access_token(token)["sub"] == "cacheduser"
+
+
+def test_decode_access_token_does_not_cache_invalid_tokens():
+    token = create_access_token({"sub": "expireduser"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        decode_access_token(token)
+    assert auth.token_cache.get(hashlib.sha256(token.encode()).digest()) is None
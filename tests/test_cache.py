@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+import redis
+
+import cache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.published = []
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+
+class BrokenRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            self.calls += 1
+            raise redis.ConnectionError("Redis is down")
+        return fail
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(cache, "cache_stats", cache.Counter())
+    monkeypatch.setattr(cache, "user_l1_cache", cache.LRUCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(cache, "token_version_l1_cache", cache.LRUCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(cache, "redis_breaker", cache.CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(cache, "redis_client", client)
+    return client
+
+
+def test_contact_cache_hit_and_miss(fake_redis):
+    async def scenario():
+        cached, version = await cache.get_cached_contacts(1, "contact", 5)
+        assert cached is None
+        await cache.set_cached_contacts(1, "contact", 5, value={"id": 5}, version=version)
+        assert await cache.get_cached_contacts(1, "contact", 5) == ({"id": 5}, "0")
+        assert await cache.get_cached_contacts(2, "contact", 5) == (None, "0")
+
+    asyncio.run(scenario())
+    assert cache.cache_stats["contacts_hits"] == 1
+    assert cache.cache_stats["contacts_misses"] == 2
+
+
+def test_invalidate_contacts_only_affects_owner(fake_redis):
+    async def scenario():
+        await cache.set_cached_contacts(1, "list", 0, 10, None, value=[{"id": 1}], version="0")
+        await cache.set_cached_contacts(2, "list", 0, 10, None, value=[{"id": 2}], version="0")
+        await cache.invalidate_contacts(1)
+        assert await cache.get_cached_contacts(1, "list", 0, 10, None) == (None, "1")
+        assert await cache.get_cached_contacts(2, "list", 0, 10, None) == ([{"id": 2}], "0")
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_query_is_not_overwritten(fake_redis):
+    async def scenario():
+        cached, version = await cache.get_cached_contacts(1, "list", 0, 10, None)
+        assert cached is None
+        # A write commits and invalidates while the read is still querying the database.
+        await cache.invalidate_contacts(1)
+        await cache.set_cached_contacts(1, "list", 0, 10, None, value=[{"id": 1, "stale": True}], version=version)
+        assert (await cache.get_cached_contacts(1, "list", 0, 10, None))[0] is None
+
+    asyncio.run(scenario())
+
+
+def test_cache_falls_back_when_redis_is_not_initialized(monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", None)
+    assert asyncio.run(cache.get_cached_contacts(1, "contact", 5)) == (None, None)
+    assert asyncio.run(cache.get_cached_user("testuser")) is None
+    assert cache.start_invalidation_listener() is None
+
+
+def test_circuit_breaker_short_circuits_failing_redis(monkeypatch):
+    broken = BrokenRedis()
+    monkeypatch.setattr(cache, "redis_client", broken)
+
+    async def scenario():
+        for _ in range(5):
+            assert await cache.get_cached_contacts(1, "contact", 5) == (None, None)
+        await cache.invalidate_contacts(1)
+
+    asyncio.run(scenario())
+    assert broken.calls == 2
+    assert cache.redis_breaker.state == "open"
+    assert cache.cache_stats["contacts_errors"] == 6
+    assert cache.cache_stats["redis_short_circuits"] == 4
+
+
+def test_circuit_breaker_half_opens_after_reset_timeout():
+    breaker = cache.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = cache.LRUCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert len(lru) == 2
+
+
+def test_lru_cache_expires_entries():
+    lru = cache.LRUCache(maxsize=2, ttl=60)
+    lru.set("a", 1, ttl=0)
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_user_l1_cache_skips_redis(fake_redis):
+    asyncio.run(cache.set_cached_user("testuser", {"id": 1, "username": "testuser", "role": "user"}))
+    fake_redis.data.clear()
+    assert asyncio.run(cache.get_cached_user("testuser"))["id"] == 1
+    assert cache.cache_stats["user_l1_hits"] == 1
+
+
+def test_invalidate_cached_user_publishes(fake_redis):
+    async def scenario():
+        await cache.set_cached_user("testuser", {"id": 1, "username": "testuser", "role": "user"})
+        await cache.invalidate_cached_user("testuser")
+        assert await cache.get_cached_user("testuser") is None
+
+    asyncio.run(scenario())
+    assert fake_redis.published == [(cache.USER_INVALIDATION_CHANNEL, "testuser")]
+
+
+def test_invalidation_message_clears_l1():
+    cache.user_l1_cache.set("testuser", {"id": 1})
+    cache.token_version_l1_cache.set("testuser", 3)
+    cache._handle_user_invalidation({"channel": cache.USER_INVALIDATION_CHANNEL, "data": "testuser"})
+    assert cache.user_l1_cache.get("testuser") is None
+    assert cache.token_version_l1_cache.get("testuser") is None
+
+
+def test_token_version_cache(fake_redis):
+    async def scenario():
+        assert await cache.get_cached_token_version("testuser") is None
+        await cache.set_cached_token_version("testuser", 2)
+        cache.token_version_l1_cache.clear()
+        assert await cache.get_cached_token_version("testuser") == 2
+        assert await cache.get_cached_token_version("testuser") == 2
+        await cache.invalidate_cached_user("testuser")
+        assert await cache.get_cached_token_version("testuser") is None
+
+    asyncio.run(scenario())
+    assert cache.cache_stats["token_version_l1_hits"] == 1
+
+
+def test_revocation_during_token_version_read_is_not_overwritten(fake_redis):
+    async def scenario():
+        # A request read version 2 from the database, then the token was revoked.
+        await cache.invalidate_cached_user("testuser", token_version=3)
+        assert await cache.set_cached_token_version("testuser", 2) == 3
+        cache.token_version_l1_cache.clear()
+        assert await cache.get_cached_token_version("testuser") == 3
+
+    asyncio.run(scenario())
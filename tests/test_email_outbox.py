@@ -0,0 +1,253 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import BackgroundTasks
+
+import cache
+import email_outbox
+from email_outbox import CLAIM_SCRIPT, EMAIL_DEAD_LETTER_KEY, EMAIL_OUTBOX_KEY, EMAIL_PROCESSING_KEY, EMAIL_RETRY_KEY, \
+    OutboxWorker, enqueue_email
+from utils.email_utils import SMTPSender
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+        self.sorted_sets = {}
+
+    async def lpush(self, key, *values):
+        self.lists.setdefault(key, [])[:0] = reversed(values)
+
+    async def rpop(self, key, count):
+        items = self.lists.get(key, [])
+        popped = [items.pop() for _ in range(min(count, len(items)))]
+        return popped or None
+
+    async def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    async def eval(self, script, numkeys, *keys_and_args):
+        assert script == CLAIM_SCRIPT
+        (outbox, processing), (count, until) = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        items = await self.rpop(outbox, count) or []
+        await self.zadd(processing, {item: until for item in items})
+        return items
+
+    async def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    async def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted(self.sorted_sets.get(key, {}).items(), key=lambda item: item[1])
+        due = [member for member, score in members if low <= score <= high]
+        return due[start:start + num if num is not None else None]
+
+    async def zrem(self, key, *members):
+        return sum(self.sorted_sets.get(key, {}).pop(member, None) is not None for member in members)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(email_outbox, "email_stats", email_outbox.Counter())
+    monkeypatch.setattr(cache, "redis_breaker", cache.CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(cache, "redis_client", client)
+    return client
+
+
+def make_worker(smtp_server, **kwargs):
+    sender = SMTPSender(host="127.0.0.1", port=smtp_server.port, username=None, starttls=False,
+                        sender="noreply@example.com", timeout=5)
+    return OutboxWorker(sender, **kwargs)
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(email_outbox, "EMAIL_RETRY_BASE_DELAY", 5)
+    monkeypatch.setattr(email_outbox, "EMAIL_RETRY_MAX_DELAY", 30)
+    assert [email_outbox.retry_delay(attempts) for attempts in (1, 2, 3, 4, 5)] == [5, 10, 20, 30, 30]
+
+
+def test_enqueue_email_pushes_to_outbox(fake_redis):
+    background_tasks = BackgroundTasks()
+    assert asyncio.run(enqueue_email(background_tasks, "user@example.com", "Hi", "Body")) is True
+
+    assert [json.loads(item)["to"] for item in fake_redis.lists[EMAIL_OUTBOX_KEY]] == ["user@example.com"]
+    assert background_tasks.tasks == []
+    assert email_outbox.email_stats["queued"] == 1
+
+
+def test_enqueue_email_falls_back_to_background_task(monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", None)
+    background_tasks = BackgroundTasks()
+    assert asyncio.run(enqueue_email(background_tasks, "user@example.com", "Hi", "Body")) is False
+
+    assert len(background_tasks.tasks) == 1
+    assert email_outbox.email_stats["fallbacks"] == 1
+
+
+def test_worker_delivers_queued_emails_in_one_batch(fake_redis, smtp_server):
+    worker = make_worker(smtp_server)
+
+    async def scenario():
+        for i in range(3):
+            await enqueue_email(BackgroundTasks(), f"user{i}@example.com", "Hi", "Body")
+        try:
+            return await worker.run_once()
+        finally:
+            worker.sender.close()
+
+    assert asyncio.run(scenario()) == 3
+    assert [message["to"] for message in smtp_server.messages] == [
+        ["user0@example.com"], ["user1@example.com"], ["user2@example.com"],
+    ]
+    assert smtp_server.connections == 1
+    assert email_outbox.email_stats["sent"] == 3
+    assert fake_redis.sorted_sets[EMAIL_PROCESSING_KEY] == {}
+
+
+def test_worker_retries_then_dead_letters_failed_emails(fake_redis, smtp_server, monkeypatch):
+    monkeypatch.setattr(email_outbox, "EMAIL_RETRY_BASE_DELAY", 0)
+    smtp_server.rejected.add("missing@example.com")
+    worker = make_worker(smtp_server, max_attempts=2)
+
+    async def scenario():
+        await enqueue_email(BackgroundTasks(), "missing@example.com", "Hi", "Body")
+        try:
+            await worker.run_once()
+            assert len(fake_redis.sorted_sets[EMAIL_RETRY_KEY]) == 1
+            await worker.run_once()
+        finally:
+            worker.sender.close()
+
+    asyncio.run(scenario())
+    assert fake_redis.sorted_sets[EMAIL_RETRY_KEY] == {}
+    dead = [json.loads(item) for item in fake_redis.lists[EMAIL_DEAD_LETTER_KEY]]
+    assert [(message["to"], message["attempts"]) for message in dead] == [("missing@example.com", 2)]
+    assert email_outbox.email_stats["retried"] == 1
+    assert email_outbox.email_stats["dead_lettered"] == 1
+
+
+def test_dead_letter_list_is_capped(fake_redis, smtp_server, monkeypatch):
+    monkeypatch.setattr(email_outbox, "EMAIL_DEAD_LETTER_MAX", 2)
+    smtp_server.rejected.add("missing@example.com")
+    worker = make_worker(smtp_server, max_attempts=1)
+
+    async def scenario():
+        for _ in range(3):
+            await enqueue_email(BackgroundTasks(), "missing@example.com", "Hi", "Body")
+        try:
+            await worker.run_once()
+        finally:
+            worker.sender.close()
+
+    asyncio.run(scenario())
+    assert len(fake_redis.lists[EMAIL_DEAD_LETTER_KEY]) == 2
+    assert email_outbox.email_stats["dead_lettered"] == 3
+
+
+def test_emails_of_a_crashed_batch_are_requeued(fake_redis, monkeypatch):
+    monkeypatch.setattr(email_outbox, "EMAIL_CLAIM_TIMEOUT", 0)
+
+    class CrashingSender:
+        timeout = 1
+
+        def send_batch(self, messages):
+            raise RuntimeError("worker died")
+
+    async def scenario():
+        await enqueue_email(BackgroundTasks(), "user@example.com", "Hi", "Body")
+        with pytest.raises(RuntimeError):
+            await OutboxWorker(CrashingSender()).run_once()
+        assert EMAIL_OUTBOX_KEY not in fake_redis.lists or not fake_redis.lists[EMAIL_OUTBOX_KEY]
+        assert len(fake_redis.sorted_sets[EMAIL_PROCESSING_KEY]) == 1
+        await OutboxWorker(CrashingSender()).promote_due_retries()
+
+    asyncio.run(scenario())
+    assert [json.loads(item)["to"] for item in fake_redis.lists[EMAIL_OUTBOX_KEY]] == ["user@example.com"]
+    assert fake_redis.sorted_sets[EMAIL_PROCESSING_KEY] == {}
+
+
+def test_worker_keeps_running_after_unexpected_errors(fake_redis, caplog):
+    passes = []
+
+    class Sender:
+        timeout = 1
+
+        def close(self):
+            pass
+
+    worker = OutboxWorker(Sender())
+
+    async def run_once():
+        passes.append(1)
+        if len(passes) == 1:
+            raise ValueError("bad message")
+        if len(passes) == 3:
+            raise asyncio.CancelledError()
+        return 0
+
+    worker.run_once = run_once
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(worker.run(poll_interval=0))
+
+    assert len(passes) == 3
+    assert email_outbox.email_stats["worker_errors"] == 1
+    assert "Email outbox pass failed" in caplog.text
+
+
+def test_malformed_items_are_dead_lettered_without_blocking_the_batch(fake_redis, smtp_server):
+    worker = make_worker(smtp_server)
+
+    async def scenario():
+        await enqueue_email(BackgroundTasks(), "user@example.com", "Hi", "Body")
+        await fake_redis.lpush(EMAIL_OUTBOX_KEY, "not json", json.dumps({"to": 1}))
+        try:
+            return await worker.run_once()
+        finally:
+            worker.sender.close()
+
+    assert asyncio.run(scenario()) == 3
+    assert [message["to"] for message in smtp_server.messages] == [["user@example.com"]]
+    dead = [json.loads(item) for item in fake_redis.lists[EMAIL_DEAD_LETTER_KEY]]
+    assert sorted(entry["payload"] for entry in dead) == ["not json", '{"to": 1}']
+    assert fake_redis.sorted_sets[EMAIL_PROCESSING_KEY] == {}
+    assert email_outbox.email_stats["malformed"] == 2
+
+
+def test_sent_emails_are_acknowledged_one_by_one(fake_redis):
+    class SenderDyingOnSecondEmail:
+        timeout = 1
+        connected = True
+
+        def __init__(self):
+            self.sent = []
+
+        def send_batch(self, messages):
+            if self.sent:
+                raise RuntimeError("worker died")
+            self.sent.extend(messages)
+            return []
+
+    sender = SenderDyingOnSecondEmail()
+
+    async def scenario():
+        for i in range(2):
+            await enqueue_email(BackgroundTasks(), f"user{i}@example.com", "Hi", "Body")
+        with pytest.raises(RuntimeError):
+            await OutboxWorker(sender).run_once()
+
+    asyncio.run(scenario())
+    assert [message["to"] for message in sender.sent] == ["user0@example.com"]
+    pending = [json.loads(item)["to"] for item in fake_redis.sorted_sets[EMAIL_PROCESSING_KEY]]
+    assert pending == ["user1@example.com"]
+
+
+def test_batch_size_fits_in_the_claim_timeout(monkeypatch):
+    monkeypatch.setattr(email_outbox, "EMAIL_CLAIM_TIMEOUT", 300)
+    sender = SMTPSender(timeout=10)
+    assert OutboxWorker(sender, batch_size=50).batch_size == 7
+    assert OutboxWorker(sender, batch_size=5).batch_size == 5
@@ -0,0 +1,54 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+import hashing
+
+
+def test_hash_password():
+    hashed_password = hashing.hash_password("testpassword")
+    assert hashed_password != "testpassword"
+    assert hashing.verify_and_update("testpassword", hashed_password) == (True, None)
+    assert hashing.verify_and_update("wrongpassword", hashed_password) == (False, None)
+
+
+def test_verify_and_update_rehashes_outdated_cost():
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("testpassword")
+    verified, new_hash = hashing.verify_and_update("testpassword", outdated)
+    assert verified is True
+    assert new_hash.startswith(f"$2b${hashing.BCRYPT_ROUNDS:02d}$")
+
+
+def test_hashing_pool_runs_in_threads(monkeypatch):
+    pool = hashing.HashingPool(workers=0, max_pending=4)
+    monkeypatch.setattr(hashing, "hashing_stats", hashing.Counter())
+    assert asyncio.run(pool.run("hash", len, "abc")) == 3
+    assert hashing.hashing_stats["hash_calls"] == 1
+    assert pool.pending == 0
+
+
+def test_hashing_pool_rejects_when_full(monkeypatch):
+    pool = hashing.HashingPool(workers=0, max_pending=0)
+    monkeypatch.setattr(hashing, "hashing_stats", hashing.Counter())
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(pool.run("hash", len, "abc"))
+    assert exc_info.value.status_code == 503
+    assert hashing.hashing_stats["rejected"] == 1
+
+
+def test_hashing_pool_replaces_broken_pool(monkeypatch):
+    pool = hashing.HashingPool(workers=1, max_pending=4)
+    monkeypatch.setattr(hashing, "hashing_stats", hashing.Counter())
+    broken = pool._get_executor()
+    try:
+        assert isinstance(broken.submit(os._exit, 1).exception(), BrokenProcessPool)
+        assert asyncio.run(pool.run("hash", len, "abc")) == 3
+        assert pool._executor is not broken
+        assert hashing.hashing_stats["pool_restarts"] == 1
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
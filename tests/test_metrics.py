@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import cache
+import hashing
+import rate_limit
+from main import app
+from metrics import _split_stat, instrument_engine
+
+pytest.importorskip("prometheus_client")
+
+client = TestClient(app)
+
+
+def test_split_stat():
+    assert _split_stat("user_l1_hits", ("hits", "misses")) == ("user_l1", "hits")
+    assert _split_stat("redis_short_circuits", ("hits", "short_circuits")) == ("redis", "short_circuits")
+    assert _split_stat("unrelated", ("hits",)) == (None, None)
+
+
+def test_metrics_endpoint_reports_latency_and_stats(monkeypatch):
+    monkeypatch.setitem(cache.cache_stats, "contacts_hits", 3)
+    monkeypatch.setitem(hashing.hashing_stats, "verify_calls", 2)
+    monkeypatch.setitem(hashing.hashing_stats, "verify_seconds", 0.5)
+    monkeypatch.setitem(rate_limit.rate_limit_stats, "rejected:/users/token", 4)
+    client.get("/contacts/12345")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/contacts/{contact_id}",status="401"}' in body
+    assert 'cache_operations_total{cache="contacts",result="hits"} 3.0' in body
+    assert 'password_hashing_seconds_count{operation="verify"} 2.0' in body
+    assert 'password_hashing_seconds_sum{operation="verify"} 0.5' in body
+    assert 'rate_limit_rejections_total{path="/users/token"} 4.0' in body
+    assert 'db_pool_connect_seconds' in body
+
+
+def test_instrument_engine_times_new_connections_and_counts_checkouts(tmp_path):
+    from prometheus_client import CollectorRegistry, Gauge, Histogram
+
+    registry = CollectorRegistry()
+    connect = Histogram("connect_seconds", "Connect.", ["engine"], registry=registry)
+    in_use = Gauge("in_use", "In use.", ["engine"], registry=registry)
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    instrument_engine(db_engine, "sync", connect, in_use)
+    instrument_engine(async_engine.sync_engine, "async", connect, in_use)
+
+    with db_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert registry.get_sample_value("in_use", {"engine": "sync"}) == 1
+    assert registry.get_sample_value("in_use", {"engine": "sync"}) == 0
+    assert registry.get_sample_value("connect_seconds_count", {"engine": "sync"}) == 1
+
+    with db_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    db_engine.dispose()
+    with db_engine.connect() as conn:
+        assert registry.get_sample_value("in_use", {"engine": "sync"}) == 1
+    assert registry.get_sample_value("connect_seconds_count", {"engine": "sync"}) == 2
+
+    async def use_async_engine():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await async_engine.dispose()
+
+    asyncio.run(use_async_engine())
+    assert registry.get_sample_value("connect_seconds_count", {"engine": "async"}) == 1
+    assert registry.get_sample_value("in_use", {"engine": "async"}) == 0
+    db_engine.dispose()
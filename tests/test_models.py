@@ -1,9 +1,12 @@
+from datetime import date
+
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 
 from database import Base
-from models import User, Contact
+from models import User, Contact, birthday_day_of_year
 
 TEST_DATABASE_URL = "sqlite:///:memory:"
 engine = create_engine(TEST_DATABASE_URL)
@@ -76,3 +79,39 @@ def test_user_contact_relationship(test_db):
     assert len(user.contacts) == 1
     assert user.contacts[0].first_name == "John"
     assert user.contacts[0].email == "john.doe@example.com"
+
+
+def test_birthday_day_of_year():
+    assert birthday_day_of_year(None) is None
+    assert birthday_day_of_year(date(1990, 1, 1)) == 1
+    assert birthday_day_of_year(date(1992, 2, 29)) == 60
+    assert birthday_day_of_year(date(1991, 3, 1)) == 61
+    assert birthday_day_of_year(date(1991, 12, 31)) == 366
+
+
+def test_contact_birthday_doy_follows_birthday():
+    contact = Contact(first_name="John", birthday=date(1990, 3, 1))
+    assert contact.birthday_doy == 61
+    contact.birthday = None
+    assert contact.birthday_doy is None
+
+
+def test_contact_indexes_lead_with_owner():
+    indexes = {index.name: index for index in Contact.__table__.indexes}
+    assert [column.name for column in indexes["ix_contacts_user_id_last_name_id"].columns] == \
+        ["user_id", "last_name", "id"]
+    assert indexes["uq_contacts_user_id_email"].unique
+    assert not any(index.unique for name, index in indexes.items() if name != "uq_contacts_user_id_email")
+
+
+def test_contact_email_unique_per_owner(test_db):
+    owners = [User(username=f"owner{index}", hashed_password="hashedpassword") for index in range(2)]
+    test_db.add_all(owners)
+    test_db.commit()
+
+    test_db.add_all([Contact(first_name="John", email="john@example.com", user_id=owner.id) for owner in owners])
+    test_db.commit()
+
+    test_db.add(Contact(first_name="Johnny", email="john@example.com", user_id=owners[0].id))
+    with pytest.raises(IntegrityError):
+        test_db.commit()
@@ -0,0 +1,112 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import models  # noqa: F401, registers the tables created by init_db
+import profiling
+from database import engine, init_db
+from profiling import QueryProfilingMiddleware, assert_max_queries, instrument_engine, track_queries
+
+instrument_engine(engine)
+
+app = FastAPI()
+app.add_middleware(QueryProfilingMiddleware)
+
+
+@app.get("/queries/{count}")
+def run_queries(count: int):
+    with engine.connect() as conn:
+        for _ in range(count):
+            conn.execute(text("SELECT 1"))
+    return {"count": count}
+
+
+client = TestClient(app)
+
+
+def test_server_timing_header_counts_queries():
+    response = client.get("/queries/3")
+    assert response.status_code == 200
+    assert 'desc="3 queries"' in response.headers["server-timing"]
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+
+def test_repeated_statements_are_reported_as_n_plus_one(monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "N_PLUS_ONE_THRESHOLD", 3)
+    with caplog.at_level(logging.INFO, logger="profiling"):
+        client.get("/queries/3")
+
+    summary = next(record for record in caplog.records if getattr(record, "queries", None) is not None)
+    assert summary.queries == 3
+    assert summary.path == "/queries/3"
+    assert any("Possible N+1 query" in record.getMessage() for record in caplog.records)
+
+
+def test_slow_queries_are_logged_with_plan(monkeypatch, caplog):
+    init_db()
+    monkeypatch.setattr(profiling, "SLOW_QUERY_THRESHOLD_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="profiling"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT * FROM users WHERE id = :id"), {"id": 1})
+
+    slow = [record for record in caplog.records if record.getMessage().startswith("Slow query")]
+    assert slow
+    assert slow[0].plan and "users" in slow[0].plan
+
+
+def test_failed_explain_is_rolled_back_to_a_savepoint_on_postgres():
+    executed = []
+
+    class Cursor:
+        def execute(self, statement, parameters=None):
+            executed.append(statement)
+            if statement.startswith("EXPLAIN"):
+                raise RuntimeError("permission denied")
+
+        def close(self):
+            pass
+
+    conn = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        in_transaction=lambda: True,
+        connection=SimpleNamespace(cursor=Cursor),
+    )
+    with pytest.raises(RuntimeError):
+        profiling._explain(conn, None, "SELECT 1", {})
+
+    assert executed == [
+        "SAVEPOINT slow_query_explain",
+        "EXPLAIN SELECT 1",
+        "ROLLBACK TO SAVEPOINT slow_query_explain",
+        "RELEASE SAVEPOINT slow_query_explain",
+    ]
+
+
+def test_failed_statements_do_not_skew_later_timings():
+    with track_queries() as stats:
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.execute(text("SELECT 1"))
+            assert "query_started" not in conn.info
+
+    assert stats.count == 1
+
+
+def test_track_queries_counts_queries_from_other_threads():
+    with track_queries() as stats:
+        client.get("/queries/2")
+    assert stats.count == 2
+
+
+def test_assert_max_queries():
+    with assert_max_queries(2):
+        client.get("/queries/2")
+
+    with pytest.raises(AssertionError, match="at most 1 queries, got 2"):
+        with assert_max_queries(1):
+            client.get("/queries/2")
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from limits.storage import MemoryStorage
+from limits.strategies import MovingWindowRateLimiter
+from starlette.requests import Request
+
+from auth import create_access_token
+from database import get_async_db
+from main import app
+from rate_limit import PASSWORD_RESET_RATE_LIMIT, limiter, rate_limit_key, rate_limit_stats
+
+client = TestClient(app)
+
+
+def make_request(authorization=None):
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request({"type": "http", "headers": headers, "client": ("10.0.0.1", 1234)})
+
+
+@pytest.fixture
+def memory_limiter(monkeypatch):
+    storage = MemoryStorage()
+    monkeypatch.setattr(limiter, "_storage", storage)
+    monkeypatch.setattr(limiter, "_limiter", MovingWindowRateLimiter(storage))
+    monkeypatch.setattr(limiter, "_storage_dead", False)
+    rate_limit_stats.clear()
+    yield limiter
+
+
+@pytest.fixture
+def missing_user_db():
+    class MockDBSession:
+        async def scalar(self, statement):
+            return None
+
+    async def override_get_async_db():
+        yield MockDBSession()
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield
+    app.dependency_overrides.pop(get_async_db, None)
+
+
+def test_rate_limit_key_uses_token_subject():
+    token = create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=5))
+    assert rate_limit_key(make_request(f"Bearer {token}")) == "user:alice"
+
+
+def test_rate_limit_key_falls_back_to_client_address():
+    assert rate_limit_key(make_request()) == "ip:10.0.0.1"
+    assert rate_limit_key(make_request("Bearer invalid.token.value")) == "ip:10.0.0.1"
+
+
+def test_password_reset_request_is_rate_limited(memory_limiter, missing_user_db):
+    allowed = int(PASSWORD_RESET_RATE_LIMIT.split("/")[0])
+    for _ in range(allowed):
+        response = client.post("/password-reset/request", json={"email": "nobody@example.com"})
+        assert response.status_code == 404
+
+    response = client.post("/password-reset/request", json={"email": "nobody@example.com"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert rate_limit_stats["rejected"] == 1
+    assert rate_limit_stats["rejected:/password-reset/request"] == 1
+
+
+def test_limit_is_checked_off_the_event_loop(memory_limiter, missing_user_db, monkeypatch):
+    check = limiter._check_request_limit
+    loops = []
+
+    def recording_check(*args, **kwargs):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return check(*args, **kwargs)
+
+    monkeypatch.setattr(limiter, "_check_request_limit", recording_check)
+    response = client.post("/password-reset/request", json={"email": "nobody@example.com"})
+    assert response.status_code == 404
+    assert loops == [None]
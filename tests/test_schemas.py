@@ -1,7 +1,7 @@
 import pytest
 from pydantic import ValidationError
 
-from schemas import ContactCreate, UserCreate, ContactResponse, UserResponse
+from schemas import ContactCreate, ContactPatch, ContactUpdate, UserCreate, ContactResponse, UserResponse
 
 
 def test_contact_create_schema():
@@ -74,3 +74,18 @@ def test_user_response_schema():
     user = UserResponse(**data)
     assert user.username == "testuser"
     assert user.email == "test@example.com"
+
+
+def test_contact_update_schema():
+    update = ContactUpdate(last_name="Smith", birthday=None)
+    assert update.changes() == {"last_name": "Smith", "birthday": None}
+
+    # Required contact fields can be left out but not cleared
+    with pytest.raises(ValidationError):
+        ContactUpdate(email=None)
+
+
+def test_contact_patch_changes_exclude_expected_version():
+    patch = ContactPatch(first_name="Jane", expected_version=3)
+    assert patch.changes() == {"first_name": "Jane"}
+    assert patch.expected_version == 3
@@ -0,0 +1,102 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from utils.avatars import AvatarUploadLimitMiddleware, LocalAvatarStorage, delete_variants, read_upload, \
+    resize_variants, store_variants
+
+
+def make_image(width, height, format="PNG"):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def test_read_upload_returns_content():
+    upload = UploadFile(io.BytesIO(b"x" * 100))
+    assert asyncio.run(read_upload(upload, max_bytes=100)) == b"x" * 100
+
+
+def test_read_upload_rejects_large_files():
+    upload = UploadFile(io.BytesIO(b"x" * 101))
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(read_upload(upload, max_bytes=100))
+    assert exc_info.value.status_code == 413
+
+
+def limited_client(max_bytes):
+    app = FastAPI()
+    app.add_middleware(AvatarUploadLimitMiddleware, path="/upload", max_bytes=max_bytes)
+    received = []
+
+    @app.put("/upload")
+    async def upload(file: UploadFile = File(...)):
+        received.append(await file.read())
+        return {"size": len(received[-1])}
+
+    return TestClient(app), received
+
+
+def test_upload_limit_rejects_large_content_length_before_parsing():
+    client, received = limited_client(max_bytes=100)
+    response = client.put("/upload", files={"file": ("a.png", b"x" * 50_000)})
+
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_upload_limit_cuts_off_streamed_bodies():
+    client, received = limited_client(max_bytes=100)
+
+    def body():
+        yield b"x" * 40_000
+
+    response = client.put("/upload", content=body(), headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_upload_limit_passes_small_uploads():
+    client, received = limited_client(max_bytes=100)
+    response = client.put("/upload", files={"file": ("a.png", b"x" * 100)})
+
+    assert response.status_code == 200
+    assert received == [b"x" * 100]
+
+
+def test_resize_variants_crops_to_square_thumbnails():
+    Image = pytest.importorskip("PIL.Image")
+    digest, variants = resize_variants(make_image(300, 200, "JPEG"), sizes=(128, 32))
+
+    assert len(digest) == 16
+    assert sorted(variants) == [32, 128]
+    for size, data in variants.items():
+        assert Image.open(io.BytesIO(data)).size == (size, size)
+
+
+def test_resize_variants_rejects_non_images():
+    pytest.importorskip("PIL.Image")
+    with pytest.raises(HTTPException) as exc_info:
+        resize_variants(b"not an image")
+    assert exc_info.value.status_code == 400
+
+
+def test_resize_variants_rejects_oversized_dimensions():
+    with pytest.raises(HTTPException) as exc_info:
+        resize_variants(make_image(200, 100), max_pixels=10_000)
+    assert exc_info.value.status_code == 413
+
+
+def test_local_storage_saves_and_deletes_variants(tmp_path):
+    storage = LocalAvatarStorage(root=str(tmp_path), base_url="/media/avatars/")
+    urls = store_variants(storage, "user_1/abc", {64: b"small", 128: b"large"})
+
+    assert urls == {64: "/media/avatars/user_1/abc/64.png", 128: "/media/avatars/user_1/abc/128.png"}
+    assert (tmp_path / "user_1" / "abc" / "64.png").read_bytes() == b"small"
+
+    delete_variants(storage, "user_1/abc", sizes=(64, 128, 256))
+    assert not list((tmp_path / "user_1" / "abc").iterdir())
@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Contact, User
+from utils.birthdays import upcoming_birthdays_condition
+
+engine = create_engine("sqlite:///:memory:")
+TestingSessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+BIRTHDAYS = {
+    "new_year": date(1990, 1, 2),
+    "leap_day": date(1992, 2, 29),
+    "march": date(1985, 3, 1),
+    "october": date(1970, 10, 20),
+    "new_years_eve": date(2001, 12, 31),
+}
+
+
+@pytest.fixture(scope="function")
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    user = User(username="owner", hashed_password="hashedpassword")
+    db.add(user)
+    db.commit()
+    db.add_all(
+        Contact(first_name=name, last_name=name, email=f"{name}@example.com", birthday=birthday, user_id=user.id)
+        for name, birthday in BIRTHDAYS.items()
+    )
+    db.add(Contact(first_name="nobody", last_name="nobody", email="nobody@example.com", user_id=user.id))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def upcoming(db, start, days):
+    query = select(Contact.first_name).where(upcoming_birthdays_condition(start, days))
+    return sorted(db.scalars(query))
+
+
+def test_window_within_month(test_db):
+    assert upcoming(test_db, date(2026, 10, 18), 7) == ["october"]
+
+
+def test_window_crossing_year_end(test_db):
+    assert upcoming(test_db, date(2026, 12, 28), 7) == ["new_year", "new_years_eve"]
+
+
+def test_window_spanning_three_months(test_db):
+    assert upcoming(test_db, date(2027, 1, 1), 60) == ["leap_day", "march", "new_year"]
+
+
+def test_leap_day_in_non_leap_year(test_db):
+    assert upcoming(test_db, date(2027, 2, 28), 1) == ["leap_day", "march"]
+    assert upcoming(test_db, date(2027, 2, 28), 0) == []
+
+
+def test_full_year_window(test_db):
+    assert upcoming(test_db, date(2026, 6, 1), 366) == sorted(BIRTHDAYS)
@@ -0,0 +1,76 @@
+import asyncio
+
+from utils.bulk_import import detect_format, iter_chunks, iter_lines, iter_records, validate_chunk
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def parse(fmt, *chunks):
+    return asyncio.run(collect(iter_records(iter_lines(stream(*chunks)), fmt)))
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format("application/x-ndjson") == "ndjson"
+    assert detect_format("application/json") is None
+    assert detect_format("text/plain", "ndjson") == "ndjson"
+    assert detect_format("text/csv", "xml") is None
+
+
+def test_iter_lines_handles_split_chunks():
+    chunks = ["a,b\r\nc".encode(), "ó,d\n".encode()[:2], "ó,d\n".encode()[2:], b"last"]
+    assert asyncio.run(collect(iter_lines(stream(*chunks)))) == ["a,b", "có,d", "last"]
+
+
+def test_iter_lines_rejects_long_lines():
+    chunks = [b"ok\n" + b"x" * 6, b"x" * 6, b"xx\nfine\n", b"y" * 20]
+    lines = asyncio.run(collect(iter_lines(stream(*chunks), max_length=10)))
+    assert lines == ["ok", None, "fine", None]
+
+
+def test_long_lines_are_reported_as_errors():
+    records = asyncio.run(collect(iter_records(iter_lines(stream(b'{"a": "' + b"x" * 50 + b'"}\n'), 10), "ndjson")))
+    assert records == [(1, None, "line is too long")]
+
+
+def test_csv_records():
+    records = parse("csv", b"first_name,last_name,email\n", b"John,,john@example.com\n\nbad\n")
+    assert records == [
+        (2, {"first_name": "John", "last_name": None, "email": "john@example.com"}, None),
+        (4, None, "expected 3 columns, got 1"),
+    ]
+
+
+def test_ndjson_records():
+    records = parse("ndjson", b'{"first_name": "John"}\n[1]\n{oops\n')
+    assert records[0] == (1, {"first_name": "John"}, None)
+    assert records[1] == (2, None, "expected a JSON object")
+    assert records[2][2].startswith("invalid JSON")
+
+
+def test_iter_chunks():
+    async def records():
+        for i in range(5):
+            yield i, {}, None
+
+    chunks = asyncio.run(collect(iter_chunks(records(), size=2)))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+def test_validate_chunk():
+    valid, errors = validate_chunk([
+        (1, {"first_name": "John", "last_name": "Doe", "email": "john@example.com", "phone_number": "1"}, None),
+        (2, {"first_name": "Jane"}, None),
+        (3, None, "invalid JSON"),
+    ])
+    assert [line for line, _ in valid] == [1]
+    assert valid[0][1].email == "john@example.com"
+    assert errors[0][0] == 2 and "last_name: Field required" in errors[0][1]
+    assert errors[1] == (3, "invalid JSON")
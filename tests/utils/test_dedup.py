@@ -0,0 +1,93 @@
+from datetime import date
+from types import SimpleNamespace
+
+from utils.dedup import UnionFind, blocking_keys, candidate_pairs, find_duplicates, fingerprint, merge_values, \
+    normalize_email, normalize_name, normalize_phone, similarity
+
+
+def contact(id, first_name="John", last_name="Doe", email=None, phone_number=None, birthday=None,
+            additional_info=None):
+    return SimpleNamespace(id=id, first_name=first_name, last_name=last_name, email=email,
+                           phone_number=phone_number, birthday=birthday, additional_info=additional_info)
+
+
+def test_normalize_email():
+    assert normalize_email(" John.Doe+work@Example.com ") == "john.doe@example.com"
+    assert normalize_email("") is None
+    assert normalize_email(None) is None
+
+
+def test_normalize_phone():
+    assert normalize_phone("+380 67 123 4567") == normalize_phone("067-123-45-67") == "671234567"
+    assert normalize_phone("12-34") is None
+
+
+def test_blocking_keys():
+    keys = blocking_keys(fingerprint(contact(1, "Jöhn", "Doe", "j@example.com", "0671234567")))
+    assert keys == ["e:j@example.com", "p:671234567", "n:doe:j", "n:john:d"]
+    assert blocking_keys(fingerprint(contact(2, first_name="", last_name="Doe"))) == []
+
+
+def test_normalize_name():
+    assert normalize_name("  Zoë-Anne  O'Brien ") == "zoe anne o brien"
+    assert normalize_name(None) == ""
+
+
+def test_union_find():
+    groups = UnionFind()
+    groups.union(3, 2)
+    groups.union(2, 1)
+    groups.union(5, 4)
+    assert groups.find(3) == groups.find(1) == 1
+    assert groups.find(5) == 4
+    assert groups.find(6) == 6
+
+
+def test_similarity():
+    same_email = similarity(fingerprint(contact(1, email="j@example.com")),
+                            fingerprint(contact(2, "Jon", email="J@example.com")))
+    different_details = similarity(fingerprint(contact(1, email="a@example.com")),
+                                   fingerprint(contact(2, email="b@example.com")))
+    unknown_details = similarity(fingerprint(contact(1)), fingerprint(contact(2)))
+    assert same_email > unknown_details > different_details
+    assert unknown_details == 0.75
+    assert different_details == 0.5
+
+
+def test_candidate_pairs_skip_large_blocks():
+    keys = {1: ["e:a"], 2: ["e:a", "n:x"], 3: ["n:x"], 4: ["n:x"], 5: ["p:1"]}
+    assert candidate_pairs(keys, max_block_size=2) == {(1, 2)}
+    assert candidate_pairs(keys, max_block_size=3) == {(1, 2), (2, 3), (2, 4), (3, 4)}
+
+
+def test_candidate_pairs_skip_conflicting_details_in_name_blocks():
+    keys = {1: ["n:x"], 2: ["n:x"], 3: ["n:x"], 4: ["n:x"]}
+    details = {1: (True, True), 2: (True, False), 3: (False, True), 4: (False, False)}
+    assert candidate_pairs(keys, details=details) == {(1, 4), (2, 3), (2, 4), (3, 4)}
+
+
+def test_find_duplicates_groups_transitively():
+    contacts = [
+        contact(1, email="john@example.com"),
+        contact(2, "Jon", email="JOHN+old@example.com", phone_number="+380671234567"),
+        contact(3, "Johnny", "Doe", phone_number="067 123 45 67", birthday=date(1990, 1, 1), additional_info="x"),
+        contact(4, "Jane", "Roe", email="jane@example.com"),
+        contact(5, "John", "Doe", email="another.john@example.com", phone_number="0501112233"),
+    ]
+    groups = find_duplicates(contacts)
+    assert [(group["contact_ids"], group["primary_id"]) for group in groups] == [([1, 2, 3], 3)]
+    assert 0.75 <= groups[0]["score"] < 1
+
+
+def test_merge_values():
+    primary = contact(1, email="john@example.com", additional_info="Met at work")
+    duplicates = [
+        contact(2, phone_number="0671234567", additional_info="Met at work"),
+        contact(3, phone_number="0500000000", birthday=date(1990, 1, 1), additional_info="Likes tea"),
+    ]
+    assert merge_values(primary, duplicates) == {
+        "phone_number": "0671234567",
+        "birthday": date(1990, 1, 1),
+        "additional_info": "Met at work\nLikes tea",
+    }
+    assert merge_values(primary, []) == {}
@@ -0,0 +1,56 @@
+from utils.email_utils import SMTPSender, build_message
+
+
+def make_sender(smtp_server):
+    return SMTPSender(host="127.0.0.1", port=smtp_server.port, username=None, starttls=False,
+                      sender="noreply@example.com", timeout=5)
+
+
+def test_build_message():
+    msg = build_message("user@example.com", "Hello", "Body text", sender="noreply@example.com")
+    assert msg["To"] == "user@example.com"
+    assert msg["From"] == "noreply@example.com"
+    assert msg["Subject"] == "Hello"
+    assert msg.get_payload() == "Body text"
+
+
+def test_send_batch_reuses_connection(smtp_server):
+    sender = make_sender(smtp_server)
+    messages = [{"to": f"user{i}@example.com", "subject": "Hi", "body": f"Message {i}"} for i in range(3)]
+    try:
+        assert sender.send_batch(messages) == []
+        assert sender.send_batch(messages[:1]) == []
+    finally:
+        sender.close()
+
+    assert smtp_server.connections == 1
+    assert [message["to"] for message in smtp_server.messages] == [
+        ["user0@example.com"], ["user1@example.com"], ["user2@example.com"], ["user0@example.com"],
+    ]
+
+
+def test_send_batch_reports_rejected_recipients(smtp_server):
+    smtp_server.rejected.add("missing@example.com")
+    sender = make_sender(smtp_server)
+    messages = [
+        {"to": "missing@example.com", "subject": "Hi", "body": "Nope"},
+        {"to": "user@example.com", "subject": "Hi", "body": "Yes"},
+    ]
+    try:
+        failures = sender.send_batch(messages)
+    finally:
+        sender.close()
+
+    assert [message["to"] for message, _ in failures] == ["missing@example.com"]
+    assert len(smtp_server.messages) == 1
+
+
+def test_send_batch_fails_remaining_messages_when_unreachable(smtp_server):
+    sender = make_sender(smtp_server)
+    smtp_server.shutdown()
+    smtp_server.server_close()
+    messages = [{"to": f"user{i}@example.com", "subject": "Hi", "body": "Body"} for i in range(3)]
+
+    failures = sender.send_batch(messages)
+
+    assert [message for message, _ in failures] == messages
@@ -0,0 +1,43 @@
+from utils.etags import contact_etag, content_etag, etag_matches, not_modified, versions_etag
+
+
+def test_contact_etag_changes_with_version():
+    assert contact_etag(1, 1) == '"c1-v1"'
+    assert contact_etag(1, 1) != contact_etag(1, 2)
+
+
+def test_versions_etag_depends_on_rows_and_order():
+    etag = versions_etag([(1, 1), (2, 1)])
+    assert etag.startswith('"l') and etag.endswith('"')
+    assert etag == versions_etag([(1, 1), (2, 1)])
+    assert etag != versions_etag([(1, 1), (2, 2)])
+    assert etag != versions_etag([(2, 1), (1, 1)])
+    assert etag != versions_etag([(1, 1)])
+
+
+def test_content_etag_ignores_key_order():
+    assert content_etag({"a": 1, "b": 2}) == content_etag({"b": 2, "a": 1})
+    assert content_etag({"a": 1}) != content_etag({"a": 2})
+
+
+def test_etag_matches():
+    etag = contact_etag(1, 3)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(contact_etag(1, 2), etag)
+
+
+def test_not_modified():
+    response = not_modified('"c1-v1"', {"X-Next-Cursor": "abc"})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"c1-v1"'
+    assert response.headers["X-Next-Cursor"] == "abc"
+    assert response.body == b""
+
+
+def test_versions_etag_depends_on_fields():
+    rows = [(1, 1), (2, 1)]
+    assert versions_etag(rows, ("id",)) != versions_etag(rows, ("id", "first_name"))
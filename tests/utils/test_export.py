@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+from datetime import date
+
+from models import Contact
+from utils.export import EXPORT_FIELDS, csv_header, format_csv, format_ndjson, format_vcard
+
+CONTACTS = [
+    Contact(id=1, first_name="John", last_name="Doe", email="john@example.com", phone_number="123",
+            birthday=date(1990, 1, 1), additional_info="Met at PyCon, 2019; likes tea"),
+    Contact(id=2, first_name="Jane", last_name="Roe", email="jane@example.com", phone_number="456"),
+]
+
+
+def test_format_csv():
+    text = csv_header() + format_csv(CONTACTS)
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert list(rows[0]) == list(EXPORT_FIELDS)
+    assert rows[0]["birthday"] == "1990-01-01"
+    assert rows[0]["additional_info"] == "Met at PyCon, 2019; likes tea"
+    assert rows[1]["birthday"] == ""
+
+
+def test_format_ndjson():
+    lines = format_ndjson(CONTACTS).splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["birthday"] == "1990-01-01"
+    assert json.loads(lines[1])["birthday"] is None
+
+
+def test_format_vcard():
+    text = format_vcard(CONTACTS)
+    assert text.count("BEGIN:VCARD\r\n") == 2
+    assert "N:Doe;John;;;\r\n" in text
+    assert "BDAY:1990-01-01\r\n" in text
+    assert "NOTE:Met at PyCon\\, 2019\\; likes tea\r\n" in text
@@ -0,0 +1,37 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from utils.fields import CONTACT_FIELDS, contact_columns, parse_fields, rows_to_dicts
+
+
+def test_parse_fields_defaults_to_all():
+    assert parse_fields(None) == CONTACT_FIELDS
+    assert parse_fields("") == CONTACT_FIELDS
+    assert CONTACT_FIELDS[0] == "id"
+
+
+def test_parse_fields_always_includes_id_in_canonical_order():
+    assert parse_fields("last_name, first_name") == ("id", "first_name", "last_name")
+    assert parse_fields("first_name,id,first_name") == ("id", "first_name")
+
+
+def test_parse_fields_rejects_unknown_fields():
+    with pytest.raises(HTTPException) as exc_info:
+        parse_fields("first_name,user_id")
+    assert exc_info.value.status_code == 400
+    assert "user_id" in exc_info.value.detail
+
+
+def test_contact_columns_deduplicates():
+    columns = contact_columns(("id", "last_name"), ("version", "last_name"))
+    assert [column.key for column in columns] == ["id", "last_name", "version"]
+
+
+def test_rows_to_dicts():
+    rows = [SimpleNamespace(id=1, first_name="Jane", birthday=date(1990, 1, 2), version=3)]
+    assert rows_to_dicts(rows, ("id", "first_name", "birthday")) == [
+        {"id": 1, "first_name": "Jane", "birthday": "1990-01-02"},
+    ]
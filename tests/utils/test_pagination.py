@@ -0,0 +1,37 @@
+import pytest
+from fastapi import HTTPException
+
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("Doe", 42)
+    assert isinstance(cursor, str)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, (str, int)) == ("Doe", 42)
+    assert decode_cursor(encode_cursor(None, 7), ((str, type(None)), int)) == (None, 7)
+
+
+def test_decode_invalid_cursor():
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor("not-a-cursor", (str, int))
+    assert exc_info.value.status_code == 400
+
+
+def test_decode_cursor_wrong_size():
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor(42), (str, int))
+
+
+@pytest.mark.parametrize("values", [
+    ("Doe", "42"),
+    (["Doe"], 42),
+    ({"name": "Doe"}, 42),
+    ("Doe", 4.2),
+    ("Doe", True),
+    ("Doe", None),
+])
+def test_decode_cursor_wrong_types(values):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(encode_cursor(*values), ((str, type(None)), int))
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Contact, User
+from utils.search import apply_search_filters, search_terms
+
+engine = create_engine("sqlite:///:memory:")
+TestingSessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+@pytest.fixture(scope="function")
+def test_db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    user = User(username="owner", hashed_password="hashedpassword")
+    db.add(user)
+    db.commit()
+    db.add_all([
+        Contact(first_name="John", last_name="Doe", email="john@example.com", phone_number="1", user_id=user.id),
+        Contact(first_name="Johnny", last_name="Smith", email="js@example.com", phone_number="2", user_id=user.id),
+        Contact(first_name="Jane", last_name="Johnson", email="jane@example.com", phone_number="3", user_id=user.id),
+        Contact(first_name="Ann", last_name="100%", email="ann@example.com", phone_number="4", user_id=user.id),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def run_search(db, **criteria):
+    query = apply_search_filters(select(Contact), engine.dialect.name, **criteria)
+    return [(c.first_name, c.last_name) for c in db.scalars(query)]
+
+
+def test_search_terms():
+    assert search_terms(None) == []
+    assert search_terms("  John   Doe ") == ["John", "Doe"]
+
+
+def test_free_text_search_ranks_exact_matches_first(test_db):
+    assert run_search(test_db, q="john") == [("John", "Doe"), ("Jane", "Johnson"), ("Johnny", "Smith")]
+
+
+def test_free_text_search_requires_every_term(test_db):
+    assert run_search(test_db, q="john doe") == [("John", "Doe")]
+
+
+def test_search_escapes_wildcards(test_db):
+    assert run_search(test_db, q="100%") == [("Ann", "100%")]
+    assert run_search(test_db, q="j_hn") == []
+
+
+def test_field_filters(test_db):
+    assert run_search(test_db, last_name="smi") == [("Johnny", "Smith")]
+    assert run_search(test_db, first_name="j", email="jane") == [("Jane", "Johnson")]
@@ -0,0 +1,253 @@
+import hashlib
+import io
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+
+try:
+    from PIL import Image, UnidentifiedImageError
+except ImportError:  # Pillow is only needed to process uploads
+    Image = None
+
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", 4096 * 4096))
+AVATAR_SIZES = tuple(int(size) for size in os.getenv("AVATAR_SIZES", "256,128,64").split(","))
+AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "cloudinary")
+AVATAR_LOCAL_DIR = os.getenv("AVATAR_LOCAL_DIR", "media/avatars")
+AVATAR_LOCAL_URL = os.getenv("AVATAR_LOCAL_URL", "/media/avatars")
+AVATAR_CACHE_MAX_AGE = int(os.getenv("AVATAR_CACHE_MAX_AGE", 86400))
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+READ_CHUNK_SIZE = 64 * 1024
+AVATAR_UPLOAD_PATH = "/users/me/avatar"
+# Room for the multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Avatar must be at most {max_bytes} bytes",
+    )
+
+
+class AvatarUploadLimitMiddleware:
+    """
+    Rejects avatar uploads larger than ``max_bytes`` before their body is parsed.
+
+    Starlette spools the whole multipart body before the endpoint runs, so
+    :func:`read_upload` alone would only fail once an oversized file has been received.
+    Requests announcing a larger ``Content-Length`` get a 413 without their body being
+    read, and chunked bodies are cut off as soon as they grow past the limit.
+
+    Args:
+        app: The ASGI application to wrap.
+        path (str): The upload endpoint.
+        max_bytes (int): The maximum accepted file size in bytes.
+    """
+
+    def __init__(self, app, path: str = AVATAR_UPLOAD_PATH, max_bytes: int = AVATAR_MAX_BYTES):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path or scope["method"] in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_bytes + MULTIPART_OVERHEAD_BYTES
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            error = _too_large(self.max_bytes)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_with_limit():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, receive_with_limit, send)
+
+
+async def read_upload(file: UploadFile, max_bytes: int = AVATAR_MAX_BYTES) -> bytes:
+    """
+    Reads an uploaded file in chunks, stopping as soon as it exceeds ``max_bytes``.
+
+    Args:
+        file (UploadFile): The uploaded file.
+        max_bytes (int): The maximum accepted size in bytes.
+
+    Returns:
+        bytes: The file content.
+    """
+    chunks, size = [], 0
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def resize_variants(data: bytes, sizes: Iterable[int] = AVATAR_SIZES,
+                    max_pixels: int = AVATAR_MAX_PIXELS) -> Tuple[str, Dict[int, bytes]]:
+    """
+    Crops an image to a centered square and renders a PNG thumbnail for every size.
+
+    This is CPU-bound and should run off the event loop. Images with more than
+    ``max_pixels`` pixels are rejected from their header, before they are decoded: a
+    small, highly compressed file can otherwise expand to gigabytes in memory.
+
+    Args:
+        data (bytes): The uploaded image.
+        sizes (Iterable[int]): The edge lengths of the thumbnails in pixels.
+        max_pixels (int): The largest accepted width times height.
+
+    Returns:
+        tuple: A digest of the uploaded image and the PNG bytes of every size.
+    """
+    if Image is None:
+        raise RuntimeError("Processing avatars requires the Pillow package")
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format not in ACCEPTED_FORMATS:
+            raise ValueError(image.format)
+        if image.width * image.height > max_pixels:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Avatar must be at most {max_pixels} pixels",
+            )
+        image.load()
+    except (UnidentifiedImageError, ValueError, OSError, Image.DecompressionBombError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Avatar must be a JPEG, PNG, WEBP or GIF image",
+        )
+
+    image = image.convert("RGBA")
+    edge = min(image.size)
+    left, top = (image.width - edge) // 2, (image.height - edge) // 2
+    image = image.crop((left, top, left + edge, top + edge))
+
+    variants = {}
+    for size in sizes:
+        buffer = io.BytesIO()
+        image.resize((size, size), Image.LANCZOS).save(buffer, format="PNG", optimize=True)
+        variants[size] = buffer.getvalue()
+    return hashlib.sha256(data).hexdigest()[:16], variants
+
+
+def variant_name(key: str, size: int) -> str:
+    return f"{key}/{size}"
+
+
+class LocalAvatarStorage:
+    """
+    Stores avatars as files under ``root``, served by the app below ``base_url``.
+
+    Args:
+        root (str): The directory the files are written to.
+        base_url (str): The URL prefix the directory is served under.
+    """
+
+    def __init__(self, root: str = AVATAR_LOCAL_DIR, base_url: str = AVATAR_LOCAL_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.root, f"{name}.png")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return self.url(name)
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/{name}.png"
+
+    def delete(self, name: str):
+        try:
+            os.remove(os.path.join(self.root, f"{name}.png"))
+        except FileNotFoundError:
+            pass
+
+
+class CloudinaryAvatarStorage:
+    """
+    Stores avatars in Cloudinary under ``folder``.
+
+    Args:
+        folder (str): The Cloudinary folder.
+    """
+
+    def __init__(self, folder: str = "user_avatars"):
+        self.folder = folder
+
+    def save(self, name: str, data: bytes) -> str:
+        result = cloudinary.uploader.upload(
+            data,
+            public_id=f"{self.folder}/{name}",
+            overwrite=True,
+            resource_type="image",
+        )
+        return result["secure_url"]
+
+    def url(self, name: str) -> str:
+        return cloudinary.CloudinaryImage(f"{self.folder}/{name}").build_url(secure=True, format="png")
+
+    def delete(self, name: str):
+        cloudinary.uploader.destroy(f"{self.folder}/{name}", resource_type="image")
+
+
+STORAGE_BACKENDS = {
+    "local": LocalAvatarStorage,
+    "cloudinary": CloudinaryAvatarStorage,
+}
+
+_storage = None
+
+
+def get_avatar_storage():
+    """
+    Returns the storage backend selected by ``AVATAR_STORAGE``.
+
+    Returns:
+        LocalAvatarStorage | CloudinaryAvatarStorage: The shared backend instance.
+    """
+    global _storage
+    if _storage is None:
+        _storage = STORAGE_BACKENDS[AVATAR_STORAGE]()
+    return _storage
+
+
+def store_variants(storage, key: str, variants: Dict[int, bytes]) -> Dict[int, str]:
+    """
+    Saves every thumbnail of an avatar.
+
+    Args:
+        storage: The storage backend.
+        key (str): The avatar key, unique per uploaded image.
+        variants (Dict[int, bytes]): The PNG bytes of every size.
+
+    Returns:
+        Dict[int, str]: The URL of every size.
+    """
+    return {size: storage.save(variant_name(key, size), data) for size, data in variants.items()}
+
+
+def delete_variants(storage, key: Optional[str], sizes: Iterable[int] = AVATAR_SIZES):
+    if key:
+        for size in sizes:
+            storage.delete(variant_name(key, size))
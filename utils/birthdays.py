@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from sqlalchemy import ColumnElement, or_
+
+from models import Contact, birthday_day_of_year
+
+DAYS_IN_CYCLE = 365
+
+
+def upcoming_birthdays_condition(start: date, days: int) -> ColumnElement[bool]:
+    """
+    Builds a filter for birthdays falling between ``start`` and ``start + days``.
+
+    The filter only compares :attr:`models.Contact.birthday_doy`, so it is answered
+    with a range scan on the ``(user_id, birthday_doy)`` index. A window that crosses
+    the end of the year is split into two ranges.
+
+    Args:
+        start (date): The first day of the window.
+        days (int): The number of days after ``start`` to include.
+
+    Returns:
+        ColumnElement[bool]: The filter condition.
+    """
+    if days >= DAYS_IN_CYCLE:
+        return Contact.birthday_doy.is_not(None)
+    first = birthday_day_of_year(start)
+    last = birthday_day_of_year(start + timedelta(days=days))
+    if first <= last:
+        return Contact.birthday_doy.between(first, last)
+    return or_(Contact.birthday_doy >= first, Contact.birthday_doy <= last)
@@ -0,0 +1,174 @@
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from schemas import ContactCreate
+
+CHUNK_SIZE = 1000
+MAX_LINE_LENGTH = int(os.getenv("BULK_IMPORT_MAX_LINE_LENGTH", 16 * 1024))
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    """
+    Picks the import format from an explicit choice or the request content type.
+
+    Args:
+        content_type (Optional[str]): The ``Content-Type`` header of the request.
+        requested (Optional[str]): The format requested by the client, if any.
+
+    Returns:
+        Optional[str]: ``"csv"``, ``"ndjson"`` or None if the format is not supported.
+    """
+    if requested:
+        return requested if requested in FORMATS.values() else None
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return FORMATS.get(media_type)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_length: int = MAX_LINE_LENGTH) -> AsyncIterator[Optional[str]]:
+    """
+    Splits a stream of UTF-8 encoded byte chunks into lines.
+
+    Lines longer than ``max_length`` characters are discarded as they arrive, so a body
+    without line breaks cannot make the buffer grow without bound.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw request body.
+        max_length (int): The maximum accepted line length.
+
+    Yields:
+        Optional[str]: Each line without its line terminator, or None for a line that
+        was too long.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    # Set while the rest of an over-long line is being skipped.
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line = line.rstrip("\r")
+            yield None if skipping or len(line) > max_length else line
+            skipping = False
+        if len(pending) > max_length:
+            skipping, pending = True, ""
+    pending += decoder.decode(b"", final=True)
+    if skipping or len(pending.rstrip("\r")) > max_length:
+        yield None
+    elif pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_records(lines: AsyncIterator[Optional[str]], fmt: str) -> AsyncIterator[Record]:
+    """
+    Parses CSV (with a header row) or NDJSON lines into raw contact records.
+
+    CSV records must fit on a single line. Empty CSV cells are read as missing values.
+
+    Args:
+        lines (AsyncIterator[Optional[str]]): The lines of the request body, None for
+            lines that were too long.
+        fmt (str): Either ``"csv"`` or ``"ndjson"``.
+
+    Yields:
+        tuple: ``(line_number, record, error)`` where exactly one of record and error is set.
+    """
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if line is None:
+            yield line_number, None, "line is too long"
+            continue
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_number, None, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_number, {key: value or None for key, value in zip(header, values)}, None
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, f"invalid JSON: {exc}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, None, "expected a JSON object"
+                continue
+            yield line_number, record, None
+
+
+async def iter_chunks(records: AsyncIterator[Record], size: int = CHUNK_SIZE) -> AsyncIterator[List[Record]]:
+    """
+    Groups records into lists of at most ``size`` items.
+
+    Args:
+        records (AsyncIterator[Record]): The parsed records.
+        size (int): The maximum chunk size.
+
+    Yields:
+        List[Record]: The next chunk of records.
+    """
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    """
+    Flattens a pydantic validation error into a single readable message.
+
+    Args:
+        exc (ValidationError): The validation error.
+
+    Returns:
+        str: The messages for every failing field, separated by semicolons.
+    """
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+
+def validate_chunk(chunk: Iterable[Record]) -> Tuple[List[Tuple[int, ContactCreate]], List[Tuple[int, str]]]:
+    """
+    Validates a chunk of raw records with :class:`schemas.ContactCreate`.
+
+    Args:
+        chunk (Iterable[Record]): The records to validate.
+
+    Returns:
+        tuple: The valid ``(line_number, contact)`` pairs and the ``(line_number, error)`` pairs.
+    """
+    valid, errors = [], []
+    for line_number, record, error in chunk:
+        if error is not None:
+            errors.append((line_number, error))
+            continue
+        try:
+            valid.append((line_number, ContactCreate(**record)))
+        except ValidationError as exc:
+            errors.append((line_number, format_validation_error(exc)))
+    return valid, errors
@@ -0,0 +1,324 @@
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from difflib import SequenceMatcher
+from itertools import combinations, product
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.75))
+DEDUP_MAX_BLOCK_SIZE = int(os.getenv("DEDUP_MAX_BLOCK_SIZE", 100))
+# Phone numbers are compared on their last digits, so "+380 67 123 4567" and
+# "067-123-45-67" block together.
+PHONE_KEY_DIGITS = 9
+MIN_PHONE_DIGITS = 7
+MERGED_FIELDS = ("first_name", "last_name", "email", "phone_number", "birthday")
+NON_WORD = re.compile(r"[^\w]+")
+NON_DIGIT = re.compile(r"\D")
+
+
+class Fingerprint(NamedTuple):
+    first: str
+    last: str
+    email: Optional[str]
+    phone: Optional[str]
+
+    @property
+    def name(self) -> str:
+        return f"{self.first} {self.last}".strip()
+
+
+class UnionFind:
+    """
+    Disjoint sets over contact IDs, used to turn matching pairs into merge groups.
+    """
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            # Path halving keeps the trees flat without recursion.
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+@lru_cache(maxsize=65536)
+def normalize_name(value: Optional[str]) -> str:
+    """
+    Normalizes a name for matching: lowercased, without accents or punctuation.
+
+    Names repeat a lot within an address book, so results are memoized.
+
+    Args:
+        value (Optional[str]): The name as stored.
+
+    Returns:
+        str: The normalized name, possibly empty.
+    """
+    value = value or ""
+    if not value.isascii():
+        decomposed = unicodedata.normalize("NFKD", value)
+        value = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(NON_WORD.sub(" ", value.lower()).split())
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """
+    Normalizes an email for matching: lowercased, without a ``+tag``.
+
+    Args:
+        email (Optional[str]): The email as stored.
+
+    Returns:
+        Optional[str]: The normalized email, or None if it is blank.
+    """
+    email = (email or "").strip().lower()
+    local, at, domain = email.partition("@")
+    if not at:
+        return email or None
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    Normalizes a phone number for matching: its last ``PHONE_KEY_DIGITS`` digits.
+
+    Args:
+        phone (Optional[str]): The phone number as stored.
+
+    Returns:
+        Optional[str]: The normalized number, or None if it has too few digits.
+    """
+    digits = NON_DIGIT.sub("", phone or "")
+    return digits[-PHONE_KEY_DIGITS:] if len(digits) >= MIN_PHONE_DIGITS else None
+
+
+def fingerprint(contact) -> Fingerprint:
+    """
+    Normalizes the fields of a contact that are used for matching.
+
+    Args:
+        contact: An object with ``first_name``, ``last_name``, ``email`` and
+            ``phone_number`` attributes.
+
+    Returns:
+        Fingerprint: The normalized names, email and phone.
+    """
+    return Fingerprint(
+        normalize_name(contact.first_name),
+        normalize_name(contact.last_name),
+        normalize_email(contact.email),
+        normalize_phone(contact.phone_number),
+    )
+
+
+def blocking_keys(fp: Fingerprint) -> List[str]:
+    """
+    Returns the keys under which a contact is compared with others.
+
+    Only contacts sharing at least one key are ever scored against each other: the
+    normalized email, the normalized phone, and the last name with the first initial
+    (in both orders, for sources that swap the two fields).
+
+    Args:
+        fp (Fingerprint): The fingerprint of the contact.
+
+    Returns:
+        List[str]: The blocking keys.
+    """
+    keys = []
+    if fp.email:
+        keys.append(f"e:{fp.email}")
+    if fp.phone:
+        keys.append(f"p:{fp.phone}")
+    if fp.first and fp.last:
+        keys.append(f"n:{fp.last}:{fp.first[0]}")
+        keys.append(f"n:{fp.first}:{fp.last[0]}")
+    return keys
+
+
+def similarity(a: Fingerprint, b: Fingerprint, cutoff: float = 0.0) -> float:
+    """
+    Scores how likely two contacts are the same person, between 0 and 1.
+
+    Half of the score comes from the contact details: 1 if the emails or phones match, 0
+    if they are known on both sides and all differ, 0.5 if they cannot be compared. The
+    other half is the similarity of the full names.
+
+    Args:
+        a (Fingerprint): The first contact.
+        b (Fingerprint): The second contact.
+        cutoff (float): Pairs that cannot reach this score return 0 without comparing
+            the names character by character.
+
+    Returns:
+        float: The score.
+    """
+    compared = [(x, y) for x, y in ((a.email, b.email), (a.phone, b.phone)) if x and y]
+    if any(x == y for x, y in compared):
+        identity = 1.0
+    else:
+        identity = 0.0 if compared else 0.5
+    name_a, name_b = a.name, b.name
+    if name_a == name_b:
+        return 0.5 * identity + 0.5
+    if 0.5 * identity + 0.5 < cutoff:
+        return 0.0
+    matcher = SequenceMatcher(None, name_a, name_b)
+    if 0.5 * identity + 0.5 * matcher.quick_ratio() < cutoff:
+        return 0.0
+    return 0.5 * identity + 0.5 * matcher.ratio()
+
+
+def _name_block_pairs(ids: List[int], details: Dict[int, Tuple[bool, bool]]) -> Iterable[Tuple[int, int]]:
+    # Contacts that both have an email, or both have a phone, either share it and are
+    # paired by that block, or differ and cannot be a match: pair only the others.
+    by_details = defaultdict(list)
+    for contact_id in sorted(ids):
+        by_details[details[contact_id]].append(contact_id)
+    groups = list(by_details.items())
+    for index, ((email_a, phone_a), ids_a) in enumerate(groups):
+        for (email_b, phone_b), ids_b in groups[index:]:
+            if (email_a and email_b) or (phone_a and phone_b):
+                continue
+            if ids_a is ids_b:
+                yield from combinations(ids_a, 2)
+            else:
+                yield from (tuple(sorted(pair)) for pair in product(ids_a, ids_b))
+
+
+def candidate_pairs(keys: Dict[int, List[str]], max_block_size: int = DEDUP_MAX_BLOCK_SIZE,
+                    details: Optional[Dict[int, Tuple[bool, bool]]] = None) -> Set[Tuple[int, int]]:
+    """
+    Builds the pairs of contacts that share a blocking key.
+
+    Blocks larger than ``max_block_size`` (a very common name, a shared switchboard
+    number) are skipped: they say little about identity and would make the number of
+    pairs quadratic.
+
+    Args:
+        keys (Dict[int, List[str]]): The blocking keys of every contact ID.
+        max_block_size (int): The largest block whose pairs are compared.
+        details (Optional[Dict[int, Tuple[bool, bool]]]): Whether every contact has an
+            email and a phone. When given, name blocks skip pairs whose email or phone
+            are known on both sides, which score at most 0.5 unless another block
+            pairs them.
+
+    Returns:
+        Set[Tuple[int, int]]: ``(smaller_id, larger_id)`` pairs.
+    """
+    blocks = defaultdict(list)
+    for contact_id, contact_keys in keys.items():
+        for key in contact_keys:
+            blocks[key].append(contact_id)
+    pairs = set()
+    for key, ids in blocks.items():
+        if not 1 < len(ids) <= max_block_size:
+            continue
+        if details is not None and key.startswith("n:"):
+            pairs.update(_name_block_pairs(ids, details))
+        else:
+            pairs.update(combinations(sorted(ids), 2))
+    return pairs
+
+
+def _completeness(contact) -> int:
+    return sum(1 for field in MERGED_FIELDS + ("additional_info",) if getattr(contact, field, None))
+
+
+def find_duplicates(contacts: Iterable, threshold: float = DEDUP_THRESHOLD,
+                    max_block_size: int = DEDUP_MAX_BLOCK_SIZE) -> List[dict]:
+    """
+    Groups a user's contacts into suggested merges.
+
+    Candidates are found by blocking (see :func:`blocking_keys` and
+    :func:`candidate_pairs`), scored pairwise with :func:`similarity`, and pairs scoring
+    at least ``threshold`` are joined into groups with a union-find, so A~B and B~C
+    suggest one group of three.
+
+    Args:
+        contacts (Iterable): Objects with ``id``, the name, ``email``, ``phone_number``,
+            ``birthday`` and ``additional_info`` attributes, e.g. result rows.
+        threshold (float): The lowest score that counts as a match.
+        max_block_size (int): The largest block whose pairs are compared.
+
+    Returns:
+        List[dict]: Groups ordered by their smallest contact ID, each with the sorted
+        ``contact_ids``, the suggested ``primary_id`` (the most complete contact) and the
+        ``score`` of the weakest match that joined the group.
+    """
+    by_id = {contact.id: contact for contact in contacts}
+    fingerprints = {contact_id: fingerprint(contact) for contact_id, contact in by_id.items()}
+    # Pairs with conflicting details score at most 0.5, so above that they need not be built.
+    details = {contact_id: (bool(fp.email), bool(fp.phone)) for contact_id, fp in fingerprints.items()}
+    pairs = candidate_pairs({contact_id: blocking_keys(fp) for contact_id, fp in fingerprints.items()},
+                            max_block_size, details if threshold > 0.5 else None)
+
+    groups = UnionFind()
+    weakest: Dict[int, float] = {}
+    matches = []
+    for a, b in pairs:
+        score = similarity(fingerprints[a], fingerprints[b], threshold)
+        if score >= threshold:
+            groups.union(a, b)
+            matches.append((a, score))
+
+    members = defaultdict(list)
+    for contact_id in groups.parent:
+        members[groups.find(contact_id)].append(contact_id)
+    for contact_id, score in matches:
+        root = groups.find(contact_id)
+        weakest[root] = min(weakest.get(root, 1.0), score)
+
+    return [
+        {
+            "contact_ids": sorted(ids),
+            "primary_id": max(ids, key=lambda contact_id: (_completeness(by_id[contact_id]), -contact_id)),
+            "score": round(weakest[root], 3),
+        }
+        for root, ids in sorted(members.items())
+        if len(ids) > 1
+    ]
+
+
+def merge_values(primary, duplicates: Iterable) -> dict:
+    """
+    Computes the changes that fold duplicates into the primary contact.
+
+    Blank fields of the primary are filled from the first duplicate that has them, and
+    the distinct additional info of all contacts is kept, one per line.
+
+    Args:
+        primary: The contact that is kept.
+        duplicates (Iterable): The contacts merged into it, in order of preference.
+
+    Returns:
+        dict: The fields of the primary that change.
+    """
+    duplicates = list(duplicates)
+    changes = {}
+    for field in MERGED_FIELDS:
+        if getattr(primary, field):
+            continue
+        value = next((getattr(duplicate, field) for duplicate in duplicates if getattr(duplicate, field)), None)
+        if value:
+            changes[field] = value
+
+    notes = []
+    for contact in [primary, *duplicates]:
+        note = (contact.additional_info or "").strip()
+        if note and note not in notes:
+            notes.append(note)
+    info = "\n".join(notes) or None
+    if info != primary.additional_info:
+        changes["additional_info"] = info
+    return changes
@@ -1,14 +1,134 @@
+import os
 import smtplib
 from email.mime.text import MIMEText
+from typing import Iterable, List, Optional, Tuple
 
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.example.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "your_email@example.com")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "your_password")
+SMTP_FROM = os.getenv("SMTP_FROM", "your_email@example.com")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))
 
-def send_email(to: str, subject: str, body: str):
+
+def build_message(to: str, subject: str, body: str, sender: str = SMTP_FROM) -> MIMEText:
+    """
+    Builds a plain-text email.
+
+    Args:
+        to (str): The recipient address.
+        subject (str): The subject line.
+        body (str): The plain-text body.
+        sender (str): The sender address.
+
+    Returns:
+        MIMEText: The message, ready to be sent.
+    """
     msg = MIMEText(body)
     msg["Subject"] = subject
-    msg["From"] = "your_email@example.com"
+    msg["From"] = sender
     msg["To"] = to
+    return msg
+
+
+def send_email(to: str, subject: str, body: str):
+    msg = build_message(to, subject, body)
+
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT) as server:
+        if SMTP_STARTTLS:
+            server.starttls()
+        if SMTP_USERNAME:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        server.sendmail(SMTP_FROM, to, msg.as_string())
+
+
+class SMTPSender:
+    """
+    Sends emails over a long-lived SMTP connection.
+
+    The connection, including STARTTLS and login, is opened on first use and reused for
+    later sends. If the server has dropped it in the meantime, the sender reconnects once
+    and retries. Not thread-safe: use one sender per worker.
+
+    Args:
+        host (str): The SMTP server host.
+        port (int): The SMTP server port.
+        username (Optional[str]): The login user, or None to skip authentication.
+        password (Optional[str]): The login password.
+        starttls (bool): Whether to upgrade the connection with STARTTLS.
+        sender (str): The sender address.
+        timeout (float): The socket timeout in seconds.
+    """
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, username: Optional[str] = SMTP_USERNAME,
+                 password: Optional[str] = SMTP_PASSWORD, starttls: bool = SMTP_STARTTLS,
+                 sender: str = SMTP_FROM, timeout: float = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.timeout = timeout
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._server is None:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    server.starttls()
+                if self.username:
+                    server.login(self.username, self.password)
+            except Exception:
+                server.close()
+                raise
+            self._server = server
+        return self._server
+
+    @property
+    def connected(self) -> bool:
+        return self._server is not None
+
+    def send(self, to: str, subject: str, body: str):
+        msg = build_message(to, subject, body, self.sender).as_string()
+        try:
+            self._connection().sendmail(self.sender, [to], msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self.close()
+            self._connection().sendmail(self.sender, [to], msg)
+
+    def send_batch(self, messages: Iterable[dict]) -> List[Tuple[dict, str]]:
+        """
+        Sends several emails over the shared connection.
+
+        Args:
+            messages (Iterable[dict]): Messages with ``to``, ``subject`` and ``body`` keys.
+
+        Returns:
+            List[Tuple[dict, str]]: The messages that could not be sent, with the error.
+        """
+        messages = list(messages)
+        failures = []
+        for index, message in enumerate(messages):
+            try:
+                self.send(message["to"], message["subject"], message["body"])
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as exc:
+                failures.append((message, str(exc)))
+            except (smtplib.SMTPException, OSError) as exc:
+                # The server is unreachable or the connection broke: fail the rest of the
+                # batch instead of waiting for a timeout on every message.
+                self.close()
+                error = str(exc) or type(exc).__name__
+                failures.extend((pending, error) for pending in messages[index:])
+                break
+        return failures
 
-    with smtplib.SMTP("smtp.example.com", 587) as server:
-        server.starttls()
-        server.login("your_email@example.com", "your_password")
-        server.sendmail("your_email@example.com", to, msg.as_string())
+    def close(self):
+        if self._server is not None:
+            server, self._server = self._server, None
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import Response, status
+
+
+def contact_etag(contact_id: int, version: int) -> str:
+    """
+    Builds the strong ETag of a single contact from its row version.
+
+    Args:
+        contact_id (int): The ID of the contact.
+        version (int): The row version of the contact.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"c{contact_id}-v{version}"'
+
+
+def versions_etag(rows: Iterable[Tuple[int, int]], fields: Sequence[str] = ()) -> str:
+    """
+    Builds the strong ETag of a list of contacts from their IDs and row versions.
+
+    The serialized list is fully determined by which rows it contains, in which order and
+    at which version, and by the fields selected, so this changes whenever the response
+    body would.
+
+    Args:
+        rows (Iterable[Tuple[int, int]]): The ``(id, version)`` pairs in response order.
+        fields (Sequence[str]): The fields included in the response.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    value = [list(fields), [[row[0], row[1]] for row in rows]]
+    digest = hashlib.sha256(json.dumps(value).encode()).hexdigest()
+    return f'"l{digest[:32]}"'
+
+
+def content_etag(value) -> str:
+    """
+    Builds a strong ETag from a JSON-serializable response body.
+
+    Args:
+        value: The response body.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    digest = hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"b{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluates an ``If-None-Match`` header against the current ETag.
+
+    Uses the weak comparison that RFC 9110 prescribes for ``If-None-Match``.
+
+    Args:
+        if_none_match (Optional[str]): The header value, possibly a list or ``*``.
+        etag (str): The current ETag.
+
+    Returns:
+        bool: True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag.removeprefix("W/") in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    """
+    Returns an empty 304 response carrying the ETag.
+
+    Args:
+        etag (str): The current ETag.
+        headers (Optional[dict]): Other headers to send, e.g. the next page cursor.
+
+    Returns:
+        Response: The 304 response.
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**(headers or {}), "ETag": etag})
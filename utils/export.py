@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from typing import Callable, Dict, Iterable
+
+from models import Contact
+
+EXPORT_FIELDS = ("id", "first_name", "last_name", "email", "phone_number", "birthday", "additional_info")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "vcard": "text/vcard",
+}
+
+FILE_EXTENSIONS = {
+    "csv": "csv",
+    "ndjson": "ndjson",
+    "vcard": "vcf",
+}
+
+
+def _values(contact: Contact) -> Dict[str, object]:
+    values = {field: getattr(contact, field) for field in EXPORT_FIELDS}
+    if values["birthday"] is not None:
+        values["birthday"] = values["birthday"].isoformat()
+    return values
+
+
+def csv_header() -> str:
+    """
+    Returns the header row written before CSV exports.
+
+    Returns:
+        str: The CSV header line.
+    """
+    return format_csv([], header=True)
+
+
+def format_csv(contacts: Iterable[Contact], header: bool = False) -> str:
+    """
+    Serializes contacts as CSV rows.
+
+    Args:
+        contacts (Iterable[Contact]): The contacts to serialize.
+        header (bool): Whether to start with the header row.
+
+    Returns:
+        str: The CSV text.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(_values(contact) for contact in contacts)
+    return buffer.getvalue()
+
+
+def format_ndjson(contacts: Iterable[Contact]) -> str:
+    """
+    Serializes contacts as newline-delimited JSON objects.
+
+    Args:
+        contacts (Iterable[Contact]): The contacts to serialize.
+
+    Returns:
+        str: One JSON object per line.
+    """
+    return "".join(json.dumps(_values(contact)) + "\n" for contact in contacts)
+
+
+def _escape_vcard(value: object) -> str:
+    text = str(value)
+    for char, replacement in (("\\", "\\\\"), (",", "\\,"), (";", "\\;"), ("\n", "\\n")):
+        text = text.replace(char, replacement)
+    return text
+
+
+def format_vcard(contacts: Iterable[Contact]) -> str:
+    """
+    Serializes contacts as vCard 3.0 entries.
+
+    Args:
+        contacts (Iterable[Contact]): The contacts to serialize.
+
+    Returns:
+        str: The concatenated vCards.
+    """
+    cards = []
+    for contact in contacts:
+        values = _values(contact)
+        first = _escape_vcard(values["first_name"] or "")
+        last = _escape_vcard(values["last_name"] or "")
+        lines = [
+            "BEGIN:VCARD",
+            "VERSION:3.0",
+            f"N:{last};{first};;;",
+            f"FN:{' '.join(part for part in (first, last) if part)}",
+        ]
+        if values["email"]:
+            lines.append(f"EMAIL:{_escape_vcard(values['email'])}")
+        if values["phone_number"]:
+            lines.append(f"TEL:{_escape_vcard(values['phone_number'])}")
+        if values["birthday"]:
+            lines.append(f"BDAY:{values['birthday']}")
+        if values["additional_info"]:
+            lines.append(f"NOTE:{_escape_vcard(values['additional_info'])}")
+        lines.append("END:VCARD")
+        cards.append("\r\n".join(lines) + "\r\n")
+    return "".join(cards)
+
+
+FORMATTERS: Dict[str, Callable[[Iterable[Contact]], str]] = {
+    "csv": format_csv,
+    "ndjson": format_ndjson,
+    "vcard": format_vcard,
+}
@@ -0,0 +1,79 @@
+from datetime import date
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+from models import Contact
+from schemas import ContactResponse
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # fall back to the standard library encoder
+    FastJSONResponse = JSONResponse
+
+# The fields of ContactResponse, in the order they are serialized.
+CONTACT_FIELDS = ("id",) + tuple(name for name in ContactResponse.model_fields if name != "id")
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Parses a ``fields=`` query parameter into the contact fields to return.
+
+    The ID is always included. Fields are returned in :data:`CONTACT_FIELDS` order, so
+    equivalent parameters produce the same cache keys and ETags.
+
+    Args:
+        fields (Optional[str]): Comma-separated field names; all fields when empty.
+
+    Returns:
+        Tuple[str, ...]: The selected field names.
+    """
+    if not fields:
+        return CONTACT_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(CONTACT_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return tuple(name for name in CONTACT_FIELDS if name == "id" or name in requested)
+
+
+def contact_columns(*names: Iterable[str]) -> list:
+    """
+    Returns the ``Contact`` columns for one or more lists of field names, without
+    duplicates.
+
+    Args:
+        *names (Iterable[str]): Field names, e.g. the selected fields and the columns a
+            handler needs for itself.
+
+    Returns:
+        list: The columns to pass to ``select``.
+    """
+    return [getattr(Contact, name) for name in dict.fromkeys(name for group in names for name in group)]
+
+
+def rows_to_dicts(rows, names: Sequence[str]) -> List[dict]:
+    """
+    Turns Core result rows into JSON-ready dicts without going through the ORM or
+    Pydantic.
+
+    Args:
+        rows: The result rows, which must have a column for every name.
+        names (Sequence[str]): The fields to include.
+
+    Returns:
+        List[dict]: One dict per row, with dates as ISO strings.
+    """
+    items = []
+    for row in rows:
+        item = {}
+        for name in names:
+            value = getattr(row, name)
+            item[name] = value.isoformat() if isinstance(value, date) else value
+        items.append(item)
+    return items
@@ -0,0 +1,53 @@
+import base64
+import json
+from typing import Any, Sequence, Tuple, Type, Union
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encodes the sort key of the last row on a page into an opaque cursor.
+
+    Args:
+        *values: The sort key values, e.g. ``(last_name, id)``.
+
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _has_type(value: Any, expected: Union[Type, Tuple[Type, ...]]) -> bool:
+    expected = expected if isinstance(expected, tuple) else (expected,)
+    # JSON booleans decode to bool, which would otherwise pass as an int.
+    if isinstance(value, bool) and bool not in expected:
+        return False
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str, types: Sequence[Union[Type, Tuple[Type, ...]]]) -> Tuple[Any, ...]:
+    """
+    Decodes a cursor produced by :func:`encode_cursor`.
+
+    Args:
+        cursor (str): The cursor received from the client.
+        types (Sequence): The expected type of every sort key value, or a tuple of
+            accepted types, e.g. ``(str, int)`` for ``(last_name, id)``.
+
+    Returns:
+        tuple: The decoded sort key values.
+
+    Raises:
+        HTTPException: If the cursor is malformed or a value has the wrong type.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        values = None
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(_has_type(value, expected) for value, expected in zip(values, types))):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return tuple(values)
@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from sqlalchemy import Select, case, func, or_
+
+from models import Contact
+
+SEARCH_COLUMNS = (Contact.first_name, Contact.last_name, Contact.email)
+
+# pg_trgm indexes cannot narrow down patterns shorter than one trigram, so shorter
+# free-text queries would read the whole index.
+MIN_QUERY_LENGTH = 3
+
+
+def _contains(column, term: str):
+    return column.icontains(term, autoescape=True)
+
+
+def search_terms(q: Optional[str]) -> List[str]:
+    """
+    Splits a free-text query into the terms that must all match.
+
+    Args:
+        q (Optional[str]): The raw query string.
+
+    Returns:
+        List[str]: The non-empty, whitespace-separated terms.
+    """
+    return q.split() if q else []
+
+
+def apply_search_filters(query: Select, dialect: str, first_name: Optional[str] = None,
+                         last_name: Optional[str] = None, email: Optional[str] = None,
+                         q: Optional[str] = None) -> Select:
+    """
+    Adds the contact search criteria and relevance ordering to a query.
+
+    The per-field filters keep their substring semantics. The free-text ``q`` requires
+    every term to appear in one of the first name, last name or email columns. On
+    Postgres the substring and ``%`` similarity predicates are served by the pg_trgm
+    GIN indexes declared on :class:`models.Contact` and results are ranked by trigram
+    similarity. Other databases fall back to plain ``ILIKE`` with a simple
+    exact/prefix/substring rank.
+
+    Args:
+        query (Select): A select over :class:`models.Contact`.
+        dialect (str): The name of the database dialect, e.g. ``"postgresql"``.
+        first_name (Optional[str]): The first name to search for.
+        last_name (Optional[str]): The last name to search for.
+        email (Optional[str]): The email to search for.
+        q (Optional[str]): A free-text query matched against all searchable columns.
+
+    Returns:
+        Select: The filtered and ordered query.
+    """
+    if first_name:
+        query = query.where(_contains(Contact.first_name, first_name))
+    if last_name:
+        query = query.where(_contains(Contact.last_name, last_name))
+    if email:
+        query = query.where(_contains(Contact.email, email))
+
+    terms = search_terms(q)
+    if not terms:
+        return query.order_by(Contact.last_name, Contact.id)
+
+    postgres = dialect == "postgresql"
+    for term in terms:
+        matches = [_contains(column, term) for column in SEARCH_COLUMNS]
+        if postgres:
+            matches += [column.op("%")(term) for column in SEARCH_COLUMNS]
+        query = query.where(or_(*matches))
+
+    if postgres:
+        rank = func.greatest(*(func.similarity(column, q) for column in SEARCH_COLUMNS))
+    else:
+        needle = q.strip().lower()
+        rank = case(
+            (or_(*(func.lower(column) == needle for column in SEARCH_COLUMNS)), 3),
+            (or_(*(func.lower(column).startswith(needle, autoescape=True) for column in SEARCH_COLUMNS)), 2),
+            else_=1,
+        )
+    return query.order_by(rank.desc(), Contact.last_name, Contact.id)